@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Azimuth Wrap Planner             #
+# Project: VTGS Tracking Daemon             #
+# Version: 1.0                              #
+# Comment:                                  #
+#   Chooses between equivalent azimuths in  #
+#   the MD01 -180..540 deg range.  Whole    #
+#   passes are placed on one cable wrap so  #
+#   they never cross a stop mid pass, and   #
+#   overhead passes can be flipped over     #
+#   the top in elevation.                   #
+#############################################
+
+import math
+import numpy
+
+def unwrap_deg(az):
+    #continuous azimuth [deg], no 360 jumps between samples
+    return numpy.degrees(numpy.unwrap(numpy.radians(numpy.asarray(az, dtype=numpy.float64))))
+
+class Az_Planner(object):
+    """
+    Wrap and flip selection for SET targets and whole trajectories.
+
+    A trajectory is shifted by whole turns so all of its remaining points
+    lie inside [az_min, az_max]; a pass then runs on one wrap with no
+    reversal to unwind the cable.  Of the shifts that fit, the one with
+    the least slew from the current position wins.
+
+    Near overhead passes need an azimuth swing of up to 180 deg around
+    culmination, the keyhole.  If that is faster than max_az_rate and
+    el_flip is set, the pass is instead flown over the top: azimuth is
+    held on the vertical plane along the pass track and elevation runs
+    0..180 deg.  This points off the track by at most 90 - max_el deg,
+    so it is only used when that is within flip_max_error.
+
+    cfg keys, all optional:
+        az_min, az_max  - azimuth travel [deg], default -180, 540
+        max_az_rate     - azimuth rate the antenna can follow [deg/s]
+        el_flip         - allow elevation past 90 deg, default False
+        flip_max_error  - largest accepted over the top pointing error [deg], default 1.0
+    """
+    def __init__(self, cfg=None):
+        self.cfg            = cfg if cfg != None else {}
+        self.az_min         = self.cfg.get('az_min', -180.0)
+        self.az_max         = self.cfg.get('az_max', 540.0)
+        self.max_az_rate    = self.cfg.get('max_az_rate', None)
+        self.el_flip        = self.cfg.get('el_flip', False)
+        self.flip_max_error = self.cfg.get('flip_max_error', 1.0)
+
+    def nearest_az(self, az, cur_az):
+        #equivalent of az inside the travel range closest to cur_az
+        k_lo = int(math.ceil((self.az_min - az) / 360.0))
+        k_hi = int(math.floor((self.az_max - az) / 360.0))
+        if k_lo > k_hi: return az #no equivalent in range, md01 clamps
+        k = int(round((cur_az - az) / 360.0))
+        return az + 360.0 * min(max(k, k_lo), k_hi)
+
+    def plan(self, ts, az, el, cur_az, cur_el, t_now=None):
+        """
+        Planned (az, el) arrays for a trajectory at times ts, starting
+        from antenna position cur_az/cur_el.  Only points from t_now on
+        are planned for, a pass in progress is joined where it is.
+        Returns az, el, info; info has wrap (turns added), flip, slew
+        [deg], max_az_rate [deg/s] and fits (False if no wrap holds the
+        whole pass, md01 then clamps at the stop).
+        """
+        ts = numpy.asarray(ts, dtype=numpy.float64)
+        az = unwrap_deg(az)
+        el = numpy.asarray(el, dtype=numpy.float64)
+        i0 = 0
+        if t_now != None: i0 = max(0, min(int(numpy.searchsorted(ts, t_now)) - 1, len(ts) - 1))
+        flip = False
+        rate = self._max_rate(ts[i0:], az[i0:])
+        if self.el_flip and self.max_az_rate != None and rate > self.max_az_rate:
+            over = self._over_the_top(az[i0:], el[i0:])
+            if over != None:
+                flip = True
+                az = numpy.full(len(az), over[0])
+                el = numpy.concatenate((numpy.full(i0, over[1][0]), over[1]))
+                rate = 0.0
+        seg = az[i0:]
+        k_lo = int(math.ceil((self.az_min - seg.min()) / 360.0))
+        k_hi = int(math.floor((self.az_max - seg.max()) / 360.0))
+        fits = k_lo <= k_hi
+        k_near = int(round((self.nearest_az(seg[0], cur_az) - seg[0]) / 360.0))
+        k = min(max(k_near, k_lo), k_hi) if fits else k_near
+        az = az + 360.0 * k
+        slew = max(abs(az[i0] - cur_az), abs(el[i0] - cur_el)) #axes move together
+        info = {'wrap':k, 'flip':flip, 'slew':slew, 'max_az_rate':rate, 'fits':fits}
+        return az, el, info
+
+    def _max_rate(self, ts, az):
+        if len(ts) < 2: return 0.0
+        return float(numpy.abs(numpy.diff(az) / numpy.diff(ts)).max())
+
+    def _over_the_top(self, az, el):
+        #(track az, el 0..180 array) on the vertical plane along the track, None if too far off it
+        a = numpy.radians(az)
+        e = numpy.radians(el)
+        east, north, up = numpy.cos(e) * numpy.sin(a), numpy.cos(e) * numpy.cos(a), numpy.sin(e)
+        h = numpy.array([east[0] - east[-1], north[0] - north[-1]]) #horizontal, toward the start of the track
+        norm = numpy.hypot(h[0], h[1])
+        if norm < 1.0e-6: return None
+        h /= norm
+        along = east * h[0] + north * h[1]
+        lateral = east * h[1] - north * h[0]
+        if numpy.degrees(numpy.arcsin(numpy.abs(lateral).max())) > self.flip_max_error: return None
+        return math.degrees(math.atan2(h[0], h[1])), numpy.degrees(numpy.arctan2(up, along))
@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Tracking Daemon Latency Bench    #
+# Project: VTGS Tracking Daemon             #
+# Comment:                                  #
+#   End to end latency benchmark.  Starts   #
+#   the MD01 simulator in process, launches #
+#   tracking_daemon.py against it and       #
+#   drives the daemon over its TCP JSON     #
+#   interface.  Per stage latency is taken  #
+#   from the 'trace' stamps the daemon adds #
+#   to traced messages.                     #
+#############################################
+
+import os
+import sys
+import time
+import json
+import socket
+import shutil
+import argparse
+import tempfile
+import datetime
+import subprocess
+import numpy
+
+from md01_sim import *
+
+#trace stamps in the order a query travels through the daemon
+STAGES = [
+    ('client_to_service', 'client_tx', 'svc_rx'),
+    ('service_to_main',   'svc_rx',    'main_rx'),
+    ('main_to_md01',      'main_rx',   'md01'),
+    ('md01_to_main',      'md01',      'main_tx'),
+    ('main_to_service',   'main_tx',   'svc_tx'),
+    ('service_to_client', 'svc_tx',    'client_rx'),
+    ('total',             'client_tx', 'client_rx'),
+]
+
+def free_port(ip):
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.bind((ip, 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+def write_config(tmp_dir, args, md01_port, service_port):
+    cfg_fp = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config', args.cfg_file)
+    with open(cfg_fp, 'r') as cfg_f:
+        cfg = json.loads(cfg_f.read())
+    cfg['log_path'] = os.path.join(tmp_dir, 'log')
+    os.makedirs(os.path.join(cfg['log_path'], cfg['ssid']))
+    cfg['md01'].update({'ip':args.ip, 'port':md01_port, 'poll_rate':args.poll_rate,
+                        'pipeline':args.pipeline})
+    cfg['service'].update({'ip':args.ip, 'port':service_port})
+    with open(os.path.join(tmp_dir, 'bench_config.json'), 'w') as f:
+        f.write(json.dumps(cfg, indent=4))
+    return cfg
+
+class Bench_Client(object):
+    """ Client side of the benchmark, parses concatenated JSON feedback """
+    def __init__(self, ip, port, ssid):
+        self.sock = socket.create_connection((ip, port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.ssid = ssid
+        self.buf = ''
+        self.decoder = json.JSONDecoder()
+
+    def send_query(self, seq):
+        msg = {'type':'tc', 'cmd':'query', 'uid':'bench', 'ssid':self.ssid,
+               'seq':seq, 'trace':{'client_tx':time.time()}}
+        self.sock.sendall(json.dumps(msg) + '\n')
+
+    def recv_msgs(self, timeout):
+        self.sock.settimeout(timeout)
+        try:
+            data = self.sock.recv(65536)
+        except socket.timeout:
+            return []
+        if not data: raise socket.error('daemon closed connection')
+        ts = time.time()
+        self.buf += data
+        msgs = []
+        while True:
+            self.buf = self.buf.lstrip()
+            if not self.buf: break
+            try:
+                msg, end = self.decoder.raw_decode(self.buf)
+            except ValueError: #partial message
+                break
+            self.buf = self.buf[end:]
+            if 'trace' in msg: msg['trace']['client_rx'] = ts
+            msgs.append(msg)
+        return msgs
+
+    def close(self):
+        self.sock.close()
+
+def percentiles(values):
+    a = numpy.array(values) * 1000.0 #ms
+    return {'n':len(a),
+            'p50':float(numpy.percentile(a, 50)),
+            'p99':float(numpy.percentile(a, 99)),
+            'max':float(a.max()),
+            'mean':float(a.mean())}
+
+def main(args):
+    tmp_dir = tempfile.mkdtemp(prefix='trackd_bench_')
+    sim = MD01_Sim_Thread(args.ip)
+    sim.daemon = True
+    md01_port, rotator = sim.add_rotator(0, latency=args.sim_latency, jitter=args.sim_jitter)
+    sim.start()
+
+    service_port = free_port(args.ip)
+    cfg = write_config(tmp_dir, args, md01_port, service_port)
+    out = None if args.verbose else open(os.devnull, 'w')
+    here = os.path.dirname(os.path.abspath(__file__))
+    daemon = subprocess.Popen([sys.executable, 'tracking_daemon.py',
+                               '--cfg_fp', tmp_dir, '--cfg_file', 'bench_config.json',
+                               '--runtime', args.runtime, '--verbosity', args.verbosity],
+                              cwd=here, stdout=out, stderr=out)
+    samples = dict((name, []) for name, a, b in STAGES)
+    samples['md01_rtt'] = []
+    lost = 0
+    try:
+        client = None
+        deadline = time.time() + args.startup
+        while client == None:
+            try:
+                client = Bench_Client(args.ip, service_port, cfg['ssid'])
+            except socket.error:
+                if time.time() > deadline: raise
+                time.sleep(0.1)
+
+        #warm up: daemon answers queries once in STANDBY
+        ready = False
+        while not ready:
+            if time.time() > deadline: raise RuntimeError('daemon never answered a query')
+            client.send_query(-1)
+            ready = len(client.recv_msgs(1.0)) > 0
+        client.recv_msgs(0.5) #drain
+
+        print "Daemon ready, sending {:d} queries, window {:d}".format(args.count, args.window)
+        sent = 0
+        received = 0
+        outstanding = 0
+        t_start = time.time()
+        while received + lost < args.count:
+            while outstanding < args.window and sent < args.count:
+                client.send_query(sent)
+                sent += 1
+                outstanding += 1
+            msgs = client.recv_msgs(args.timeout)
+            if not msgs: #assume outstanding queries were lost
+                lost += outstanding
+                outstanding = 0
+                continue
+            for msg in msgs:
+                if 'trace' not in msg: continue
+                outstanding -= 1
+                received += 1
+                trace = msg['trace']
+                for name, a, b in STAGES:
+                    if a in trace and b in trace:
+                        samples[name].append(trace[b] - trace[a])
+                if msg.get('rtt') != None: samples['md01_rtt'].append(msg['rtt'])
+        elapsed = time.time() - t_start
+        client.close()
+    finally:
+        daemon.terminate()
+        daemon.wait()
+        sim.stop()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    results = {
+        'timestamp':datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+        'python':sys.version.split()[0],
+        'args':vars(args),
+        'count':args.count,
+        'received':received,
+        'lost':lost,
+        'elapsed_s':elapsed,
+        'rate_hz':received / elapsed if elapsed > 0 else 0.0,
+        'stages_ms':dict((k, percentiles(v)) for k, v in samples.items() if v),
+    }
+    print "{:<20s} {:>8s} {:>10s} {:>10s} {:>10s}".format('stage [ms]', 'n', 'p50', 'p99', 'max')
+    for name in [s[0] for s in STAGES] + ['md01_rtt']:
+        if name in results['stages_ms']:
+            r = results['stages_ms'][name]
+            print "{:<20s} {:8d} {:10.3f} {:10.3f} {:10.3f}".format(name, r['n'], r['p50'], r['p99'], r['max'])
+    print "sustained rate: {:.1f} cmd/s, lost: {:d}".format(results['rate_hz'], lost)
+    with open(args.out, 'w') as f:
+        f.write(json.dumps(results, indent=4, sort_keys=True))
+    print "Results written to: {:s}".format(args.out)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="VTGS Tracking Daemon End to End Latency Benchmark",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--ip",          dest="ip",          type=str,   default='127.0.0.1', help='address for daemon and simulator')
+    parser.add_argument("--cfg_file",    dest="cfg_file",    type=str,   default='fed_vu_config.json', help='base config file in ./config')
+    parser.add_argument("--count",       dest="count",       type=int,   default=200,  help='number of measured queries')
+    parser.add_argument("--window",      dest="window",      type=int,   default=1,    help='max outstanding queries')
+    parser.add_argument("--timeout",     dest="timeout",     type=float, default=5.0,  help='reply timeout [s]')
+    parser.add_argument("--startup",     dest="startup",     type=float, default=30.0, help='daemon startup timeout [s]')
+    parser.add_argument("--poll_rate",   dest="poll_rate",   type=float, default=0.1,  help='daemon MD01 poll rate [s]')
+    parser.add_argument("--pipeline",    dest="pipeline",    action='store_true',      help='enable pipelined SET+STATUS')
+    parser.add_argument("--runtime",     dest="runtime",     type=str,   default='threads', choices=['threads', 'loop'], help='daemon runtime')
+    parser.add_argument("--sim_latency", dest="sim_latency", type=float, default=0.0,  help='simulated MD01 reply latency [s]')
+    parser.add_argument("--sim_jitter",  dest="sim_jitter",  type=float, default=0.0,  help='simulated MD01 reply jitter [s]')
+    parser.add_argument("--out",         dest="out",         type=str,   default='bench_results.json', help='results file')
+    parser.add_argument("--verbose",     dest="verbose",     action='store_true',      help='show daemon output')
+    parser.add_argument("--verbosity",   dest="verbosity",   type=str,   default='info', choices=['quiet', 'error', 'warning', 'info', 'debug'], help='daemon console verbosity')
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Pointing Lead Replay Benchmark   #
+# Project: VTGS Tracking Daemon             #
+# Comment:                                  #
+#   Replays passes through the simulated    #
+#   MD-01 on a virtual clock and compares   #
+#   pointing error with and without lead    #
+#   compensation.                           #
+#############################################
+
+import sys
+import math
+import random
+import argparse
+import numpy
+
+from md01 import *
+from md01_sim import Sim_Rotator
+from trajectory import *
+from pass_predict import *
+from pass_predict import _tle_checksum
+from pass_recorder import *
+from az_planner import *
+from pointing_lead import *
+
+#ISS, the default pass when no recordings are given
+ISS_TLE = ('1 25544U 98067A   24100.50000000  .00016717  00000-0  30000-3 0  999',
+           '2 25544  51.6416 247.4627 0006703 130.5360 325.0288 15.4981531143255')
+STATION = {'lat':37.229, 'lon':-80.439, 'alt':610.0}
+
+def tle_line(line):
+    return line + str(_tle_checksum(line))
+
+def iss_pass(min_el, step):
+    #first ISS pass over the station after the TLE epoch culminating above min_el
+    sat = Satellite(tle_line(ISS_TLE[0]), tle_line(ISS_TLE[1]))
+    t0 = sat.epoch
+    while t0 < sat.epoch + 3 * 86400.0:
+        found = find_pass(sat, STATION, t0)
+        if found == None: break
+        aos, los, max_el = found
+        if max_el >= min_el:
+            ts, az, el = pass_table(sat, STATION, aos, los, step)
+            return 'ISS max_el={:3.1f}'.format(max_el), ts, az, el
+        t0 = los + 60.0
+    raise ValueError("No ISS pass above {:3.1f} deg".format(min_el))
+
+def recorded_pass(path):
+    #commanded target of a pass recorded without lead compensation
+    header, rec = load_pass(path, mmap=False)
+    ts = numpy.asarray(rec['ts'])
+    keep = numpy.concatenate(([True], numpy.diff(ts) > 0))
+    return header['session_id'], ts[keep], numpy.asarray(rec['tar_az'])[keep], numpy.asarray(rec['tar_el'])[keep]
+
+def separation(az1, el1, az2, el2):
+    #angle between pointing directions [deg]
+    a1, e1, a2, e2 = [numpy.radians(x) for x in (az1, el1, az2, el2)]
+    c = numpy.sin(e1) * numpy.sin(e2) + numpy.cos(e1) * numpy.cos(e2) * numpy.cos(a1 - a2)
+    return numpy.degrees(numpy.arccos(numpy.clip(c, -1.0, 1.0)))
+
+def replay(traj, args, enable):
+    """
+    Poll loop of MD01_Thread on a virtual clock: STATUS reaches the
+    controller rtt/2 after the poll, the reply rtt after it, and the SET
+    for the next target goes out on the reply.  The rotator position is
+    sampled every args.sample [s] over the pass.
+    """
+    rand = random.Random(args.seed)
+    rot = Sim_Rotator(traj.az[0], traj.el[0], args.az_speed, args.el_speed)
+    lead = Lead_Estimator({'enable':enable, 'gain':args.gain}, args.poll_rate)
+    status_cmd = bytearray([0x57,0,0,0,0,0,0,0,0,0,0,0x1F,0x20])
+    set_cmd = bytearray([0x57,0,0,0,0,0x0a,0,0,0,0,0x0a,0x2F,0x20])
+    grid = numpy.arange(traj.start, traj.stop, args.sample)
+    pos = numpy.zeros((len(grid), 2))
+    state = {'i':0, 'sets':0}
+
+    def advance(t):
+        i = state['i']
+        while i < len(grid) and grid[i] < t:
+            rot.update(grid[i])
+            pos[i] = rot.az, rot.el
+            i += 1
+        state['i'] = i
+
+    t = traj.start - args.lead_in
+    last = None
+    while t < traj.stop:
+        rtt = args.rtt + rand.uniform(0, args.jitter)
+        advance(t + 0.5 * rtt)
+        reply = rot.handle_cmd(status_cmd, t + 0.5 * rtt)[1]
+        cur_az, cur_el = decode_status(reply)[:2]
+        t_rx = t + rtt
+        lead.update(t_rx, rtt, cur_az, cur_el, traj)
+        tar = traj.position_at(min(max(t_rx + lead.get_lead(), traj.start), traj.stop))
+        cmd = set_pulses(tar[0], tar[1])[:2]
+        if cmd != last: #identical SETs are coalesced in the daemon
+            encode_set(set_cmd, tar[0], tar[1])
+            advance(t_rx + 0.5 * rtt)
+            rot.handle_cmd(set_cmd, t_rx + 0.5 * rtt)
+            state['sets'] += 1
+            last = cmd
+        t += args.poll_rate
+    advance(traj.stop)
+    ref_az, ref_el = traj.sample(grid)
+    err = separation(pos[:, 0], pos[:, 1], ref_az, ref_el)
+    return err, lead, state['sets']
+
+def report(label, err, lead, sets):
+    print "{:<10s} rms {:6.3f}  p95 {:6.3f}  max {:6.3f} [deg]  latency {:5.3f} [s]  lead {:5.3f} [s]  SETs {:5d}".format(
+        label, math.sqrt(numpy.mean(err ** 2)), numpy.percentile(err, 95), err.max(),
+        lead.get_latency(), lead.get_lead(), sets)
+
+def main(args):
+    if args.passes:
+        passes = [recorded_pass(p) for p in args.passes]
+    else:
+        passes = [iss_pass(args.min_el, args.step)]
+    planner = Az_Planner()
+    total = {False:[], True:[]}
+    for name, ts, az, el in passes:
+        az, el, plan = planner.plan(ts, az, el, az[0], el[0])
+        traj = Trajectory(ts, az, el, 'cubic')
+        print "{:s}: {:d} points, {:3.1f} s, max az rate {:3.2f} [deg/s]".format(
+            name, len(traj), traj.stop - traj.start, plan['max_az_rate'])
+        for enable in (False, True):
+            err, lead, sets = replay(traj, args, enable)
+            report('lead on' if enable else 'lead off', err, lead, sets)
+            total[enable].append(err)
+    off, on = numpy.concatenate(total[False]), numpy.concatenate(total[True])
+    rms_off, rms_on = math.sqrt(numpy.mean(off ** 2)), math.sqrt(numpy.mean(on ** 2))
+    print "rms pointing error {:5.3f} -> {:5.3f} [deg], {:3.1f}% lower, p95 {:5.3f} -> {:5.3f} [deg]".format(
+        rms_off, rms_on, 100.0 * (1.0 - rms_on / rms_off), numpy.percentile(off, 95), numpy.percentile(on, 95))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Pointing lead compensation replay benchmark",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("passes", nargs='*', help='pass recorder files, commanded targets are the reference track, default a predicted ISS pass')
+    parser.add_argument("--poll_rate", dest="poll_rate", type=float, default=0.5, help='MD-01 poll period [s]')
+    parser.add_argument("--rtt",      dest="rtt",      type=float, default=0.02, help='controller round trip time [s]')
+    parser.add_argument("--jitter",   dest="jitter",   type=float, default=0.01, help='max added random round trip time [s]')
+    parser.add_argument("--az_speed", dest="az_speed", type=float, default=3.0, help='rotator azimuth slew rate [deg/s]')
+    parser.add_argument("--el_speed", dest="el_speed", type=float, default=3.0, help='rotator elevation slew rate [deg/s]')
+    parser.add_argument("--gain",     dest="gain",     type=float, default=0.05, help='lead estimator gain')
+    parser.add_argument("--lead_in",  dest="lead_in",  type=float, default=10.0, help='polling before the pass starts [s]')
+    parser.add_argument("--sample",   dest="sample",   type=float, default=0.01, help='pointing error sample spacing [s]')
+    parser.add_argument("--min_el",   dest="min_el",   type=float, default=30.0, help='predicted pass culmination at least [deg]')
+    parser.add_argument("--step",     dest="step",     type=float, default=0.1, help='predicted pointing table spacing [s]')
+    parser.add_argument("--seed",     dest="seed",     type=int,   default=0, help='random seed for rtt jitter')
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+#############################################
+#   Title: MD01 Codec Micro-Benchmark       #
+# Project: VTGS Tracking Daemon             #
+# Comment:                                  #
+#   Times the md01 frame encode/decode      #
+#   paths against the original string       #
+#   based implementations.                  #
+#############################################
+
+import sys
+import timeit
+import argparse
+import random
+
+from md01 import *
+
+def legacy_format_set_cmd(set_cmd, cmd_az, cmd_el, ph=10, pv=10):
+    #original md01._format_set_cmd, kept for comparison
+    if   (cmd_az>540): cmd_az = 540
+    elif (cmd_az < -180): cmd_az = -180
+    if   (cmd_el < 0): cmd_el = 0
+    elif (cmd_el>180): cmd_el = 180
+    cmd_az_str = str(int((float(cmd_az) + 360) * ph))
+    cmd_el_str = str(int((float(cmd_el) + 360) * pv))
+    if   len(cmd_az_str) == 1: cmd_az_str = '000' + cmd_az_str
+    elif len(cmd_az_str) == 2: cmd_az_str = '00'  + cmd_az_str
+    elif len(cmd_az_str) == 3: cmd_az_str = '0'   + cmd_az_str
+    if   len(cmd_el_str) == 1: cmd_el_str = '000' + cmd_el_str
+    elif len(cmd_el_str) == 2: cmd_el_str = '00'  + cmd_el_str
+    elif len(cmd_el_str) == 3: cmd_el_str = '0'   + cmd_el_str
+    set_cmd[1] = cmd_az_str[0]
+    set_cmd[2] = cmd_az_str[1]
+    set_cmd[3] = cmd_az_str[2]
+    set_cmd[4] = cmd_az_str[3]
+    set_cmd[5] = ph
+    set_cmd[6] = cmd_el_str[0]
+    set_cmd[7] = cmd_el_str[1]
+    set_cmd[8] = cmd_el_str[2]
+    set_cmd[9] = cmd_el_str[3]
+    set_cmd[10] = pv
+    return set_cmd
+
+def new_set_frame():
+    return bytearray([0x57,0,0,0,0,0x0a,0,0,0,0,0x0a,0x2F,0x20])
+
+def check_set_encoder(angles, ph, pv):
+    #encoder must produce the same frame as the legacy path
+    a = new_set_frame()
+    b = new_set_frame()
+    for az, el in angles:
+        legacy_format_set_cmd(a, az, el, ph, pv)
+        encode_set(b, az, el, ph, pv)
+        if a != b:
+            print "MISMATCH az={:3.3f} el={:3.3f}: {:s} != {:s}".format(az, el, repr(a), repr(b))
+            return False
+    return True
+
+def bench(label, stmt, n, repeat, calls=1):
+    #best of repeat runs, microseconds per call
+    best = min(timeit.repeat(stmt, number=n, repeat=repeat))
+    per_call = best / (n * calls) * 1e6
+    print "{:<28s} {:8.3f} us/call".format(label, per_call)
+    return per_call
+
+def main(args):
+    random.seed(args.seed)
+    angles = [(random.uniform(-200, 560), random.uniform(-10, 190)) for i in range(1000)]
+    for ph in [1, 2, 4, 10]:
+        if not check_set_encoder(angles, ph, ph):
+            sys.exit(1)
+    print "SET encoder output matches legacy path for ph/pv in [1, 2, 4, 10]"
+
+    frame = new_set_frame()
+    def run_legacy():
+        for az, el in angles: legacy_format_set_cmd(frame, az, el)
+    def run_encoder():
+        for az, el in angles: encode_set(frame, az, el)
+
+    n = args.number
+    t_old = bench('legacy _format_set_cmd', run_legacy, n, args.repeat, len(angles))
+    t_new = bench('encode_set', run_encoder, n, args.repeat, len(angles))
+    print "SET encoder speedup: {:.2f}x".format(t_old/t_new)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="MD01 codec micro-benchmark",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--number", dest="number", type=int, default=200, help='loops per timing run')
+    parser.add_argument("--repeat", dest="repeat", type=int, default=5, help='timing runs, best is reported')
+    parser.add_argument("--seed",   dest="seed",   type=int, default=0, help='random seed for test angles')
+    args = parser.parse_args()
+    main(args)
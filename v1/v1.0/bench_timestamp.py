@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Timestamp Micro-Benchmark        #
+# Project: VTGS Tracking Daemon             #
+# Comment:                                  #
+#   Times the cached UTC stamp formatter    #
+#   against per call strftime, the way      #
+#   messages were stamped before.           #
+#############################################
+
+import sys
+import time
+import timeit
+import argparse
+import random
+import datetime
+
+from timestamp import *
+
+STAMPS_PER_MSG = 3 #rx_ts, tx_ts and the md01 feedback ts
+
+def check_stamps(times):
+    #cached formatter must produce the same strings as strftime
+    for t in times:
+        dt = datetime.datetime.utcfromtimestamp(t)
+        ref = dt.strftime(ISO_FORMAT)
+        if utc_stamp_datetime(dt) != ref or utc_stamp(t) != ref:
+            print "MISMATCH t={:.6f}: {:s} != {:s} / {:s}".format(t, ref, utc_stamp_datetime(dt), utc_stamp(t))
+            return False
+    return True
+
+def bench(label, stmt, n, repeat, calls=1):
+    #best of repeat runs, microseconds per call
+    best = min(timeit.repeat(stmt, number=n, repeat=repeat))
+    per_call = best / (n * calls) * 1e6
+    print "{:<28s} {:8.3f} us/call".format(label, per_call)
+    return per_call
+
+def main(args):
+    random.seed(args.seed)
+    now = time.time()
+    times = [random.uniform(0, 2e9) for i in range(100000)]
+    times += [now + i * 1e-3 for i in range(10000)] #sub second steps, the cached case
+    if not check_stamps(times):
+        sys.exit(1)
+    print "Cached stamps match strftime for {:d} times".format(len(times))
+
+    #one message a millisecond, as at a busy service port
+    ts = [now + i * 1e-3 for i in range(1000)]
+    dts = [datetime.datetime.utcfromtimestamp(t) for t in ts]
+    def run_strftime():
+        for d in dts: d.strftime(ISO_FORMAT)
+    def run_utcnow_strftime():
+        for t in ts: datetime.datetime.utcnow().strftime(ISO_FORMAT)
+    def run_stamp():
+        for t in ts: utc_stamp(t)
+    def run_stamp_now():
+        for t in ts: utc_stamp()
+    def run_stamp_datetime():
+        for d in dts: utc_stamp_datetime(d)
+    def run_epoch():
+        for t in ts: wire_ts(t, 'epoch')
+
+    n = args.number
+    t_old = bench('strftime', run_strftime, n, args.repeat, len(ts))
+    t_now = bench('utcnow().strftime', run_utcnow_strftime, n, args.repeat, len(ts))
+    t_new = bench('utc_stamp(t)', run_stamp, n, args.repeat, len(ts))
+    t_cur = bench('utc_stamp()', run_stamp_now, n, args.repeat, len(ts))
+    t_dt  = bench('utc_stamp_datetime', run_stamp_datetime, n, args.repeat, len(ts))
+    t_ep  = bench("wire_ts 'epoch'", run_epoch, n, args.repeat, len(ts))
+    print "stamp speedup: {:.2f}x (datetime {:.2f}x, now {:.2f}x)".format(t_old/t_new, t_old/t_dt, t_now/t_cur)
+    print "per message ({:d} stamps): {:.3f} us strftime, {:.3f} us cached, {:.3f} us epoch".format(
+        STAMPS_PER_MSG, STAMPS_PER_MSG*t_now, STAMPS_PER_MSG*t_cur, STAMPS_PER_MSG*t_ep)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Timestamp formatting micro-benchmark",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--number", dest="number", type=int, default=100, help='loops per timing run')
+    parser.add_argument("--repeat", dest="repeat", type=int, default=5, help='timing runs, best is reported')
+    parser.add_argument("--seed",   dest="seed",   type=int, default=0, help='random seed for test times')
+    args = parser.parse_args()
+    main(args)
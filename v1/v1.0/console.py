@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Tracking Daemon Console Output   #
+# Project: VTGS Tracking Daemon             #
+# Version: 1.0                              #
+# Comment:                                  #
+#   Per subsystem console verbosity.        #
+#   Replaces unconditional print statements #
+#   so the daemon can run quietly at high   #
+#   rates and still be made chatty for      #
+#   debugging from the config or --verbose. #
+#############################################
+
+import sys
+import threading
+
+from timestamp import utc_stamp
+
+QUIET, ERROR, WARNING, INFO, DEBUG = 0, 1, 2, 3, 4
+LEVELS = {'quiet':QUIET, 'error':ERROR, 'warning':WARNING, 'info':INFO, 'debug':DEBUG}
+
+_lock       = threading.Lock() #keeps lines from different threads whole
+_channels   = {}               #name -> Console_Channel
+_levels     = {'default':INFO} #configured levels, applied to channels created later too
+
+def _to_level(level):
+    if isinstance(level, basestring): return LEVELS[level.lower()]
+    return int(level)
+
+class Console_Channel(object):
+    """
+    Console output for one subsystem.
+
+    Messages are a format string plus arguments, formatted and
+    timestamped only if the channel level lets them through, so a
+    disabled call costs one comparison.  Callers that build expensive
+    arguments can test debug_on / info_on first.
+    """
+    def __init__(self, name, level=INFO):
+        self.name = name
+        self.set_level(level)
+
+    def set_level(self, level):
+        self.level      = _to_level(level)
+        self.info_on    = self.level >= INFO
+        self.debug_on   = self.level >= DEBUG
+
+    def error(self, fmt, *args):
+        if self.level >= ERROR: self._write(fmt, args)
+
+    def warning(self, fmt, *args):
+        if self.level >= WARNING: self._write(fmt, args)
+
+    def info(self, fmt, *args):
+        if self.level >= INFO: self._write(fmt, args)
+
+    def debug(self, fmt, *args):
+        if self.level >= DEBUG: self._write(fmt, args)
+
+    def _write(self, fmt, args):
+        msg = fmt.format(*args) if args else fmt
+        line = "{:s} | {:s} | {:s}\n".format(utc_stamp(), self.name, msg)
+        with _lock:
+            sys.stdout.write(line)
+
+def get_console(name):
+    """ Shared channel for a subsystem: main, serv, md01, md01_io, loop, multi """
+    with _lock:
+        if name not in _channels:
+            _channels[name] = Console_Channel(name, _levels.get(name, _levels['default']))
+        return _channels[name]
+
+def configure_console(cfg):
+    """
+    Set levels from a config dict, e.g. {"default":"info", "md01":"debug"}.
+    Levels are quiet, error, warning, info or debug.
+    """
+    with _lock:
+        for name, level in cfg.items():
+            _levels[name] = _to_level(level)
+        for name, channel in _channels.items():
+            channel.set_level(_levels.get(name, _levels['default']))
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+#############################################
+#   Title: MD01 Feedback Snapshots          #
+# Project: VTGS Tracking Daemon             #
+# Version: 1.0                              #
+# Comment:                                  #
+#   Immutable per poll feedback records.    #
+#   One snapshot is built per MD01 reply    #
+#   and shared by reference between         #
+#   threads, it is encoded to JSON only     #
+#   when a client reply is sent, and only   #
+#   once however many replies carry it.     #
+#############################################
+
+import json
+
+from timestamp import wire_ts
+
+FEEDBACK_FIELDS = ('ts', 'cur_az', 'cur_el', 'az_rate', 'el_rate', 'rtt') #client feedback fields
+
+class Feedback_Snapshot(object):
+    """
+    Antenna feedback from one MD01 poll, read only once built.
+
+    ts is a naive UTC datetime (None before the first reply), angles
+    [deg], rates [deg/s] and rtt [s].  Threads can hold and read a
+    snapshot without copying or locking since it never changes; the
+    poll thread replaces it with a new one instead.
+    """
+    __slots__ = FEEDBACK_FIELDS + ('_body', '_body_fmt')
+
+    def __init__(self, ts=None, cur_az=0.0, cur_el=0.0, az_rate=0.0, el_rate=0.0, rtt=None):
+        init = object.__setattr__
+        init(self, 'ts', ts)
+        init(self, 'cur_az', cur_az)
+        init(self, 'cur_el', cur_el)
+        init(self, 'az_rate', az_rate)
+        init(self, 'el_rate', el_rate)
+        init(self, 'rtt', rtt)
+        init(self, '_body', None)
+        init(self, '_body_fmt', None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Feedback_Snapshot is read only")
+
+    def to_dict(self, ts_format='iso'):
+        return {'ts':wire_ts(self.ts, ts_format) if self.ts != None else None,
+                'cur_az':self.cur_az, 'cur_el':self.cur_el,
+                'az_rate':self.az_rate, 'el_rate':self.el_rate, 'rtt':self.rtt}
+
+    def json_body(self, ts_format='iso'):
+        #encoded fields without the enclosing braces, cached on first use
+        if self._body == None or self._body_fmt != ts_format:
+            object.__setattr__(self, '_body', json.dumps(self.to_dict(ts_format))[1:-1])
+            object.__setattr__(self, '_body_fmt', ts_format)
+        return self._body
+
+    def __repr__(self):
+        return "Feedback_Snapshot({:s})".format(self.json_body())
+
+class Feedback_Msg(object):
+    """
+    A client feedback reply: a shared snapshot plus the fields added on
+    the way out (trace, ssid, tx_ts).  Supports the dict operations the
+    main and service threads use, so it travels the telemetry path like
+    any other message; to_json() splices the per reply fields onto the
+    snapshot's cached encoding.
+    """
+    __slots__ = ('snapshot', 'ts_format', 'extra')
+
+    def __init__(self, snapshot, ts_format='iso'):
+        self.snapshot   = snapshot
+        self.ts_format  = ts_format
+        self.extra      = {}
+
+    def __contains__(self, key):
+        return key in self.extra or key in FEEDBACK_FIELDS
+
+    def __getitem__(self, key):
+        if key in self.extra: return self.extra[key]
+        if key in FEEDBACK_FIELDS: return self.snapshot.to_dict(self.ts_format)[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        self.extra[key] = value
+
+    def update(self, fields):
+        self.extra.update(fields)
+
+    def pop(self, key, default=None):
+        return self.extra.pop(key, default)
+
+    def to_json(self):
+        body = self.snapshot.json_body(self.ts_format)
+        if len(self.extra) == 0: return '{' + body + '}'
+        return '{' + body + ', ' + json.dumps(self.extra)[1:]
+
+    def __repr__(self):
+        return self.to_json()
+
+def encode_msg(msg):
+    #JSON text for a client message, plain dict or Feedback_Msg
+    if isinstance(msg, Feedback_Msg): return msg.to_json()
+    return json.dumps(msg)
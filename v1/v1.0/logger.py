@@ -3,12 +3,17 @@
 # Logger utilities
 
 import math, sys, os, time, struct, traceback, binascii, logging
+import threading, atexit
 import datetime as dt
+from timestamp import utc_stamp, ISO_FORMAT
+from collections import deque
 
 class MyFormatter(logging.Formatter):
     #Overriding formatter for datetime
     converter=dt.datetime.utcfromtimestamp
     def formatTime(self, record, datefmt=None):
+        if datefmt == ISO_FORMAT: #cached prefix, no strftime per record
+            return utc_stamp(record.created)
         ct = self.converter(record.created)
         if datefmt:
             s = ct.strftime(datefmt)
@@ -18,21 +23,147 @@ class MyFormatter(logging.Formatter):
         return s
 
 
-def setup_logger(log_name, path, level=logging.INFO, ts = None):
+class Log_Writer(threading.Thread):
+    """
+    Single writer thread for asynchronous logging.
+
+    Records are appended by Queue_Handler to a bounded deque, which takes
+    no lock and never blocks.  Every interval the writer drains it and
+    writes the batch to the wrapped file handler, one write and flush per
+    batch.  When the deque is full, policy 'drop_oldest' discards the
+    oldest queued record, 'drop_newest' the incoming one, and a line
+    noting the number of dropped records is written with the next batch.
+    """
+    def __init__(self, handler, max_queue=10000, policy='drop_oldest', interval=0.1):
+        threading.Thread.__init__(self, name = 'LogWriter')
+        self.daemon     = True
+        self._stop      = threading.Event()
+        self.handler    = handler
+        self.max_queue  = max_queue
+        self.q          = deque(maxlen=max_queue) #appends past maxlen drop the oldest
+        self.policy     = policy
+        self.interval   = interval #[s] batch period
+        self.dropped    = 0 #records discarded on overflow, approximate under contention
+        self.dropped_reported = 0
+        self.written    = 0 #records written
+        self.batches    = 0 #write/flush calls
+        self.max_depth  = 0 #deepest queue seen by the writer
+
+    def put(self, record):
+        if len(self.q) >= self.max_queue:
+            self.dropped += 1
+            if self.policy == 'drop_newest': return
+        self.q.append(record)
+
+    def run(self):
+        while not self._stop.isSet():
+            time.sleep(self.interval)
+            self._drain()
+        self._drain()
+        #written after the last batch, never subject to the overflow policy
+        self._write([logging.makeLogRecord({'msg':self.summary(), 'levelno':logging.INFO,
+                                            'levelname':'INFO', 'threadName':self.name})])
+
+    def _drain(self):
+        depth = len(self.q)
+        if depth > self.max_depth: self.max_depth = depth
+        batch = []
+        try:
+            while True: batch.append(self.q.popleft())
+        except IndexError:
+            pass
+        self._write(batch)
+
+    def _write(self, batch):
+        lines = []
+        for record in batch:
+            try:
+                lines.append(self.handler.format(record))
+            except Exception:
+                self.handler.handleError(record)
+        dropped = self.dropped
+        if dropped > self.dropped_reported:
+            lines.append("Log queue overflow, {:d} records dropped".format(dropped - self.dropped_reported))
+            self.dropped_reported = dropped
+        if len(lines) == 0: return
+        self.handler.acquire()
+        try:
+            self.handler.stream.write('\n'.join(lines) + '\n')
+            self.handler.flush()
+        finally:
+            self.handler.release()
+        self.written += len(batch)
+        self.batches += 1
+
+    def get_stats(self):
+        return {'written':self.written,
+                'dropped':self.dropped,
+                'batches':self.batches,
+                'depth':len(self.q),
+                'max_depth':self.max_depth}
+
+    def summary(self):
+        st = self.get_stats()
+        return "Log writer: written={:d}, dropped={:d}, batches={:d}, max_depth={:d}".format(
+                    st['written'], st['dropped'], st['batches'], st['max_depth'])
+
+    def stop(self, timeout=5.0):
+        #write everything queued and the summary, then exit
+        if not self.is_alive(): return
+        self._stop.set()
+        self.join(timeout)
+
+class Queue_Handler(logging.Handler):
+    """ Hands records to a Log_Writer, the calling thread never touches the file """
+    def __init__(self, writer):
+        logging.Handler.__init__(self)
+        self.writer = writer
+        self.baseFilename = writer.handler.baseFilename
+
+    def prepare(self, record):
+        #merge args and exception text now, the writer formats later
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self.writer.handler.formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record):
+        try:
+            self.writer.put(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        self.writer.stop()
+        logging.Handler.close(self)
+
+def setup_logger(log_name, path, level=logging.INFO, ts = None, async_cfg = None):
     l = logging.getLogger(log_name)
     if ts == None: ts = str(get_uptime())
     log_file = "{:s}_{:s}.log".format(log_name, ts)
     log_path = '/'.join([path, log_file])
     #log_path = os.getcwd() + '/log/' + log_file
     #print log_path
-    formatter = MyFormatter(fmt='%(asctime)s | %(threadName)s | %(levelname)s | %(message)s',datefmt='%Y-%m-%dT%H:%M:%S.%fZ')
+    formatter = MyFormatter(fmt='%(asctime)s | %(threadName)s | %(levelname)s | %(message)s',datefmt=ISO_FORMAT)
     #fileHandler = logging.FileHandler(log_path, mode='w')
     fileHandler = logging.FileHandler(log_path)
     fileHandler.setFormatter(formatter)
     #streamHandler = logging.StreamHandler()
     #streamHandler.setFormatter(formatter)
     l.setLevel(level)
-    l.addHandler(fileHandler)
+    if async_cfg != None and async_cfg.get('enable', True):
+        #hot loops only enqueue, a writer thread batches records to disk
+        writer = Log_Writer(fileHandler,
+                            max_queue=async_cfg.get('max_queue', 10000),
+                            policy=async_cfg.get('policy', 'drop_oldest'),
+                            interval=async_cfg.get('interval', 0.1))
+        writer.start()
+        atexit.register(writer.stop)
+        l.addHandler(Queue_Handler(writer))
+    else:
+        l.addHandler(fileHandler)
     l.info('Logger Initialized')
     #l.addHandler(streamHandler)
     #return fileHandler
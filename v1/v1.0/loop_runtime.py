@@ -0,0 +1,457 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Tracking Daemon Loop Runtime     #
+# Project: VTGS Tracking Daemon             #
+# Version: 1.0                              #
+# Comment:                                  #
+#   Alternative single thread runtime.      #
+#   MD01 controller I/O, the client service #
+#   and the state machine run as callbacks  #
+#   on one poll() event loop instead of     #
+#   three threads joined by queues.         #
+#   Select with: --runtime loop             #
+#############################################
+
+import os
+import sys
+import time
+import errno
+import fcntl
+import heapq
+import select
+import socket
+import threading
+from collections import deque
+
+from main_thread import *
+
+class Event_Loop(object):
+    """
+    Minimal poll() reactor.
+
+    File descriptors are registered with a handler(fd, event) callback,
+    timers are kept on a heap against the monotonic clock, and call_soon_threadsafe() lets other
+    threads hand work to the loop through a self-pipe.
+    """
+    def __init__(self):
+        self.poller     = select.poll()
+        self.handlers   = {} #fd -> handler(fd, event)
+        self.timers     = [] #heap of [when, seq, callback, args, cancelled]
+        self.seq        = 0
+        self.ready      = deque() #callbacks to run on the next iteration
+        self.lock       = threading.Lock()
+        self.running    = False
+        self.console    = get_console('loop')
+
+        self.wake_r, self.wake_w = os.pipe()
+        fcntl.fcntl(self.wake_r, fcntl.F_SETFL, os.O_NONBLOCK)
+        fcntl.fcntl(self.wake_w, fcntl.F_SETFL, os.O_NONBLOCK)
+        self.register(self.wake_r, select.POLLIN, self._drain_wakeup)
+
+    #### FILE DESCRIPTORS ####
+    def register(self, fd, mask, handler):
+        self.handlers[fd] = handler
+        self.poller.register(fd, mask)
+
+    def modify(self, fd, mask):
+        self.poller.modify(fd, mask)
+
+    def unregister(self, fd):
+        self.handlers.pop(fd, None)
+        try: self.poller.unregister(fd)
+        except KeyError: pass
+
+    #### CALLBACKS AND TIMERS ####
+    def call_soon(self, callback, *args):
+        self.ready.append((callback, args))
+
+    def call_soon_threadsafe(self, callback, *args):
+        with self.lock:
+            self.ready.append((callback, args))
+        try:
+            os.write(self.wake_w, b'\x00')
+        except OSError as e: #pipe full, loop is already due to wake
+            if e.errno != errno.EAGAIN: raise
+
+    def call_later(self, delay, callback, *args):
+        return self.call_at(monotonic() + delay, callback, *args)
+
+    def call_at(self, when, callback, *args):
+        #when is a monotonic() time
+        self.seq += 1
+        timer = [when, self.seq, callback, args, False]
+        heapq.heappush(self.timers, timer)
+        return timer
+
+    def cancel(self, timer):
+        if timer != None: timer[4] = True
+
+    #### LOOP ####
+    def run(self):
+        self.running = True
+        while self.running:
+            timeout = -1
+            if self.ready:
+                timeout = 0
+            elif self.timers:
+                timeout = max(0, int((self.timers[0][0] - monotonic()) * 1000) + 1)
+            try:
+                events = self.poller.poll(timeout)
+            except select.error as e:
+                if e.args[0] == errno.EINTR: continue
+                raise
+            for fd, event in events:
+                handler = self.handlers.get(fd)
+                if handler != None: self._run_callback(handler, (fd, event))
+            with self.lock:
+                ready, self.ready = self.ready, deque()
+            for callback, args in ready:
+                self._run_callback(callback, args)
+            now = monotonic()
+            while self.timers and self.timers[0][0] <= now:
+                timer = heapq.heappop(self.timers)
+                if not timer[4]: self._run_callback(timer[2], timer[3])
+
+    def stop(self):
+        self.running = False
+
+    def _run_callback(self, callback, args):
+        try:
+            callback(*args)
+        except (KeyboardInterrupt, SystemExit):
+            raise
+        except Exception as e:
+            self.console.error("Unhandled Exception in {:s}: {:s}", getattr(callback, '__name__', str(callback)), str(e))
+
+    def _drain_wakeup(self, fd, event):
+        try:
+            while os.read(self.wake_r, 4096): pass
+        except OSError as e:
+            if e.errno != errno.EAGAIN: raise
+
+class Loop_Poller(object):
+    """ select.poll() compatible view of an Event_Loop, routes events to one handler """
+    def __init__(self, loop, handler):
+        self.loop = loop
+        self.handler = handler
+
+    def register(self, fd, mask):
+        self.loop.register(fd, mask, self.handler)
+
+    def modify(self, fd, mask):
+        self.loop.modify(fd, mask)
+
+    def unregister(self, fd):
+        self.loop.unregister(fd)
+
+class Loop_Queue(object):
+    """ Stand-in for a child rx_q, hands messages to the main state machine on the loop """
+    def __init__(self, loop, callback, source):
+        self.loop = loop
+        self.callback = callback
+        self.source = source
+
+    def put(self, msg):
+        self.loop.call_soon(self.callback, self.source, msg)
+
+class MD01_Loop_Client(MD01_Thread):
+    """
+    Non-blocking MD01 controller client driven by an Event_Loop.
+
+    Reuses the MD01_Thread feedback processing, rate fault detection and
+    SET/STOP decision logic, and the md01 codec and receive buffer.  Only
+    the socket I/O and pacing are replaced: connect, send and reply
+    waits are loop callbacks and the poll cadence is a loop timer.  The
+    thread itself is never started.
+    """
+    def __init__ (self, cfg, logger, parent, loop):
+        MD01_Thread.__init__(self, cfg, logger, parent)
+        self.loop           = loop
+        self.sock           = None
+        self.pending        = None  #reply being waited for: 'INIT', 'STATUS', 'STOP'
+        self.exch_t0        = None
+        self.reply_timer    = None
+        self.cycle_timer    = None
+        self.stop_requested = False #STOP requested by main thread, sent next cycle
+
+    def attach(self):
+        self.console.info("{:s} MD01 Loop Client Started", self.ssid)
+        self.logger.info("{:s} MD01 Loop Client Started".format(self.ssid))
+        self.console.info("MD-01 Poll Rate [s]: {:3.3f}", self.poll_rate)
+        self.logger.info("MD-01 Poll Rate [s]: {:3.3f}".format(self.poll_rate))
+        self._connect()
+
+    #### CONNECTION ####
+    def _connect(self):
+        if self._stop.isSet(): return
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setblocking(0)
+        self.md01.rx_buf.clear()
+        err = self.sock.connect_ex((self.ip, self.port))
+        if err not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+            self._connect_failed()
+            return
+        self.loop.register(self.sock.fileno(), select.POLLOUT, self._on_connect)
+        self.reply_timer = self.loop.call_later(self.timeout, self._connect_failed)
+
+    def _on_connect(self, fd, event):
+        self.loop.cancel(self.reply_timer)
+        err = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if err != 0 or (event & (select.POLLERR | select.POLLHUP)):
+            self._connect_failed()
+            return
+        self.loop.modify(fd, select.POLLIN)
+        self.loop.handlers[fd] = self._on_readable
+        self.md01.sock = self.sock
+        self.md01.connected = True
+        self.md01.status['connected'] = True
+        self.console.info("Connected to {:s} MD01 Controller", self.ssid)
+        self.logger.info("Connected to {:s} MD01 Controller".format(self.ssid))
+        self._exchange(self.md01.status_cmd, 'INIT')
+
+    def _connect_failed(self):
+        self._close_sock()
+        self.cycle_timer = self.loop.call_later(self.timeout, self._connect) #try to reconnect
+
+    def _close_sock(self):
+        self.loop.cancel(self.reply_timer)
+        self.loop.cancel(self.cycle_timer)
+        if self.sock != None:
+            self.loop.unregister(self.sock.fileno())
+            self.sock.close()
+            self.sock = None
+        self.pending = None
+        self.md01.connected = False
+
+    def _disconnect(self, reason):
+        self.console.warning("MD01 connection lost: {:s}", reason)
+        self.logger.info("MD01 connection lost: {:s}".format(reason))
+        self._close_sock()
+        self.status = self.md01._set_bad_status()
+        self._process_md01_status() #notifies main thread of disconnection
+        self.cycle_timer = self.loop.call_later(self.timeout, self._connect)
+
+    #### EXCHANGES ####
+    def _send(self, cmd):
+        try:
+            self.sock.sendall(cmd) #13-26 bytes, always fits an empty socket buffer
+            return True
+        except socket.error as e:
+            self._disconnect(str(e))
+            return False
+
+    def _exchange(self, cmd, kind):
+        self.exch_t0 = monotonic()
+        if self._send(cmd):
+            self.pending = kind
+            self.reply_timer = self.loop.call_later(self.timeout, self._disconnect, 'reply timeout')
+
+    def _on_readable(self, fd, event):
+        try:
+            data = self.sock.recv(self.md01.rx_buf.chunk_size)
+        except socket.error as e:
+            if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK): return
+            data = ''
+        if not data:
+            self._disconnect('MD01 closed connection')
+            return
+        self.md01.rx_buf.feed(data)
+        frame = self.md01.rx_buf.pop_frame()
+        while frame != None and self.sock != None:
+            if len(frame) in STATUS_FRAME_LENS and self.pending != None:
+                self._on_reply(frame)
+            else: #corrupt or unsolicited frame
+                self.md01.rx_buf.dropped += len(frame)
+            frame = self.md01.rx_buf.pop_frame()
+
+    def _on_reply(self, frame):
+        self.loop.cancel(self.reply_timer)
+        kind, self.pending = self.pending, None
+        md01 = self.md01
+        md01.feedback = frame
+        md01.status['ts'] = md01.rx_buf.frame_ts
+        md01.status['mono'] = md01.rx_buf.frame_mono
+        md01.status['rtt'] = monotonic() - self.exch_t0
+        md01.rtt_stats.update(md01.status['rtt'])
+        md01._convert_feedback()
+        self.status = md01.status
+
+        if kind == 'INIT': #first feedback after connect
+            self._update_feedback()
+            self.last_time = self.status['ts']
+            self.last_mono = self.status['mono']
+            self.rate_est.start(self.status['mono'], self.status['cur_az'], self.status['cur_el'])
+            self.last_az = self.status['cur_az']
+            self.last_el = self.status['cur_el']
+            self.parent.set_md01_con_status(self.status['connected']) #notify main thread of connection
+            self.set_flag = False
+            self.coalescer.reset()
+            self.scheduler.start(delay=1.0) #fresh cadence for this connection
+            self._schedule_cycle()
+        elif kind == 'STOP':
+            self._update_feedback()
+            self._schedule_cycle()
+        else:
+            feedback_valid = self._process_md01_status()
+            if self._stop.isSet(): return #rate fault stopped the client
+            if feedback_valid and not self.pipeline:
+                action = self._check_set_flag()
+                if action == 'STOP':
+                    self.console.info('Sent \'STOP\' command to MD01')
+                    self._exchange(md01.stop_cmd, 'STOP')
+                    return
+                elif action == 'SET':
+                    if not self._send(self._prepare_set(md01.set_cmd)): return
+            self._schedule_cycle()
+
+    def _prepare_set(self, cmd):
+        #encode current target into cmd, set_cmd or the pipelined set_status_cmd
+        #Set Position command does not get a feedback response from MD-01
+        self.md01.cmd_az = self.tar_az
+        self.md01.cmd_el = self.tar_el
+        self.md01._format_set_cmd()
+        if cmd is not self.md01.set_cmd:
+            cmd[0:len(self.md01.set_cmd)] = self.md01.set_cmd
+        self.console.debug('Sending \'SET\' command to MD01: AZ={:3.1f}, EL={:3.1f}', self.md01.cmd_az, self.md01.cmd_el)
+        if self.logger.isEnabledFor(logging.DEBUG): #per SET, counted in the coalescer summary
+            self.logger.debug('Sending \'SET\' command to MD01: AZ={:3.1f}, EL={:3.1f}'.format(self.md01.cmd_az, self.md01.cmd_el))
+        return cmd
+
+    def _schedule_cycle(self):
+        #next poll on the scheduler deadline, not poll_rate after this reply
+        self.cycle_timer = self.loop.call_at(self.scheduler.deadline, self._cycle)
+
+    def _cycle(self):
+        if self.sock == None or self.pending != None: return
+        self.scheduler.tick()
+        if self.stop_requested:
+            self.stop_requested = False
+            self.coalescer.reset()
+            self._exchange(self.md01.stop_cmd, 'STOP')
+        elif self.pipeline: #SET and STATUS share one exchange
+            action = self._check_set_flag()
+            if action == 'STOP':
+                self._exchange(self.md01.stop_cmd, 'STATUS')
+            elif action == 'SET':
+                self._exchange(self._prepare_set(self.md01.set_status_cmd), 'STATUS')
+            else:
+                self._exchange(self.md01.status_cmd, 'STATUS')
+        else:
+            self._exchange(self.md01.status_cmd, 'STATUS')
+
+    #### FUNCTIONS CALLED BY MAIN ####
+    def set_stop(self):
+        #same thread as the poll callbacks, so applied directly and sent on the next cycle
+        self.ctl_q.put(('stop',))
+        self._apply_controls() #requests queued before the STOP are superseded
+        self.stop_requested = True
+
+    def stop_thread(self):
+        if self.sock != None: self._send(self.md01.stop_cmd)
+        self.console.info(self.md01.get_rtt_stats().summary())
+        self.logger.info(self.md01.get_rtt_stats().summary())
+        self.console.info(self.scheduler.summary())
+        self.logger.info(self.scheduler.summary())
+        self.console.info(self.coalescer.summary())
+        self.logger.info(self.coalescer.summary())
+        self._stop.set()
+        self._close_sock()
+        self.status['connected'] = False
+        self.parent.set_md01_con_status(self.status['connected']) #notify main thread of connection
+
+class Main_Loop(Main_Thread):
+    """
+    Main state machine for the single loop runtime.
+
+    Same states and message handling as Main_Thread.  Child messages and
+    connection changes are delivered as loop callbacks and state timers
+    are a periodic loop timer, so nothing blocks on a queue or sleep.
+    """
+    def __init__ (self, cfg, loop=None, logger=None):
+        Main_Thread.__init__(self, cfg, logger)
+        self.loop = loop if loop != None else Event_Loop()
+
+    def run(self):
+        self.console.info("Main Loop Started...")
+        self.logger.info('Launched main loop runtime')
+        try:
+            if not self._init_threads():
+                self.console.error("in FAULT state, exiting")
+                sys.exit()
+            self.logger.info('Successfully Launched Loop Clients, Switching to IDLE State')
+            self._set_state('IDLE')
+            self.loop.call_later(self.tick_interval, self._tick)
+            self.loop.run()
+        except (KeyboardInterrupt): #when you press ctrl+c
+            self.console.warning("Caught CTRL-C, Killing Threads...")
+            self.logger.warning('Caught CTRL-C, Terminating Threads...')
+            self._stop_threads()
+            self.logger.warning('Terminating Main Loop...')
+            sys.exit()
+        except SystemExit:
+            self.logger.warning('Terminating Main Loop...')
+        sys.exit()
+
+    def _tick(self):
+        self._on_state_event()
+        if getattr(self, 'service_thread', None) != None:
+            self.service_thread.service_tick() #client activity watchdogs
+        if self.loop.running:
+            self.loop.call_later(self.tick_interval, self._tick)
+
+    def _on_event(self, source, msg):
+        self._dispatch_event(source, msg)
+        self._on_state_event()
+
+    def _on_state_event(self):
+        if self.state == 'FAULT':
+            self.console.error("in FAULT state, exiting")
+            self._stop_threads()
+            self.loop.stop()
+        else:
+            self._step_state()
+
+    def _on_service_event(self, fd, event):
+        self.service_thread.handle_event(fd, event)
+        self.service_thread.service_tick()
+
+    ### Functions Called by child clients #####
+    def set_user_con_status(self, status):
+        self.user_con = status
+        self.loop.call_soon(self._on_state_event)
+
+    def set_md01_con_status(self, status):
+        self.md01_con = status
+        self.loop.call_soon(self._on_state_event)
+
+    def _init_threads(self):
+        try:
+            self.console.info('thread_enable: {}', self.thread_enable)
+            self.logger.info("Thread enable: {:s}".format(json.dumps(self.thread_enable)))
+            if self.thread_enable['service']:
+                self.logger.info('Setting up Service')
+                self.service_thread = Service_Thread(self.cfg['service'], self.logger, self)
+                self.service_thread.rx_q = Loop_Queue(self.loop, self._on_event, 'service')
+                self.service_thread.setup(Loop_Poller(self.loop, self._on_service_event))
+            if self.thread_enable['md01']:
+                self.logger.info('Setting up MD01 Loop Client')
+                self.md01_thread = MD01_Loop_Client(self.cfg['md01'], self.logger, self, self.loop)
+                self.md01_thread.rx_q = Loop_Queue(self.loop, self._on_event, 'md01')
+                self.md01_thread.attach()
+            return True
+        except Exception as e:
+            self.logger.error('Error Launching Loop Clients:', exc_info=True)
+            self.logger.warning('Setting STATE --> FAULT')
+            self._set_state('FAULT')
+            return False
+
+    def _stop_threads(self):
+        if self.thread_enable['service']:
+            self.service_thread.teardown()
+            self.console.warning("Terminated Service.")
+            self.logger.warning("Terminated Service.")
+        if self.thread_enable['md01']:
+            if not self.md01_thread.stopped():
+                self.md01_thread.stop_thread()
+            self.console.warning("Terminated MD01 Loop Client...")
+            self.logger.warning("Terminated MD01 Loop Client...")
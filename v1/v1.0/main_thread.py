@@ -20,25 +20,64 @@ import json
 import binascii
 import datetime
 import uuid
+from Queue import Queue, Empty
 from logger import *
+from console import *
 
 #import threads
 from service_thread import *
 from md01_thread import *
 
+class Tagged_Queue(object):
+    """
+    Stand-in for a child thread's rx_q.  Messages put by the child are
+    tagged with their source and posted to the main thread's event queue,
+    so the main thread wakes as soon as any child has work.
+    """
+    def __init__(self, event_q, source):
+        self.event_q = event_q
+        self.source = source
+
+    def put(self, msg):
+        self.event_q.put((self.source, msg))
+
+class Event_Ticker(threading.Thread):
+    """ Posts a 'tick' event at a fixed interval to drive state machine timers """
+    def __init__(self, event_q, interval):
+        threading.Thread.__init__(self, name = 'Ticker')
+        self._stop      = threading.Event()
+        self.event_q    = event_q
+        self.interval   = interval
+        self.daemon     = True
+
+    def run(self):
+        next_tick = time.time() + self.interval
+        while (not self._stop.isSet()):
+            time.sleep(max(0.0, next_tick - time.time()))
+            next_tick += self.interval
+            self.event_q.put(('tick', None))
+
+    def stop(self):
+        self._stop.set()
+
 class Main_Thread(threading.Thread):
     """ docstring """
-    def __init__ (self, cfg):
+    def __init__ (self, cfg, logger=None):
         threading.Thread.__init__(self, name = 'Main   ')
         self._stop      = threading.Event()
         self.cfg = cfg
         self.thread_enable = self.cfg['thread_enable']
-
-        log_name = 'trackd_{:s}'.format(self.cfg['ssid'])
-        self.main_log_fh = setup_logger(log_name,
-                                        path=self.cfg['log_path'],
-                                        ts=self.cfg['startup_ts'])
-        self.logger = logging.getLogger(log_name) #main logger
+        self.console = get_console('main')
+
+        if logger == None:
+            log_name = 'trackd_{:s}'.format(self.cfg['ssid'])
+            self.main_log_fh = setup_logger(log_name,
+                                            path=self.cfg['log_path'],
+                                            ts=self.cfg['startup_ts'],
+                                            async_cfg=self.cfg.get('log_async'))
+            self.logger = logging.getLogger(log_name) #main logger
+        else: #shared logger, multi antenna daemon
+            self.logger = logger
         self.logger.info("configs: {:s}".format(json.dumps(self.cfg)))
 
         self.state  = 'BOOT' #BOOT, IDLE, STANDBY, ACTIVE, FAULT, CALIBRATE
@@ -64,8 +103,14 @@ class Main_Thread(threading.Thread):
         self._tc_msg = self.cfg['messages']['tc']
         self._tc_msg['type'] = 'tc'
 
+        #Unified event queue, (source, msg) from child threads, connection changes and ticks
+        #Blocking get() wakes immediately on any event, ticks keep state timers on schedule
+        self.event_q = Queue()
+        self.tick_interval = self.cfg.get('tick_interval', 0.1) #[s]
+        self.ticker = Event_Ticker(self.event_q, self.tick_interval)
+
     def run(self):
-        print "Main Thread Started..."
+        self.console.info("Main Thread Started...")
         self.logger.info('Launched main thread')
         try:
             while (not self._stop.isSet()):
@@ -79,33 +124,23 @@ class Main_Thread(threading.Thread):
                     #else:
                     #    self._set_state('FAULT')
                 elif self.state == 'FAULT':
-                    print "in FAULT state, exiting"
+                    self.console.error("in FAULT state, exiting")
                     sys.exit()
                 else:# NOT IN BOOT State
-                    #Always check for service message
-                    if (self.thread_enable['service'] and (not self.service_thread.rx_q.empty())): #Received a message from user
-                        msg = self.service_thread.rx_q.get()
-                        self._process_service_message(msg)
-                    if (self.thread_enable['md01'] and (not self.md01_thread.rx_q.empty())):
-                        msg = self.md01_thread.rx_q.get()
-                        self._process_md01_message(msg)
-
-                    if self.state == 'IDLE':
-                        self._do_idle() #wait for user conn AND mdo1 conn
-
-                    elif self.state == 'STANDBY':
-                        self._do_standby()
-
-                    elif self.state == 'ACTIVE':
-                        self._do_active()
-
-                    elif self.state == 'CALIBRATE':
-                        self._do_calibrate()
-
-                time.sleep(0.1)
+                    #Block until a child thread posts work or the ticker fires
+                    source, msg = self.event_q.get()
+                    self._dispatch_event(source, msg)
+                    #drain everything else pending as one batch
+                    while True:
+                        try:
+                            source, msg = self.event_q.get_nowait()
+                        except Empty:
+                            break
+                        self._dispatch_event(source, msg)
+                    self._step_state()
 
         except (KeyboardInterrupt): #when you press ctrl+c
-            print "\n"+self.utc_ts() + "Caught CTRL-C, Killing Threads..."
+            self.console.warning("Caught CTRL-C, Killing Threads...")
             self.logger.warning('Caught CTRL-C, Terminating Threads...')
             self._stop_threads()
             self.logger.warning('Terminating Main Thread...')
@@ -114,6 +149,19 @@ class Main_Thread(threading.Thread):
             self.logger.warning('Terminating Main Thread...')
         sys.exit()
 
+    def _step_state(self):
+        if self.state == 'IDLE':
+            self._do_idle() #wait for user conn AND mdo1 conn
+
+        elif self.state == 'STANDBY':
+            self._do_standby()
+
+        elif self.state == 'ACTIVE':
+            self._do_active()
+
+        elif self.state == 'CALIBRATE':
+            self._do_calibrate()
+
     def _do_idle(self):
         #print self.user_con, self.md01_con
         #if self.user_con and self.md01_con:
@@ -128,8 +176,7 @@ class Main_Thread(threading.Thread):
         pass
 
     def _do_active(self):
-
-        pass
+        self._check_con_status()
 
     def _do_calibrate(self):
         pass
@@ -151,48 +198,65 @@ class Main_Thread(threading.Thread):
                 self._set_state('IDLE')
 
 
+    def _dispatch_event(self, source, msg):
+        if source == 'service':
+            self._process_service_message(msg)
+        elif source == 'md01':
+            self._process_md01_message(msg)
+        #'tick' and 'con' events only wake the state machine
+
     def _process_service_message(self, msg):
+        if 'trace' in msg: msg['trace']['main_rx'] = time.time() #latency benchmark stage stamp
         #validate message?
         if self.state == 'STANDBY':
             if msg['type'] == 'tc':
                 if msg['cmd'] == 'start':
-                    print '{:s}User \'{:s}\' requested session START'.format(self.utc_ts(), msg['user'])
-                    self.logger.info("User \'{:s}\' requested session START".format(msg['user']))
-                    self.user = msg['user']
-                    self._start_active_session(msg['user'])
-                    pass
+                    self.console.info('User \'{:s}\' requested session START', str(msg.get('uid')))
+                    self.logger.info("User \'{:s}\' requested session START".format(str(msg.get('uid'))))
+                    self._start_active_session(msg.get('uid'))
                 if msg['cmd'] == 'query':
-                    self.md01_thread.get_feedback()
+                    self.md01_thread.get_feedback(msg.get('trace'), msg.get('client'))
+                if msg['cmd'] == 'history':
+                    self.md01_thread.get_history(msg.get('params'), msg.get('trace'), msg.get('client'))
 
         elif self.state == 'ACTIVE':
             #validate message
             if msg['type'] == 'tc':
                 if msg['cmd'] == 'stop':
-                    print '{:s}User \'{:s}\' requested session STOP'.format(self.utc_ts(), msg['user'])
-                    self.logger.info("User \'{:s}\' requested session STOP".format(msg['user']))
-                    pass
+                    self.console.info('User \'{:s}\' requested session STOP', str(msg.get('uid')))
+                    self.logger.info("User \'{:s}\' requested session STOP".format(str(msg.get('uid'))))
+                    self.md01_thread.set_stop()
+                    self._set_state('STANDBY')
                 if msg['cmd'] == 'query':
-                    pass
+                    self.md01_thread.get_feedback(msg.get('trace'), msg.get('client'))
+                if msg['cmd'] == 'history':
+                    self.md01_thread.get_history(msg.get('params'), msg.get('trace'), msg.get('client'))
                 if msg['cmd'] == 'set':
-                    self.tar_az = self.msg['params']['az']
-                    self.tar_el = self.msg['params']['el']
-        print msg
+                    self.md01_thread.set_position(float(msg['params']['az']), float(msg['params']['el']))
+                if msg['cmd'] == 'trajectory': #whole pass, interpolated by the md01 thread each poll
+                    self.md01_thread.load_trajectory(msg.get('params'), msg.get('trace'), msg.get('client'))
+                if msg['cmd'] == 'tle': #pass predicted on the daemon from a TLE
+                    self.md01_thread.load_tle(msg.get('params'), msg.get('trace'), msg.get('client'))
+        self.console.debug('Service message: {}', msg)
 
     def _process_md01_message(self, msg):
         self._format_user_feedback(msg)
 
     def _format_user_feedback(self,msg):
         new_msg = msg
-        print 'main', new_msg
+        if 'trace' in new_msg: new_msg['trace']['main_tx'] = time.time()
+        self.console.debug('Feedback: {}', new_msg)
         self.service_thread.tx_q.put(new_msg)
 
 
     ### Functions Called by child threads #####
     def set_user_con_status(self, status):
         self.user_con = status
+        self.event_q.put(('con', status))
 
     def set_md01_con_status(self, status):
         self.md01_con = status
+        self.event_q.put(('con', status))
 
     def set_md01_thread_fault(self):
         self.md01_fault = True
@@ -202,17 +266,19 @@ class Main_Thread(threading.Thread):
     def _init_threads(self):
         try:
             #Initialize Threads
-            print 'thread_enable', self.thread_enable
+            self.console.info('thread_enable: {}', self.thread_enable)
             self.logger.info("Thread enable: {:s}".format(json.dumps(self.thread_enable)))
             for key in self.thread_enable.keys():
                 if self.thread_enable[key]:
                     if key == 'service': #Initialize Service Thread
                         self.logger.info('Setting up Service Thread')
                         self.service_thread = Service_Thread(self.cfg['service'], self.logger, self) #Service Thread
+                        self.service_thread.rx_q = Tagged_Queue(self.event_q, 'service')
                         self.service_thread.daemon = True
                     elif key == 'md01': #Initialize mD01 Thread
                         self.logger.info('Setting up MD01 Thread')
                         self.md01_thread = MD01_Thread(self.cfg['md01'], self.logger, self) #MD01 Thread
+                        self.md01_thread.rx_q = Tagged_Queue(self.event_q, 'md01')
                         self.md01_thread.daemon = True
             #Launch threads
             for key in self.thread_enable.keys():
@@ -223,6 +289,7 @@ class Main_Thread(threading.Thread):
                     elif key == 'md01': #Initialize Radio Thread
                         self.logger.info('Launching MD01 Thread')
                         self.md01_thread.start() #non-blocking
+            self.ticker.start()
             return True
         except Exception as e:
             self.logger.error('Error Launching Threads:', exc_info=True)
@@ -231,48 +298,63 @@ class Main_Thread(threading.Thread):
             return False
 
     def _stop_threads(self):
+        self.ticker.stop()
         for key in self.thread_enable.keys():
             if self.thread_enable[key]:
                 if key == 'service':
                     self.service_thread.stop()
-                    print self.utc_ts() + "Terminated Service Thread."
+                    self.console.warning("Terminated Service Thread.")
                     self.logger.warning("Terminated Service Thread.")
                     #self.service_thread.join() # wait for the thread to finish what it's doing
                 elif key == 'md01': #Initialize Radio Thread
                     self.md01_thread.stop_thread()
-                    print self.utc_ts() + "Terminated MD01 Thread..."
+                    self.console.warning("Terminated MD01 Thread...")
                     self.logger.warning("Terminated MD01 Thread...")
                     #self.md01_thread.join() # wait for the thread to finish what it's doing
 
 
     #---STATE FUNCTIONS----
+    def _start_active_session(self, user):
+        self.user = user
+        self._set_state('ACTIVE')
+
     def _start_thread_logging(self, ts, session_id):
-        ts = dt.datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+        ts = datetime.datetime.utcnow().strftime("%Y%m%d_%H%M%S")
         self.service_thread.start_logging(ts, session_id)
-        pass
+        self.md01_thread.start_logging(ts, session_id)
 
     def _send_session_start(self):
         pass
 
     def _stop_thread_logging(self):
-        pass
+        if getattr(self, 'md01_thread', None) != None: #threads may not be up yet
+            self.md01_thread.stop_logging()
+        if getattr(self, 'service_thread', None) != None:
+            self.service_thread.stop_logging()
+
+    def _stop_tracking(self):
+        #an uploaded pass is only followed during an ACTIVE session
+        if getattr(self, 'md01_thread', None) != None:
+            self.md01_thread.clear_trajectory()
 
     def set_state_fault(self):
         self._set_state('FAULT')
 
     def _set_state(self, state):
         self.state = state
-        if self.state in ['IDLE', 'STANDBY', 'FAULT']: self._stop_thread_logging()
+        if self.state in ['IDLE', 'STANDBY', 'FAULT']:
+            self._stop_thread_logging()
+            self._stop_tracking()
         elif self.state == 'ACTIVE':
             ts = dt.datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-            session_id = uuid.uuid4()
-            print self._utc_ts() + "Started Session ID: {:s}".format(self.session_id)
+            self.session_id = str(uuid.uuid4())
+            self.console.info("Started Session ID: {:s}", self.session_id)
             self.logger.info("Started Session ID: {:s}".format(self.session_id))
-            self._start_thread_logging(ts, ssid)
+            self._start_thread_logging(ts, self.session_id)
             self._send_session_start()
 
-        print self.utc_ts() + "Connection Status (USER/MD01): {0}/{1}".format(self.user_con, self.md01_con)
-        print self.utc_ts() + 'Changed STATE to: {:s}'.format(self.state)
+        self.console.info("Connection Status (USER/MD01): {0}/{1}", self.user_con, self.md01_con)
+        self.console.info('Changed STATE to: {:s}', self.state)
         self.logger.info("Connection Status (USER/MD01): {0}/{1}".format(self.user_con, self.md01_con))
         self.logger.info('Changed STATE to: {:s}'.format(self.state))
 
@@ -280,9 +362,6 @@ class Main_Thread(threading.Thread):
         return self.state
     #---END STATE FUNCTIONS----
 
-    def utc_ts(self):
-        return "{:s} | main | ".format(datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%fZ'))
-
     def stop(self):
         self._stop.set()
 
@@ -23,16 +23,247 @@ import threading
 import binascii
 import datetime
 import logging
+import struct
 import numpy
 
+from poll_scheduler import monotonic
+from console import *
+
+#### STATUS FRAME DECODER ####
+#MD01 status frame: 0x57,H1,H2,H3,H4,PH,V1,V2,V3,V4,PV,0x20, 12 bytes
+#(STATUS_MIN_LEN).  Some firmware adds a status byte ahead of the end flag,
+#13 bytes (STATUS_FRAME_LEN).
+#Each angle is four binary digits, hundreds/tens/ones/tenths, offset by 360 deg.
+#The four digit bytes are read as one big endian word and looked up in a table
+#built with the same arithmetic as the original per-byte conversion.
+STATUS_FRAME_LEN = 13
+STATUS_MIN_LEN   = 12
+STATUS_FRAME_LENS = (STATUS_MIN_LEN, STATUS_FRAME_LEN) #any other length is corrupt
+_STATUS_STRUCT   = struct.Struct('>xIBIB') #az digits, ph, el digits, pv
+
+def _angle_from_digits(d1, d2, d3, d4):
+    return (d1*100.0 + d2*10.0 + d3 + d4/10.0) - 360.0
+
+def _build_angle_table():
+    table = {}
+    for d1 in range(10):
+        for d2 in range(10):
+            for d3 in range(10):
+                for d4 in range(10):
+                    key = (d1 << 24) | (d2 << 16) | (d3 << 8) | d4
+                    table[key] = _angle_from_digits(d1, d2, d3, d4)
+    return table
+
+_ANGLE_TABLE = _build_angle_table()
+
+def _angle_from_word(word):
+    try:
+        return _ANGLE_TABLE[word]
+    except KeyError: #out of range digit, fall back to arithmetic
+        return _angle_from_digits(word >> 24, (word >> 16) & 0xFF, (word >> 8) & 0xFF, word & 0xFF)
+
+def decode_status(frame):
+    """
+    Decode a single MD01 status frame.
+
+    Args:
+        frame - bytes, bytearray or memoryview of at least 11 bytes.
+
+    Returns:
+        (az, el, ph, pv) tuple, angles in degrees.
+    """
+    az_word, ph, el_word, pv = _STATUS_STRUCT.unpack_from(frame)
+    return _angle_from_word(az_word), _angle_from_word(el_word), ph, pv
+
+def decode_status_batch(buf, frame_len=None):
+    """
+    Decode a buffer of concatenated MD01 status frames.
+
+    Intended for offline replay of recorded controller traffic.  Frames
+    are split the way Frame_Buffer does, each 0x57 start flag runs to the
+    next 0x20 end flag, so the 12 byte frame and the 13 byte variant with
+    a trailing status byte may be mixed.  frame_len restricts the accepted
+    length to one of them.  Frames of any other length are discarded.
+    Values match decode_status() exactly.
+
+    Returns:
+        (az, el, ph, pv) tuple of numpy arrays.
+    """
+    if frame_len == None: lens = STATUS_FRAME_LENS
+    else: lens = (frame_len,)
+    raw = numpy.frombuffer(buf, dtype=numpy.uint8)
+    starts = numpy.flatnonzero(raw == 0x57)
+    ends = numpy.flatnonzero(raw == 0x20)
+    i = numpy.searchsorted(ends, starts, 'right') #first end flag after each start
+    found = i < len(ends)
+    starts, ends = starts[found], ends[i[found]]
+    keep = numpy.in1d(ends - starts + 1, lens)
+    starts, ends = starts[keep], ends[keep]
+    starts = starts[numpy.unique(ends, return_index=True)[1]] #earliest start of each frame
+    d = raw[starts[:,None] + numpy.arange(11)].astype(numpy.float64)
+    az = (d[:,1]*100.0 + d[:,2]*10.0 + d[:,3] + d[:,4]/10.0) - 360.0
+    el = (d[:,6]*100.0 + d[:,7]*10.0 + d[:,8] + d[:,9]/10.0) - 360.0
+    return az, el, raw[starts+5].copy(), raw[starts+10].copy()
+
+#### SET COMMAND ENCODER ####
+#MD01 set frame: 0x57,H1,H2,H3,H4,PH,V1,V2,V3,V4,PV,0x2F,0x20
+#H1-H4/V1-V4 are the ASCII digits of the pulse count (angle + 360) * resolution.
+#Digits for every 4 digit pulse count are precomputed so encoding is a table
+#lookup and a slice assignment into the caller's preallocated frame.
+_PULSE_MAX    = 9999
+_PULSE_DIGITS = [bytearray('{:04d}'.format(n).encode('ascii')) for n in range(_PULSE_MAX+1)]
+
+def set_pulses(az, el, ph=10, pv=10):
+    """
+    Pulse counts a SET command carries for az/el.
+
+    Angles are clamped to the MD01 range and converted using the
+    controller reported ph/pv resolutions, counts beyond four digits are
+    limited to 9999.  Two targets with equal counts are the same command.
+
+    Returns:
+        (az_pulse, el_pulse, az, el) with the clamped angles.
+    """
+    #azimuth -180 to +540, elevation 0 to 180
+    if   (az > 540): az = 540
+    elif (az < -180): az = -180
+    if   (el < 0): el = 0
+    elif (el > 180): el = 180
+    az_pulse = int((az + 360.0) * ph)
+    el_pulse = int((el + 360.0) * pv)
+    if az_pulse > _PULSE_MAX: az_pulse = _PULSE_MAX
+    if el_pulse > _PULSE_MAX: el_pulse = _PULSE_MAX
+    return az_pulse, el_pulse, az, el
+
+def encode_set(frame, az, el, ph=10, pv=10):
+    """
+    Encode a SET command into an existing 13 byte frame, in place.
+
+    Pulse counts are from set_pulses and written as four ASCII digits.
+
+    Returns:
+        (az, el) clamped angles actually encoded.
+    """
+    az_pulse, el_pulse, az, el = set_pulses(az, el, ph, pv)
+    frame[1:5]  = _PULSE_DIGITS[az_pulse]
+    frame[5]    = ph
+    frame[6:10] = _PULSE_DIGITS[el_pulse]
+    frame[10]   = pv
+    return az, el
+
+class Frame_Buffer(object):
+    """
+    Persistent receive buffer for MD01 frames.
+
+    Bytes are fed in bulk as they are read from the socket and complete
+    0x57...0x20 frames are split out.  Garbage ahead of a start flag is
+    discarded so the buffer resyncs on the next valid frame, and a frame
+    runs from the last start flag before its end flag, so line noise
+    holding a stray 0x57 is discarded too.  Partial
+    frames are kept between calls.  frame_ts holds the UTC time the first
+    byte of the most recently popped frame arrived, frame_mono the same
+    instant on the monotonic clock for computing intervals.
+    """
+    START_FLAG  = b'\x57'
+    END_FLAG    = b'\x20'
+
+    def __init__(self, chunk_size=4096):
+        self.chunk_size = chunk_size    #max bytes per socket read
+        self.buf        = bytearray()   #received, unprocessed bytes
+        self.start_ts   = None          #arrival time of pending frame start flag
+        self.frame_ts   = None          #arrival time of last popped frame
+        self.last_ts    = None          #arrival time of last fed chunk
+        self.start_mono = None          #monotonic clock equivalents of the above
+        self.frame_mono = None
+        self.last_mono  = None
+        self.dropped    = 0             #count of garbage bytes discarded
+
+    def clear(self):
+        del self.buf[:]
+        self.start_ts = None
+        self.frame_ts = None
+        self.last_ts  = None
+        self.start_mono = None
+        self.frame_mono = None
+        self.last_mono  = None
+
+    def feed(self, data, ts=None, mono=None):
+        if ts == None: ts = datetime.datetime.utcnow()
+        if mono == None: mono = monotonic()
+        self.last_ts = ts
+        self.last_mono = mono
+        self.buf.extend(data)
+        self._resync(ts, mono)
+
+    def pop_frame(self):
+        #returns next complete frame as bytes, None if no complete frame buffered
+        if len(self.buf) == 0 or self.buf[0:1] != self.START_FLAG:
+            return None
+        end = self.buf.find(self.END_FLAG, 1)
+        if end < 0:
+            return None
+        start = self.buf.rfind(self.START_FLAG, 0, end) #0x57 never occurs in a frame body
+        self.dropped += start
+        frame = bytes(self.buf[start:end+1])
+        del self.buf[:end+1]
+        self.frame_ts = self.start_ts
+        self.frame_mono = self.start_mono
+        self.start_ts = None
+        self.start_mono = None
+        if len(self.buf) > 0: self._resync(self.last_ts, self.last_mono)
+        return frame
+
+    def _resync(self, ts, mono):
+        #discard bytes preceding the next start flag
+        if self.start_ts != None: return #already aligned on a pending frame
+        start = self.buf.find(self.START_FLAG)
+        if start < 0:
+            self.dropped += len(self.buf)
+            del self.buf[:]
+        else:
+            if start > 0:
+                self.dropped += start
+                del self.buf[:start]
+            self.start_ts = ts
+            self.start_mono = mono
+
+class RTT_Stats(object):
+    """ Running round trip time statistics for MD01 exchanges, seconds """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count  = 0
+        self.last   = None
+        self.min    = None
+        self.max    = None
+        self.total  = 0.0
+
+    def update(self, rtt):
+        self.count += 1
+        self.last   = rtt
+        self.total += rtt
+        if self.min == None or rtt < self.min: self.min = rtt
+        if self.max == None or rtt > self.max: self.max = rtt
+
+    def mean(self):
+        if self.count == 0: return None
+        return self.total / self.count
+
+    def summary(self):
+        if self.count == 0: return "RTT: no exchanges"
+        return "RTT [ms] (n={:d}): last={:3.3f}, min={:3.3f}, mean={:3.3f}, max={:3.3f}".format(
+                    self.count, self.last*1000, self.min*1000, self.mean()*1000, self.max*1000)
+
 class md01(object):
     """docstring for ."""
     def __init__ (self, cfg, logger, name='md01'):
         self.cfg        = cfg
         self.logger     = logger
         self.name       = name
+        self.console    = get_console('md01_io')
 
-        print self._utc_ts() + "Initializing {:s} MD01 Interface".format(self.cfg['ssid'])
+        self.console.info("Initializing {:s} MD01 Interface", self.cfg['ssid'])
         self.logger.info("Initializing {:s} MD01 Interface".format(self.cfg['ssid']))
 
         self.ip         = self.cfg['ip']        #IP Address of MD01 Controller
@@ -48,13 +279,17 @@ class md01(object):
         self.ph         = 10        #  Azimuth Resolution, in pulses per degree, from feedback, default = 10
         self.pv         = 10        #Elevation Resolution, in pulses per degree, from feedback, default = 10
         self.feedback   = ''        #Feedback data from socket
+        self.rx_buf     = Frame_Buffer() #Persistent receive buffer for MD01 frames
 
         self.status = {
             'ts': None,
+            'mono':None,
             'connected':False,
             'cur_az': 0.0,
-            'cur_el':0.0
+            'cur_el':0.0,
+            'rtt':None
         }
+        self.rtt_stats  = RTT_Stats()  #round trip time of STATUS/STOP exchanges
 
         self.stop_cmd   = bytearray()   #Stop Command Message
         self.status_cmd = bytearray()   #Status Command Message
@@ -62,14 +297,13 @@ class md01(object):
         for x in [0x57,0,0,0,0,0,0,0,0,0,0,0x0F,0x20]: self.stop_cmd.append(x)
         for x in [0x57,0,0,0,0,0,0,0,0,0,0,0x1F,0x20]: self.status_cmd.append(x)
         for x in [0x57,0,0,0,0,0x0a,0,0,0,0,0x0a,0x2F,0x20]: self.set_cmd.append(x) #PH=PV=0x0a, 0x0a = 10, BIG-RAS/HR is 10 pulses per degree
-
-    def _utc_ts(self):
-        return "{:s} | md01 | ".format(datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%fZ'))
+        self.set_status_cmd = self.set_cmd + self.status_cmd #Pipelined SET + STATUS, sent in one write
 
     def connect(self):
         #connect to md01 controller
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM) #TCP Socket
         self.sock.settimeout(self.timeout)   #set socket timeout
+        self.rx_buf.clear()  #drop any partial frame from previous connection
         try:
             self.sock.connect((self.ip, self.port))
             time.sleep(0.1)
@@ -91,10 +325,11 @@ class md01(object):
         #print self.getTimeStampGMT() + "MD01 |  Attempting to disconnect from MD01 Controller"
         self.sock.shutdown(socket.SHUT_RDWR)
         self.sock.close()
+        self.rx_buf.clear()
         self.connected = False
         self.status['connected'] = self.connected
         self.status['ts'] = None #clear rx timestamp
-        print self._utc_ts() + "Disconnected from {:s} MD01 Controller".format(self.ssid)
+        self.console.info("Disconnected from {:s} MD01 Controller", self.ssid)
         self.logger.info("Disconnected from {:s} MD01 Controller".format(self.ssid))
         return self.connected
 
@@ -105,11 +340,9 @@ class md01(object):
         else:
             try:
                 #print 'sending STATUS'
-                self.sock.send(self.status_cmd)
+                self._exchange(self.status_cmd)
                 #print self._utc_ts() + 'Sent \'GET\' command to MD01'
-                self.feedback = self._recv_data()
                 #print binascii.hexlify(self.feedback)
-                self._convert_feedback()
             except socket.error as e:
                 self._Handle_Socket_Exception(e)
             return self.status #return 0 good status, feedback az/el
@@ -120,11 +353,9 @@ class md01(object):
             self._set_bad_status()
         else:
             try:
-                self.sock.send(self.stop_cmd)
-                print self._utc_ts() + 'Sent \'STOP\' command to MD01'
+                self._exchange(self.stop_cmd)
+                self.console.info('Sent \'STOP\' command to MD01')
                 self.logger.info('Sent \'STOP\' command to MD01')
-                self.feedback = self._recv_data()
-                self._convert_feedback()
             except socket.error as e:
                 self._Handle_Socket_Exception(e)
             return self.status #return 0 good status, feedback az/el
@@ -139,103 +370,87 @@ class md01(object):
         else:
             try:
                 self.sock.send(self.set_cmd)
-                print self._utc_ts() + 'Sent \'SET\' command to MD01: AZ={:3.1f}, EL={:3.1f}'.format(self.cmd_az, self.cmd_el)
-                self.logger.info('Sent \'SET\' command to MD01: AZ={:3.1f}, EL={:3.1f}'.format(self.cmd_az, self.cmd_el))
+                self.console.debug('Sent \'SET\' command to MD01: AZ={:3.1f}, EL={:3.1f}', self.cmd_az, self.cmd_el)
+                if self.logger.isEnabledFor(logging.DEBUG): #per SET, counted in the coalescer summary
+                    self.logger.debug('Sent \'SET\' command to MD01: AZ={:3.1f}, EL={:3.1f}'.format(self.cmd_az, self.cmd_el))
                 #Set Position command does not get a feedback response from MD-01
-            except socket.error as msg:
+            except socket.error as e:
                 self._Handle_Socket_Exception(e)
             return self.status #return 0 good status, feedback az/el
 
+    def set_position_get_status(self, az, el):
+        #pipelined exchange: SET and STATUS written back to back in one send
+        #MD01 does not reply to SET, so only the single STATUS reply is read
+        self.cmd_az = az
+        self.cmd_el = el
+        self._format_set_cmd()
+        if self.connected == False:
+            return self._set_bad_status()
+        else:
+            try:
+                self.set_status_cmd[0:len(self.set_cmd)] = self.set_cmd
+                self._exchange(self.set_status_cmd)
+                self.console.debug('Sent \'SET+STATUS\' command to MD01: AZ={:3.1f}, EL={:3.1f}, RTT={:3.3f} [ms]', self.cmd_az, self.cmd_el, self.status['rtt']*1000)
+                if self.logger.isEnabledFor(logging.DEBUG):
+                    self.logger.debug('Sent \'SET+STATUS\' command to MD01: AZ={:3.1f}, EL={:3.1f}, RTT={:3.3f} [ms]'.format(self.cmd_az, self.cmd_el, self.status['rtt']*1000))
+            except socket.error as e:
+                self._Handle_Socket_Exception(e)
+            return self.status #return 0 good status, feedback az/el
+
+    def get_rtt_stats(self):
+        return self.rtt_stats
+
     #### PRIVATE FUNCTION CALLS ####
+    def _exchange(self, cmd):
+        #send command frame(s), wait for single feedback frame, record round trip time
+        t0 = monotonic()
+        self.sock.sendall(cmd)
+        self.feedback = self._recv_data()
+        self.status['rtt'] = monotonic() - t0
+        self.rtt_stats.update(self.status['rtt'])
+        self._convert_feedback()
+
     def _Handle_Socket_Exception(self, e):
         self.logger.info("Socket Exception Thrown: {:s}".format(str(e)))
         self.logger.info("Shutting Down Socket...")
         self.sock.close()
+        self.rx_buf.clear()
         self._set_bad_status()
 
     def _set_bad_status(self):
-        print self._utc_ts() + 'bad status'
+        self.console.warning('bad status')
         self.status['ts'] = None
+        self.status['mono'] = None
         self.status['connected'] = False
         self.status['cur_az'] = 0.0
         self.status['cur_el'] = 0.0
+        self.status['rtt'] = None
         return self.status
 
     def _recv_data(self):
         #reset RX Timestamp
         self.status['ts'] = None
         self.status['connected'] = True
-        #receive socket data
-        feedback = ''
-        while True: #cycle through recv buffer
-            c = self.sock.recv(1)
-            #print c, binascii.hexlify(c)
-            if binascii.hexlify(c) == '57': # Start Flag detected
-            #if c == 0x57: # Start Flag detected
-                #print 'ping'
-                if self.status['ts'] == None: #set timestamp on first valid character
-                    self.status['ts'] = datetime.datetime.utcnow()
-                feedback += c
-                flag = True
-                while flag: #continue cycling through receive buffer
-                    c = self.sock.recv(1)
-                    #print c, binascii.hexlify(c)
-                    if binascii.hexlify(c) == '20':
-                    #if c == 0x20:
-                        feedback += c
-                        flag = False
-                    else:
-                        feedback += c
-                break
-        #print binascii.hexlify(feedback)
-        return feedback
+        #pull next complete frame from receive buffer, read in bulk as needed
+        frame = self.rx_buf.pop_frame()
+        while frame == None or len(frame) not in STATUS_FRAME_LENS:
+            if frame != None: #truncated/corrupt frame, discard and read the next
+                self.rx_buf.dropped += len(frame)
+            else:
+                data = self.sock.recv(self.rx_buf.chunk_size)
+                if not data: #MD01 closed the connection
+                    raise socket.error('MD01 closed connection')
+                self.rx_buf.feed(data)
+            frame = self.rx_buf.pop_frame()
+        self.status['ts'] = self.rx_buf.frame_ts #timestamp of first valid character
+        self.status['mono'] = self.rx_buf.frame_mono #same instant, monotonic clock
+        #print binascii.hexlify(frame)
+        return frame
 
     def _convert_feedback(self):
-        h1 = ord(self.feedback[1])
-        h2 = ord(self.feedback[2])
-        h3 = ord(self.feedback[3])
-        h4 = ord(self.feedback[4])
-        #print h1, h2, h3, h4
-        self.status['cur_az'] = (h1*100.0 + h2*10.0 + h3 + h4/10.0) - 360.0
-        #print self.status['cur_az']
-        self.ph = ord(self.feedback[5])
-
-        v1 = ord(self.feedback[6])
-        v2 = ord(self.feedback[7])
-        v3 = ord(self.feedback[8])
-        v4 = ord(self.feedback[9])
-        self.status['cur_el'] = (v1*100.0 + v2*10.0 + v3 + v4/10.0) - 360.0
-        #print self.status['cur_el']
-        self.pv = ord(self.feedback[10])
+        self.status['cur_az'], self.status['cur_el'], self.ph, self.pv = decode_status(self.feedback)
         #print self.status
 
     def _format_set_cmd(self):
-        #make sure cmd_az in range -180 to +540
-        if   (self.cmd_az>540): self.cmd_az = 540
-        elif (self.cmd_az < -180): self.cmd_az = -180
-        #make sure cmd_el in range 0 to 180
-        if   (self.cmd_el < 0): self.cmd_el = 0
-        elif (self.cmd_el>180): self.cmd_el = 180
-        #convert commanded az, el angles into strings
-        cmd_az_str = str(int((float(self.cmd_az) + 360) * self.ph))
-        cmd_el_str = str(int((float(self.cmd_el) + 360) * self.pv))
-        #print target_az, len(target_az)
-        #ensure strings are 4 characters long, pad with 0s as necessary
-        if   len(cmd_az_str) == 1: cmd_az_str = '000' + cmd_az_str
-        elif len(cmd_az_str) == 2: cmd_az_str = '00'  + cmd_az_str
-        elif len(cmd_az_str) == 3: cmd_az_str = '0'   + cmd_az_str
-        if   len(cmd_el_str) == 1: cmd_el_str = '000' + cmd_el_str
-        elif len(cmd_el_str) == 2: cmd_el_str = '00'  + cmd_el_str
-        elif len(cmd_el_str) == 3: cmd_el_str = '0'   + cmd_el_str
-        #print target_az, len(str(target_az)), target_el, len(str(target_el))
-        #update Set Command Message
-        self.set_cmd[1] = cmd_az_str[0]
-        self.set_cmd[2] = cmd_az_str[1]
-        self.set_cmd[3] = cmd_az_str[2]
-        self.set_cmd[4] = cmd_az_str[3]
-        self.set_cmd[5] = self.ph
-        self.set_cmd[6] = cmd_el_str[0]
-        self.set_cmd[7] = cmd_el_str[1]
-        self.set_cmd[8] = cmd_el_str[2]
-        self.set_cmd[9] = cmd_el_str[3]
-        self.set_cmd[10] = self.pv
+        #clamp commanded angles and update Set Command Message in place
+        self.cmd_az, self.cmd_el = encode_set(self.set_cmd, self.cmd_az, self.cmd_el, self.ph, self.pv)
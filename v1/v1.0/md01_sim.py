@@ -0,0 +1,318 @@
+#!/usr/bin/env python
+#############################################
+#   Title: MD01 Controller Simulator        #
+# Project: VTGS Tracking Daemon             #
+# Version: 1.0                              #
+# Comment:                                  #
+#   Software emulation of one or more SPID  #
+#   MD-01 controllers for load and latency  #
+#   testing of the daemon without hardware. #
+#   All rotators are served from a single   #
+#   poll() loop in one thread.              #
+#############################################
+
+import threading
+import socket
+import select
+import errno
+import heapq
+import random
+import time
+import sys
+import argparse
+import datetime
+
+from md01 import Frame_Buffer
+
+CMD_STOP    = 0x0F
+CMD_STATUS  = 0x1F
+CMD_SET     = 0x2F
+
+#default slew rate, under the az_thresh/el_thresh (2.0/3.0 deg/s) of the
+#shipped configs so the daemon's runaway check does not fault on a sim
+SIM_SPEED   = 1.5
+
+class Sim_Rotator(object):
+    """
+    Emulated MD-01 controller and rotator.
+
+    Models constant rate az/el slew toward the commanded position and
+    answers STATUS and STOP with a feedback frame.  SET is not answered,
+    same as the real controller.
+
+    Args:
+        az, el - initial position, degrees.
+        az_speed, el_speed - slew rates, deg/s.
+        ph, pv - pulse resolutions reported to the client, pulses/deg.
+        latency - reply delay, seconds.
+        jitter - max additional uniform random reply delay, seconds.
+        drop - probability a reply is never sent.
+        garble - probability a reply is corrupted on the wire.
+    """
+    def __init__(self, az=180.0, el=0.0, az_speed=SIM_SPEED, el_speed=SIM_SPEED, ph=10, pv=10,
+                 latency=0.0, jitter=0.0, drop=0.0, garble=0.0, seed=None):
+        self.az         = float(az)
+        self.el         = float(el)
+        self.tar_az     = self.az
+        self.tar_el     = self.el
+        self.az_speed   = az_speed
+        self.el_speed   = el_speed
+        self.ph         = ph
+        self.pv         = pv
+        self.latency    = latency
+        self.jitter     = jitter
+        self.drop       = drop
+        self.garble     = garble
+        self.rand       = random.Random(seed)
+        self.last_time  = None
+
+        self.counts = {'status':0, 'stop':0, 'set':0, 'invalid':0, 'dropped':0, 'garbled':0}
+
+    def update(self, now):
+        #advance az/el toward target at slew rate
+        if self.last_time != None:
+            dt = now - self.last_time
+            self.az = self._slew(self.az, self.tar_az, self.az_speed * dt)
+            self.el = self._slew(self.el, self.tar_el, self.el_speed * dt)
+        self.last_time = now
+
+    def handle_cmd(self, frame, now):
+        """ Process one command frame, returns (reply delay, reply bytes) or None """
+        self.update(now)
+        frame = bytearray(frame)
+        if len(frame) != 13:
+            self.counts['invalid'] += 1
+            return None
+        cmd = frame[11]
+        if cmd == CMD_SET:
+            self.counts['set'] += 1
+            self.tar_az, self.tar_el = self._decode_set(frame)
+            return None
+        elif cmd == CMD_STOP:
+            self.counts['stop'] += 1
+            self.tar_az = self.az
+            self.tar_el = self.el
+        elif cmd == CMD_STATUS:
+            self.counts['status'] += 1
+        else:
+            self.counts['invalid'] += 1
+            return None
+
+        if self.drop > 0 and self.rand.random() < self.drop:
+            self.counts['dropped'] += 1
+            return None
+        reply = self._encode_status(cmd)
+        if self.garble > 0 and self.rand.random() < self.garble:
+            self.counts['garbled'] += 1
+            reply = self._garble(reply)
+        delay = self.latency
+        if self.jitter > 0: delay += self.rand.uniform(0, self.jitter)
+        return delay, bytes(reply)
+
+    def _slew(self, cur, tar, step):
+        if abs(tar - cur) <= step: return tar
+        if tar > cur: return cur + step
+        return cur - step
+
+    def _decode_set(self, frame):
+        #H1-H4, V1-V4 are ASCII digits of (angle + 360) * resolution
+        ph = frame[5] or 1
+        pv = frame[10] or 1
+        az_pulse = (frame[1]-48)*1000 + (frame[2]-48)*100 + (frame[3]-48)*10 + (frame[4]-48)
+        el_pulse = (frame[6]-48)*1000 + (frame[7]-48)*100 + (frame[8]-48)*10 + (frame[9]-48)
+        tar_az = min(max(float(az_pulse) / ph - 360.0, -180.0), 540.0)
+        tar_el = min(max(float(el_pulse) / pv - 360.0, 0.0), 180.0)
+        return tar_az, tar_el
+
+    def _angle_digits(self, angle):
+        #binary hundreds, tens, ones, tenths of (angle + 360)
+        tenths = int(round((angle + 360.0) * 10))
+        return [tenths // 1000 % 10, tenths // 100 % 10, tenths // 10 % 10, tenths % 10]
+
+    def _encode_status(self, cmd):
+        reply = bytearray([0x57])
+        reply.extend(self._angle_digits(self.az))
+        reply.append(self.ph)
+        reply.extend(self._angle_digits(self.el))
+        reply.append(self.pv)
+        reply.append(cmd)
+        reply.append(0x20)
+        return reply
+
+    def _garble(self, reply):
+        #either prefix line noise or corrupt a payload byte
+        if self.rand.random() < 0.5:
+            noise = bytearray(self.rand.randint(0, 255) for i in range(self.rand.randint(1, 8)))
+            return noise.replace(b'\x57', b'\x00') + reply
+        reply[self.rand.randint(1, 10)] = self.rand.randint(0, 255)
+        return reply
+
+class MD01_Sim_Thread(threading.Thread):
+    """
+    Title: MD01 Simulator Thread
+    Project: VTGS Tracking Daemon
+
+    Purpose:
+        Serves any number of emulated MD-01 controllers, one TCP listener
+        per rotator, from a single poll() event loop.  Delayed replies are
+        kept on a heap ordered by send time.
+
+    Args:
+        ip - address to bind listeners on.
+    """
+    def __init__ (self, ip='127.0.0.1'):
+        threading.Thread.__init__(self, name = 'MD01Sim')
+        self._stop  = threading.Event()
+        self.ip     = ip
+        self.poller = select.poll()
+        self.listeners  = {} #fd -> (listen socket, rotator)
+        self.conns      = {} #fd -> (conn socket, rotator, Frame_Buffer)
+        self.rotators   = [] #(port, rotator)
+        self.pending    = [] #heap of (send time, seq, fd, reply)
+        self.seq        = 0
+        self.lock       = threading.Lock()
+
+    def add_rotator(self, port=0, **kwargs):
+        """ Create a rotator listening on port (0 = ephemeral), returns (port, rotator) """
+        rotator = Sim_Rotator(**kwargs)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.ip, port))
+        sock.listen(4)
+        sock.setblocking(0)
+        port = sock.getsockname()[1]
+        with self.lock:
+            self.listeners[sock.fileno()] = (sock, rotator)
+            self.rotators.append((port, rotator))
+            self.poller.register(sock.fileno(), select.POLLIN)
+        return port, rotator
+
+    def run(self):
+        while (not self._stop.isSet()):
+            timeout = 100 #ms
+            if self.pending:
+                timeout = max(0, int((self.pending[0][0] - time.time()) * 1000))
+                timeout = min(timeout, 100)
+            with self.lock:
+                events = self.poller.poll(timeout)
+                now = time.time()
+                for fd, event in events:
+                    if fd in self.listeners:
+                        self._accept(fd)
+                    elif fd in self.conns:
+                        if event & (select.POLLHUP | select.POLLERR | select.POLLNVAL):
+                            self._close(fd)
+                        else:
+                            self._read(fd, now)
+                self._flush_pending(time.time())
+        self._shutdown()
+
+    def get_counts(self):
+        totals = {}
+        for port, rotator in self.rotators:
+            for k, v in rotator.counts.items():
+                totals[k] = totals.get(k, 0) + v
+        return totals
+
+    def stop(self):
+        self._stop.set()
+
+    def stopped(self):
+        return self._stop.isSet()
+
+    #### LOCAL FUNCTION CALLS ####
+    def _accept(self, fd):
+        sock, rotator = self.listeners[fd]
+        try:
+            conn, client = sock.accept()
+        except socket.error:
+            return
+        conn.setblocking(0)
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.conns[conn.fileno()] = (conn, rotator, Frame_Buffer())
+        self.poller.register(conn.fileno(), select.POLLIN)
+
+    def _read(self, fd, now):
+        conn, rotator, rx_buf = self.conns[fd]
+        try:
+            data = conn.recv(4096)
+        except socket.error as e:
+            if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK): return
+            data = ''
+        if not data:
+            self._close(fd)
+            return
+        rx_buf.feed(data)
+        frame = rx_buf.pop_frame()
+        while frame != None:
+            reply = rotator.handle_cmd(frame, now)
+            if reply != None:
+                delay, data = reply
+                self.seq += 1
+                heapq.heappush(self.pending, (now + delay, self.seq, fd, data))
+            frame = rx_buf.pop_frame()
+
+    def _flush_pending(self, now):
+        while self.pending and self.pending[0][0] <= now:
+            send_time, seq, fd, data = heapq.heappop(self.pending)
+            if fd not in self.conns: continue
+            try:
+                self.conns[fd][0].sendall(data)
+            except socket.error:
+                self._close(fd)
+
+    def _close(self, fd):
+        conn = self.conns.pop(fd)[0]
+        try: self.poller.unregister(fd)
+        except KeyError: pass
+        conn.close()
+
+    def _shutdown(self):
+        for fd in list(self.conns.keys()): self._close(fd)
+        for fd, (sock, rotator) in list(self.listeners.items()):
+            self.poller.unregister(fd)
+            sock.close()
+        self.listeners = {}
+
+def main(args):
+    sim = MD01_Sim_Thread(args.ip)
+    sim.daemon = True
+    for i in range(args.count):
+        port = args.port + i if args.port else 0
+        port, rotator = sim.add_rotator(port,
+                                        az=args.az, el=args.el,
+                                        az_speed=args.az_speed, el_speed=args.el_speed,
+                                        ph=args.ph, pv=args.pv,
+                                        latency=args.latency, jitter=args.jitter,
+                                        drop=args.drop, garble=args.garble,
+                                        seed=args.seed + i)
+        print "MD01 simulator listening on: [{:s}:{:d}]".format(args.ip, port)
+    sim.start()
+    try:
+        while True:
+            time.sleep(args.report)
+            print "{:s} | sim | {:s}".format(datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%fZ'), sim.get_counts())
+    except KeyboardInterrupt:
+        sim.stop()
+        sim.join()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="VTGS MD01 Controller Simulator",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--ip",       dest="ip",       type=str,   default='127.0.0.1', help='listen address')
+    parser.add_argument("--port",     dest="port",     type=int,   default=2000, help='first listen port, 0 = ephemeral')
+    parser.add_argument("--count",    dest="count",    type=int,   default=1,    help='number of emulated rotators')
+    parser.add_argument("--az",       dest="az",       type=float, default=180.0, help='initial azimuth [deg]')
+    parser.add_argument("--el",       dest="el",       type=float, default=0.0,  help='initial elevation [deg]')
+    parser.add_argument("--az_speed", dest="az_speed", type=float, default=SIM_SPEED, help='azimuth slew rate [deg/s]')
+    parser.add_argument("--el_speed", dest="el_speed", type=float, default=SIM_SPEED, help='elevation slew rate [deg/s]')
+    parser.add_argument("--ph",       dest="ph",       type=int,   default=10,   help='azimuth resolution [pulses/deg]')
+    parser.add_argument("--pv",       dest="pv",       type=int,   default=10,   help='elevation resolution [pulses/deg]')
+    parser.add_argument("--latency",  dest="latency",  type=float, default=0.0,  help='reply latency [s]')
+    parser.add_argument("--jitter",   dest="jitter",   type=float, default=0.0,  help='max random added latency [s]')
+    parser.add_argument("--drop",     dest="drop",     type=float, default=0.0,  help='reply drop probability')
+    parser.add_argument("--garble",   dest="garble",   type=float, default=0.0,  help='reply garble probability')
+    parser.add_argument("--seed",     dest="seed",     type=int,   default=0,    help='random seed')
+    parser.add_argument("--report",   dest="report",   type=float, default=10.0, help='counter report interval [s]')
+    args = parser.parse_args()
+    main(args)
@@ -24,10 +24,21 @@ import sys
 import string
 import time
 import inspect
-import copy
-from Queue import Queue
+from Queue import Queue, Empty
 
 from md01 import *
+from poll_scheduler import *
+from rate_estimator import *
+from telemetry_history import *
+from pass_recorder import *
+from console import *
+from timestamp import *
+from feedback import *
+from trajectory import *
+from pass_predict import *
+from az_planner import *
+from set_coalescer import *
+from pointing_lead import *
 
 class MD01_Thread(threading.Thread):
     #def __init__ (self, ssid,ip, port, poll_rate, az_thresh=2.0, el_thresh=2.0):
@@ -37,8 +48,9 @@ class MD01_Thread(threading.Thread):
         self.cfg        = cfg
         self.logger     = logger
         self.parent     = parent # callback to Daemon Main Thread
+        self.console    = get_console('md01')
 
-        print self._utc_ts() + "Initializing {:s} MD01 Thread".format(self.cfg['ssid'])
+        self.console.info("Initializing {:s} MD01 Thread", self.cfg['ssid'])
         self.logger.info("Initializing {:s} MD01 Thread".format(self.cfg['ssid']))
 
         self.ssid       = self.cfg['ssid']
@@ -48,11 +60,29 @@ class MD01_Thread(threading.Thread):
         self.poll_rate  = self.cfg['poll_rate'] #[s]
         self.az_thresh  = self.cfg['az_thresh'] #Azimuth Speed threshold, for error detection, deg/s
         self.el_thresh  = self.cfg['el_thresh'] #Elevation Speed threshold, for error detection, deg/s
+        self.pipeline   = self.cfg.get('pipeline', False) #Send SET and STATUS in a single exchange
+        self.ts_format  = self.cfg.get('ts_format', 'iso') #feedback ts as 'iso' string or 'epoch' float
+        self.scheduler  = Poll_Scheduler(self.poll_rate) #fixed poll cadence on monotonic clock
+        self.rate_est   = Rate_Estimator(self.cfg.get('rate_filter')) #filtered az/el rates, motion detection
+        self.history    = Telemetry_History(self.cfg.get('history_len', 36000)) #recent samples for 'history' requests
+        self.history_max = self.cfg.get('history_max_samples', 5000) #larger replies are decimated
+        self.trajectory_max = self.cfg.get('trajectory_max_len', 86400) #longest accepted pass table [points]
+        self.station    = self.cfg.get('station') #lat, lon [deg], alt [m], for passes predicted from TLEs
+        self.pass_step  = self.cfg.get('pass_step', 0.1) #predicted pointing table spacing [s]
+        self.pass_min_el = self.cfg.get('pass_min_el', 0.0) #pass horizon [deg]
+        planner_cfg     = dict(self.cfg.get('az_planner', {}))
+        planner_cfg.setdefault('max_az_rate', self.az_thresh) #faster would trip the rate fault
+        self.planner    = Az_Planner(planner_cfg) #wrap choice for SET targets and trajectories
+        self.coalescer  = Set_Coalescer(self.cfg.get('set_filter')) #deadband and rate limit on SET commands
+        self.lead_est   = Lead_Estimator(self.cfg.get('lead'), self.poll_rate) #actuation latency, trajectory targets lead by it
+        self.pass_cache = Pass_Cache(self.cfg.get('pass_cache_path',
+                                                  os.path.join(self.cfg.get('log_path', '.'), 'pass_cache')))
 
         self.md01       = md01(self.cfg, self.logger)
 
         self.rx_q = Queue()
         self.tx_q = Queue()
+        self.ctl_q = Queue() #stop, position and trajectory requests from main, applied each poll
 
         #self.connected  = False
         #self.cur_az     = 0.0
@@ -63,12 +93,14 @@ class MD01_Thread(threading.Thread):
         self.last_az    = 0.0
         self.last_el    = 0.0
         self.last_time  = None
+        self.last_mono  = None  #monotonic time of last feedback, for rates
         self.time_delta = 0.0
         self.tar_az     = 180.0
         self.tar_el     = 0.0
         self.set_flag   = False
         self.log_flag   = False
-        self.log_file   = ""
+        self.recorder   = None  #Pass_Recorder while a session is logged
+        self.trajectory = None  #Trajectory being tracked, target interpolated each poll
 
         self.status = {
             'ts': None,
@@ -77,13 +109,7 @@ class MD01_Thread(threading.Thread):
             'cur_el':0.0
         } #returns ts, connection state, cur_az, cur_el
 
-        self.feedback = {
-            'ts':None,
-            'cur_az':0.0,
-            'cur_el':0.0,
-            'az_rate':0.0,
-            'el_rate':0.0
-        }
+        self.feedback = Feedback_Snapshot() #latest feedback, replaced each poll, never modified
 
         self.az_motion          = False #indicates azimuth motion
         self.el_motion          = False #indicates Elevation motion
@@ -93,119 +119,211 @@ class MD01_Thread(threading.Thread):
 
         self.thread_fault       = False #indicates unknown failure in thread
         self.thread_dormant     = False
+        self.shutdown           = False #stop_thread called, STOP and disconnect on the way out
 
     def run(self):
         #time.sleep(1)  #Give parent thread time to spool up
-        print self._utc_ts() + "{:s} MD01 Thread Started".format(self.ssid)
+        self.console.info("{:s} MD01 Thread Started", self.ssid)
         self.logger.info("{:s} MD01 Thread Started".format(self.ssid))
-        print self._utc_ts() + "Azimuth Threshold: {:3.3f}".format(self.az_thresh)
+        self.console.info("Azimuth Threshold: {:3.3f}", self.az_thresh)
         self.logger.info("Azimuth Threshold: {:3.3f}".format(self.az_thresh))
-        print self._utc_ts() + "Elevation Threshold: {:3.3f}".format(self.el_thresh)
+        self.console.info("Elevation Threshold: {:3.3f}", self.el_thresh)
         self.logger.info("Elevation Threshold: {:3.3f}".format(self.el_thresh))
-        print self._utc_ts() + "MD-01 Poll Rate [s]: {:3.3f}".format(self.poll_rate)
+        self.console.info("MD-01 Poll Rate [s]: {:3.3f}", self.poll_rate)
         self.logger.info("MD-01 Poll Rate [s]: {:3.3f}".format(self.poll_rate))
+        self.console.info("MD-01 Pipelined SET/STATUS: {0}", self.pipeline)
+        self.logger.info("MD-01 Pipelined SET/STATUS: {0}".format(self.pipeline))
 
         while (not self._stop.isSet()):
             try:
                 if self.status['connected'] == False:
                     self.status['connected'] = self.md01.connect()
                     if self.status['connected'] == True:
-                        print self._utc_ts() + "Connected to {:s} MD01 Controller".format(self.ssid )
+                        self.console.info("Connected to {:s} MD01 Controller", self.ssid )
                         self.logger.info("Connected to {:s} MD01 Controller".format(self.ssid ))
                         self.status = self.md01.get_status()
                         self._update_feedback()
                         #print status
                         self.last_time = self.status['ts']
+                        self.last_mono = self.status['mono']
+                        self.rate_est.start(self.status['mono'], self.status['cur_az'], self.status['cur_el'])
                         #self.status['connected'] = status['connected']
                         self.last_az = self.status['cur_az']
                         self.last_el = self.status['cur_el']
                         self.parent.set_md01_con_status(self.status['connected']) #notify main thread of connection
                         self.set_flag = False
+                        self.coalescer.reset()
 
                         time.sleep(1)
+                        self.scheduler.start() #fresh cadence for this connection
                     else:
                         time.sleep(self.timeout) #try to reconnect to MD01 every 5 seconds.
                 elif self.status['connected'] == True:
-                    feedback_valid = self.get_md01_feedback()
-                    if feedback_valid:
-                        if self.set_flag == True:  #Need to issue a set command to MD01
-                            self.set_flag = False  #reset set flag
-                            #Do current angles match target angles?
-                            if ((round(self.status['cur_az'],1) != round(self.tar_az,1)) or (round(self.status['cur_el'],1) != round(self.tar_el,1))):
-                                #is antenna in motion?
-                                if ((self.az_motion) or (self.el_motion)): #Antenna Is in motion
-                                    if self.motion_stop_sent == True: #A Stop command has been issued to the MD01
-                                        self.set_flag = True #reset motion flag
-                                    else:
-                                        opposite_flag = False #indicates set command opposed to direction of motion.
-                                        if (self.status['az_rate'] < 0) and (self.tar_az > self.status['cur_az']): opposite_flag = True
-                                        elif (self.status['az_rate'] > 0) and (self.tar_az < self.status['cur_az']): opposite_flag = True
-                                        if (self.status['el_rate'] < 0) and (self.tar_el > self.status['cur_el']): opposite_flag = True
-                                        elif (self.status['el_rate'] > 0) and (self.tar_el < self.status['cur_el']): opposite_flag = True
-                                        if opposite_flag: #Set command in opposite direction of motion
-                                            print self._utc_ts()+"Set Command position opposite direction of motion"
-                                            print self._utc_ts()+"Sending Stop Command to MD-01"
-                                            #self.connected, self.cur_az, self.cur_el = self.md01.set_stop() #Stop the rotation
-                                            self.status = self.md01.set_stop()
-                                            self._update_feedback()
-                                            self.set_flag = True #try to resend set command next time around the loop
-                                            self.motion_stop_sent = True
-                                        else: #Set command is in the direction of rotation
-                                            print self._utc_ts()+"Set Command position is in direction of motion"
-                                            #Set Position command does not get a feedback response from MD-01
-                                            #self.connected, self.cur_az, self.cur_el = self.md01.set_position(self.tar_az, self.tar_el)
-                                            self.status = self.md01.set_position(self.tar_az, self.tar_el)
-                                            #self._update_feedback()
-                                else: #Antenna is stopped
-                                    print self._utc_ts()+"Antenna is Stopped, sending SET command to MD01"
-                                    #Set Position command does not get a feedback response from MD-01
-                                    self.motion_stop_sent = False
-                                    #self.connected, self.cur_az, self.cur_el = self.md01.set_position(self.tar_az, self.tar_el)
-                                    self.status = self.md01.set_position(self.tar_az, self.tar_el)
-                                    #self._update_feedback()
-                    time.sleep(self.poll_rate)
+                    if self.pipeline: #SET and STATUS share one exchange
+                        feedback_valid = self._pipelined_exchange()
+                    else:
+                        feedback_valid = self.get_md01_feedback()
+                        if feedback_valid:
+                            action = self._check_set_flag()
+                            if action == 'STOP':
+                                self.status = self.md01.set_stop()
+                                self._update_feedback()
+                            elif action == 'SET':
+                                #Set Position command does not get a feedback response from MD-01
+                                self.status = self.md01.set_position(self.tar_az, self.tar_el)
+                    self.scheduler.wait() #sleep to next deadline, work time is absorbed
             except:
-                print self._utc_ts() + "Unexpected error in thread:", self.ssid,'\n', sys.exc_info() # substitute logging
+                self.console.error("Unexpected error in thread: {:s}\n{}", self.ssid, sys.exc_info()) # substitute logging
                 self.status['connected'] = False
                 self.thread_fault = True
 
-        print self._utc_ts() + "--- DAEMON IS NOW DORMANT ---"
+        if self.shutdown:
+            self._shutdown()
+            return
+        self.console.warning("--- DAEMON IS NOW DORMANT ---")
         self.thread_dormant = True
         while 1:
             time.sleep(10)
 
+    def _check_set_flag(self):
+        #Decides if a pending set command can be sent, based on latest feedback
+        #returns 'SET', 'STOP' or None
+        if self._apply_controls(): #STOP requested by main thread
+            self.motion_stop_sent = False
+            self.coalescer.reset() #STOP discards the controller's target
+            return 'STOP'
+        if self.trajectory != None: self._update_trajectory_target()
+        if self.set_flag == True:  #Need to issue a set command to MD01
+            self.set_flag = False  #reset set flag
+            #Do current angles match target angles?
+            if not self.coalescer.at_target(self.tar_az, self.tar_el, self.status['cur_az'], self.status['cur_el']):
+                #is antenna in motion?
+                if ((self.az_motion) or (self.el_motion)): #Antenna Is in motion
+                    if self.motion_stop_sent == True: #A Stop command has been issued to the MD01
+                        self.set_flag = True #reset motion flag
+                    else:
+                        opposite_flag = False #indicates set command opposed to direction of motion.
+                        #only an axis flagged in motion counts, a filtered rate leaves a small residual on an idle axis
+                        if self.az_motion:
+                            if (self.status['az_rate'] < 0) and (self.tar_az > self.status['cur_az']): opposite_flag = True
+                            elif (self.status['az_rate'] > 0) and (self.tar_az < self.status['cur_az']): opposite_flag = True
+                        if self.el_motion:
+                            if (self.status['el_rate'] < 0) and (self.tar_el > self.status['cur_el']): opposite_flag = True
+                            elif (self.status['el_rate'] > 0) and (self.tar_el < self.status['cur_el']): opposite_flag = True
+                        if opposite_flag: #Set command in opposite direction of motion
+                            self.console.info("Set Command position opposite direction of motion")
+                            self.console.info("Sending Stop Command to MD-01")
+                            self.set_flag = True #try to resend set command next time around the loop
+                            self.motion_stop_sent = True
+                            self.coalescer.reset() #STOP discards the controller's target
+                            return 'STOP'
+                        else: #Set command is in the direction of rotation
+                            return self._coalesce_set(True)
+                else: #Antenna is stopped
+                    self.motion_stop_sent = False
+                    return self._coalesce_set(False)
+        return None
+
+    def _apply_controls(self):
+        #requests queued by the main thread, in order, returns True if one was a STOP
+        #the controller socket, target, trajectory and coalescer are only touched on this thread
+        stop = False
+        while True:
+            try:
+                ctl = self.ctl_q.get_nowait()
+            except Empty:
+                return stop
+            if ctl[0] == 'stop':
+                self.trajectory = None
+                self.tar_az = self.status['cur_az']
+                self.tar_el = self.status['cur_el']
+                self.set_flag = False
+                stop = True
+            elif ctl[0] == 'position':
+                self.trajectory = None #manual pointing overrides an uploaded pass
+                self.tar_az = self.planner.nearest_az(ctl[1], self.status['cur_az']) #e.g. 10 or 370, whichever is closer
+                self.tar_el = ctl[2]
+                self.coalescer.request(self.set_flag)
+                self.set_flag = True
+            elif ctl[0] == 'trajectory':
+                if ctl[1] == None and self.trajectory != None:
+                    self.console.info("Trajectory cleared")
+                    self.logger.info("Trajectory cleared")
+                self.trajectory = ctl[1]
+
+    def _coalesce_set(self, moving):
+        #'SET' unless the controller already has this target or the last SET was too recent
+        cmd = set_pulses(self.tar_az, self.tar_el, self.md01.ph, self.md01.pv)[:2]
+        action = self.coalescer.check(cmd, moving, monotonic())
+        if action == 'DEFER':
+            self.set_flag = True #send on a later poll
+            return None
+        if action == 'SEND':
+            self.console.debug("Sending SET command to MD01, antenna {:s}", 'moving' if moving else 'stopped')
+            return 'SET'
+        return None
+
+    def _update_trajectory_target(self):
+        #target from the uploaded pass at the time of this poll
+        traj = self.trajectory
+        t = time.time() + self.lead_est.get_lead() #where the pass will be when the antenna gets there
+        if t < traj.start: #wait for the pass at its first point
+            self.tar_az, self.tar_el = traj.position_at(traj.start)
+        elif t >= traj.stop: #pass complete, hold the final point
+            self.tar_az, self.tar_el = traj.position_at(traj.stop)
+            self.trajectory = None
+            self.console.info("Trajectory complete, holding AZ={:3.1f}, EL={:3.1f}", self.tar_az, self.tar_el)
+            self.logger.info("Trajectory complete, holding AZ={:3.1f}, EL={:3.1f}".format(self.tar_az, self.tar_el))
+            self.console.info(self.lead_est.summary())
+            self.logger.info(self.lead_est.summary())
+        else:
+            self.tar_az, self.tar_el = traj.position_at(t)
+        self.coalescer.request(self.set_flag)
+        self.set_flag = True
+
+    def _pipelined_exchange(self):
+        #Any pending SET is decided on the previous exchange's feedback and
+        #written back to back with the STATUS request, one reply is read.
+        action = self._check_set_flag()
+        if action == 'STOP':
+            self.status = self.md01.set_stop()
+        elif action == 'SET':
+            self.status = self.md01.set_position_get_status(self.tar_az, self.tar_el)
+        else:
+            self.status = self.md01.get_status()
+        return self._process_md01_status()
+
     def _update_feedback(self):
         status = self.status
-        for k in self.feedback.keys():
-            if k in status:
-                self.feedback[k] = status[k]
-            else:
-                if 'rate' in k:
-                    self.feedback[k] = 0.0
-        #print 'md01', self.feedback
-        #self.rx_q.put(self.feedback)
+        self.feedback = Feedback_Snapshot(status['ts'], status['cur_az'], status['cur_el'],
+                                          status.get('az_rate', 0.0), status.get('el_rate', 0.0),
+                                          status.get('rtt'))
 
     def get_md01_feedback(self):
         #self.cur_time = date.utcnow()
         #self.connected, self.cur_az, self.cur_el = self.md01.get_status()
         self.status = self.md01.get_status()
+        return self._process_md01_status()
+
+    def _process_md01_status(self):
         if self.status['connected'] == False:
-            print self._utc_ts() + "Disconnected from {:s} MD01 Controller".format(self.ssid )
+            self.console.info("Disconnected from {:s} MD01 Controller", self.ssid )
             self.logger.info("Disconnected from {:s} MD01 Controller".format(self.ssid ))
+            self.logger.info(self.md01.get_rtt_stats().summary())
+            self.logger.info(self.scheduler.summary())
+            self.logger.info(self.coalescer.summary())
 
             self.parent.set_md01_con_status(self.status['connected']) #notify main thread of disconnection
             self.set_flag = False
             return False #indicates problem with getting feedback
         else:
-            self.time_delta = (self.status['ts'] - self.last_time).total_seconds()
-            self.status['az_rate'] = (self.status['cur_az'] - self.last_az) / self.time_delta
-            self.status['el_rate'] = (self.status['cur_el'] - self.last_el) / self.time_delta
-
-            if abs(self.status['az_rate']) > 0: self.az_motion = True
-            else: self.az_motion = False
-
-            if abs(self.status['el_rate']) > 0: self.el_motion = True
-            else: self.el_motion = False
+            #rates from monotonic receive times, immune to wall clock steps
+            self.time_delta = self.status['mono'] - self.last_mono
+            #filtered rates, motion flags with hysteresis so quantization noise is not motion
+            self.status['az_rate'], self.status['el_rate'] = self.rate_est.update(self.status['mono'],
+                                                                                  self.status['cur_az'],
+                                                                                  self.status['cur_el'])
+            self.az_motion, self.el_motion = self.rate_est.get_motion()
 
             if self.log_flag:
                 self.update_log()
@@ -219,82 +337,211 @@ class MD01_Thread(threading.Thread):
                 self.last_az = self.status['cur_az']
                 self.last_el = self.status['cur_el']
                 self.last_time = self.status['ts']
+                self.last_mono = self.status['mono']
                 self._update_feedback()
+                if self.trajectory != None:
+                    self.lead_est.update(utc_seconds(self.status['ts']), self.status['rtt'],
+                                         self.status['cur_az'], self.status['cur_el'], self.trajectory)
+                self.history.append(utc_seconds(self.status['ts']), self.status['cur_az'], self.status['cur_el'],
+                                    self.status['az_rate'], self.status['el_rate'])
                 return True
 
     def Antenna_Threshold_Fault(self):
-        cur_time_stamp = str(self.status['ts']) + " UTC | MD01 | "
-        print cur_time_stamp + "----ERROR! ERROR! ERROR!----"
+        self.console.error("----ERROR! ERROR! ERROR!---- feedback at {:s} UTC", str(self.status['ts']))
         if self.az_thresh_fault == True:
-            print cur_time_stamp + "Antenna Azimuth Motion Fault"
-            print "{:s}Rotation Rate: {:2.3f} [deg/s] exceeded threshold {:2.3f} [deg/s]".format(cur_time_stamp, self.status['az_rate'], self.az_thresh)
+            self.console.error("Antenna Azimuth Motion Fault")
+            self.console.error("Rotation Rate: {:2.3f} [deg/s] exceeded threshold {:2.3f} [deg/s]", self.status['az_rate'], self.az_thresh)
         if self.el_thresh_fault == True:
-            print cur_time_stamp + "Antenna Elevation Motion Fault"
-            print "{:s}Rotation Rate: {:2.3f} [deg/s] exceeded threshold {:2.3f} [deg/s]".format(cur_time_stamp, self.status['el_rate'], self.el_thresh)
-        print "{:s}cur_az: {:+3.1f}, last_az: {:+3.1f}".format(cur_time_stamp, self.status['cur_az'], self.last_az)
-        print "{:s}cur_el: {:+3.1f}, last_el: {:+3.1f}, time_delta: {:+3.1f} [ms]".format(cur_time_stamp, self.status['cur_el'], self.last_el, self.time_delta*1000)
-        print self._utc_ts() + "--- Killing Thread Now... ---"
+            self.console.error("Antenna Elevation Motion Fault")
+            self.console.error("Rotation Rate: {:2.3f} [deg/s] exceeded threshold {:2.3f} [deg/s]", self.status['el_rate'], self.el_thresh)
+        self.console.error("cur_az: {:+3.1f}, last_az: {:+3.1f}", self.status['cur_az'], self.last_az)
+        self.console.error("cur_el: {:+3.1f}, last_el: {:+3.1f}, time_delta: {:+3.1f} [ms]", self.status['cur_el'], self.last_el, self.time_delta*1000)
+        self.console.error("--- Killing Thread Now... ---")
         #self.callback.set_state_fault()
         self.stop_thread()
+        #STOP before the parent hears of the fault, it exits once in FAULT
+        if self.status['connected']: self.status = self.md01.set_stop()
         self.parent.set_state_fault()
 
     def get_position(self):
         return self.status['cur_az'], self.status['cur_el']
 
+    def get_poll_stats(self):
+        return self.scheduler.get_stats()
+
+    def get_set_stats(self):
+        return self.coalescer.get_stats()
+
     def get_rate(self):
         return self.status['az_rate'], self.status['el_rate']
 
     def get_connected(self):
         return self.connected
 
-    def get_feedback(self):
-        msg = copy.deepcopy(self.feedback)
-        msg['ts'] = msg['ts'].strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    def get_feedback(self, trace=None, client=None):
+        msg = Feedback_Msg(self.feedback, self.ts_format) #shares the snapshot, encoded at the service
+        if trace != None: #latency benchmark, carry stage stamps back to client
+            trace['md01'] = time.time()
+            msg['trace'] = trace
+        if client != None: msg['client'] = client #reply to the requesting client only
         self.rx_q.put(msg)
         #return self.status
 
+    def get_history(self, params=None, trace=None, client=None):
+        #bulk samples and stats for a time window, params (all optional):
+        #  window - seconds back from now, or start/stop - UTC unix times
+        #  at     - UTC unix time to report the interpolated position for
+        params = params if params != None else {}
+        start = params.get('start')
+        stop  = params.get('stop')
+        if params.get('window') != None: start = time.time() - float(params['window'])
+        samples = self.history.window(start, stop)
+        stride = 1
+        if len(samples) > self.history_max: #keep reply bounded, decimate evenly
+            stride = int(math.ceil(len(samples) / float(self.history_max)))
+            samples = samples[::stride]
+        msg = {'cmd':'history', 'decimation':stride}
+        for i, key in enumerate(HISTORY_FIELDS):
+            msg[key] = samples[:, i].tolist()
+        msg['stats'] = self.history.stats(start, stop)
+        if params.get('at') != None:
+            msg['position'] = self.history.position_at(float(params['at']))
+        if trace != None:
+            trace['md01'] = time.time()
+            msg['trace'] = trace
+        if client != None: msg['client'] = client #reply to the requesting client only
+        self.rx_q.put(msg)
+
+    def load_trajectory(self, params=None, trace=None, client=None):
+        #'trajectory' telecommand, replaces any pass being tracked, see trajectory.py
+        #params {'clear':true} stops tracking and holds the current target
+        params = params if params != None else {}
+        msg = {'cmd':'trajectory'}
+        if params.get('clear'):
+            self.clear_trajectory()
+            msg['status'] = 'cleared'
+        else:
+            try:
+                traj = trajectory_from_params(params, self.trajectory_max)
+                if params.get('plan', True): #False keeps the uploaded azimuths as they are
+                    traj, msg['plan'] = self._plan_trajectory(traj)
+                self.ctl_q.put(('trajectory', traj))
+                msg.update({'status':'loaded', 'n':len(traj), 'interp':traj.method,
+                            'start':traj.start, 'stop':traj.stop})
+                self.console.info("Loaded {:s} trajectory, {:d} points, {:3.1f} s", traj.method, len(traj), traj.stop - traj.start)
+                self.logger.info("Loaded {:s} trajectory, {:d} points, start={:f}, stop={:f}".format(
+                                    traj.method, len(traj), traj.start, traj.stop))
+            except (ValueError, TypeError) as e:
+                msg.update({'status':'rejected', 'error':str(e)})
+                self.console.warning("Rejected trajectory: {:s}", str(e))
+                self.logger.warning("Rejected trajectory: {:s}".format(str(e)))
+        if trace != None:
+            trace['md01'] = time.time()
+            msg['trace'] = trace
+        if client != None: msg['client'] = client #reply to the requesting client only
+        self.rx_q.put(msg)
+
+    def load_tle(self, params=None, trace=None, client=None):
+        #'tle' telecommand, predict a pass with SGP4 and track it as a trajectory, see pass_predict.py
+        #params: line1, line2, optional station, start/stop (default next pass), min_el, step, interp
+        params = params if params != None else {}
+        msg = {'cmd':'tle'}
+        try:
+            sat = Satellite(str(params.get('line1', '')), str(params.get('line2', '')))
+            station = params.get('station', self.station)
+            if station == None: raise ValueError("No station coordinates configured")
+            info, ts, az, el = plan_pass(sat, station, self.pass_cache,
+                                         start=params.get('start'), stop=params.get('stop'),
+                                         min_el=params.get('min_el', self.pass_min_el),
+                                         step=params.get('step', self.pass_step))
+            traj, msg['plan'] = self._plan_trajectory(Trajectory(ts, az, el, params.get('interp', 'linear')))
+            self.ctl_q.put(('trajectory', traj))
+            msg.update(info)
+            msg.update({'status':'loaded', 'n':len(traj), 'interp':traj.method})
+            self.console.info("Loaded pass of {:d}, AOS {:s}, LOS {:s}, max el {:3.1f}, cached={}", sat.norad_id,
+                              utc_stamp(info['aos']), utc_stamp(info['los']), info['max_el'], info['cached'])
+            self.logger.info("Loaded pass of {:d}, AOS {:s}, LOS {:s}, max el {:3.1f}, cached={}".format(sat.norad_id,
+                              utc_stamp(info['aos']), utc_stamp(info['los']), info['max_el'], info['cached']))
+        except (ValueError, TypeError) as e:
+            msg.update({'status':'rejected', 'error':str(e)})
+            self.console.warning("Rejected TLE: {:s}", str(e))
+            self.logger.warning("Rejected TLE: {:s}".format(str(e)))
+        if trace != None:
+            trace['md01'] = time.time()
+            msg['trace'] = trace
+        if client != None: msg['client'] = client #reply to the requesting client only
+        self.rx_q.put(msg)
+
+    def _plan_trajectory(self, traj):
+        #place the pass on one cable wrap from the current position, see az_planner.py
+        az, el, plan = self.planner.plan(traj.ts, traj.az, traj.el,
+                                         self.status['cur_az'], self.status['cur_el'], time.time())
+        log = "Planned trajectory: wrap={:+d}, flip={}, slew={:3.1f} [deg], max az rate={:3.2f} [deg/s]".format(
+                    plan['wrap'], plan['flip'], plan['slew'], plan['max_az_rate'])
+        if not plan['fits']:
+            self.console.warning("Trajectory does not fit one azimuth wrap, it will be clamped")
+            self.logger.warning("Trajectory does not fit one azimuth wrap, it will be clamped")
+        if plan['max_az_rate'] > self.az_thresh:
+            self.console.warning("Trajectory azimuth rate {:3.2f} [deg/s] exceeds threshold", plan['max_az_rate'])
+            self.logger.warning("Trajectory azimuth rate {:3.2f} [deg/s] exceeds threshold".format(plan['max_az_rate']))
+        self.console.info(log)
+        self.logger.info(log)
+        return Trajectory(traj.ts, az, el, traj.method), plan
+
+    def clear_trajectory(self):
+        self.ctl_q.put(('trajectory', None))
+
     def start_logging(self, ts, session_id):
-        log_name = 'trackd_{:s}_{:s}'.format(self.cfg['ssid'], self.name.lower())
-        self.msg_log_fh = setup_logger(log_name,
-                                    path=self.cfg['log_path'],
-                                    ts=ts)
-        self.msg_logger = logging.getLogger(log_name) #main logger
-
-        print self._utc_ts() + "Setup Session Logger: {:s}".format(session_id)
-        self.msg_logger.info("Session ID: {:s}".format(session_id))
-        msg = "Timestamp [UTC],Azimuth [deg],Elevation [deg],Azimuth Rate [deg/sec],Elevation Rate [deg/sec]"
-        self.msg_logger.info(msg)
-        print self._utc_ts() + 'Started Logging: ' + self.msg_logger.handlers[-1].baseFilename
-        self.logger.info("Started Logging: {:s}".format(self.msg_logger.handlers[-1].baseFilename))
+        #binary per session recording of feedback, see pass_recorder.py
+        if self.log_flag: self.stop_logging()
+        log_file = 'trackd_{:s}_pass_{:s}.bin'.format(self.cfg['ssid'], ts)
+        self.recorder = Pass_Recorder('/'.join([self.cfg['log_path'], log_file]),
+                                      session_id, self.ssid, ts,
+                                      flush_len=self.cfg.get('record_flush_len', 600))
+        self.console.info("Setup Session Recorder: {:s}", str(session_id))
+        self.console.info('Started Logging: {:s}', self.recorder.path)
+        self.logger.info("Started Logging: {:s}".format(self.recorder.path))
         self.log_flag = True
 
     def stop_logging(self):
-        print self._utc_ts() + 'Stopped Logging: ' + self.msg_logger.handlers[-1].baseFilename
-        self.logger.info("Stopped Logging: {:s}".format(self.msg_logger.handlers[-1].baseFilename))
-        self.msg_logger.removeHandler(self.msg_logger.handlers[-1])
+        if not self.log_flag: return
+        self.log_flag = False
+        self.recorder.close()
+        self.console.info('Stopped Logging: {:s}, {:d} samples', self.recorder.path, self.recorder.count)
+        self.logger.info("Stopped Logging: {:s}, {:d} samples".format(self.recorder.path, self.recorder.count))
+
+    def update_log(self):
+        self.recorder.append(utc_seconds(self.status['ts']), self.status['cur_az'], self.status['cur_el'],
+                             self.status['az_rate'], self.status['el_rate'], self.tar_az, self.tar_el)
 
     def set_position(self, az, el):
-        self.tar_az = az
-        self.tar_el = el
-        self.set_flag = True
+        self.ctl_q.put(('position', az, el)) #sent by the poll loop
         #self.md01.set_position(self.tar_az, self.tar_el)
 
     def set_callback(self, callback):
         self.callback = callback
 
-    def _utc_ts(self):
-        return "{:s} | MD01 | ".format(datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%fZ'))
-
     def set_stop(self):
-        self.tar_az = self.status['cur_az']
-        self.tar_el = self.status['cur_el']
-        self.md01.set_stop()
+        self.ctl_q.put(('stop',)) #target becomes the current position, STOP sent by the poll loop
 
     def stop_thread(self):
-        self.md01.set_stop()
+        #the poll loop sends STOP and disconnects, see _shutdown
+        self.shutdown = True
+        self._stop.set()
+        if threading.current_thread() is self: return #threshold fault, run() exits after this poll
+        if self.is_alive(): self.join(self.timeout + self.poll_rate + 1.0)
+
+    def _shutdown(self):
+        threshold_fault = self.az_thresh_fault or self.el_thresh_fault #STOP already sent
+        if self.status['connected'] and not threshold_fault: self.md01.set_stop()
+        self.console.info(self.md01.get_rtt_stats().summary())
+        self.logger.info(self.md01.get_rtt_stats().summary())
+        self.console.info(self.scheduler.summary())
+        self.logger.info(self.scheduler.summary())
+        self.console.info(self.coalescer.summary())
+        self.logger.info(self.coalescer.summary())
         self.status['connected'] = self.md01.disconnect()
         self.parent.set_md01_con_status(self.status['connected']) #notify main thread of connection
-        self._stop.set()
 
     def stopped(self):
         return self._stop.isSet()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Multi Antenna Tracking Daemon    #
+# Project: VTGS Tracking Daemon             #
+# Version: 1.0                              #
+# Comment:                                  #
+#   One daemon process driving a list of    #
+#   MD01 controllers.  Each antenna has its #
+#   own state machine and MD01 client, all  #
+#   share one event loop, one logger and    #
+#   one client listener.  Client commands   #
+#   are routed to an antenna by 'ssid'.     #
+#############################################
+
+import copy
+from collections import OrderedDict
+
+from loop_runtime import *
+
+class Antenna_Loop(Main_Loop):
+    """
+    State machine for one antenna of the multi antenna daemon.
+
+    Same states and message handling as Main_Loop, but the service is
+    shared and owned by Multi_Antenna_Daemon, and a fault only stops this
+    antenna's MD01 client.
+    """
+    def __init__ (self, cfg, loop, logger, service):
+        Main_Loop.__init__(self, cfg, loop, logger)
+        self.service_thread = service
+
+    def _on_state_event(self):
+        if self.state == 'FAULT':
+            if not self.md01_thread.stopped():
+                self.console.error("{:s} in FAULT state, stopping MD01 client", self.ssid)
+                self.logger.warning("{:s} in FAULT state, stopping MD01 client".format(self.ssid))
+                self.md01_thread.stop_thread()
+        else:
+            self._step_state()
+
+    def _format_user_feedback(self, msg):
+        msg['ssid'] = self.ssid #clients share one connection, tag telemetry with antenna
+        Main_Loop._format_user_feedback(self, msg)
+
+    def _init_threads(self):
+        self.logger.info('Setting up {:s} MD01 Loop Client'.format(self.ssid))
+        self.md01_thread = MD01_Loop_Client(self.cfg['md01'], self.logger, self, self.loop)
+        self.md01_thread.rx_q = Loop_Queue(self.loop, self._on_event, 'md01')
+        self.md01_thread.attach()
+        return True
+
+    def _stop_threads(self):
+        if not self.md01_thread.stopped():
+            self.md01_thread.stop_thread()
+        self.console.warning("Terminated {:s} MD01 Loop Client...", self.ssid)
+        self.logger.warning("Terminated {:s} MD01 Loop Client...".format(self.ssid))
+
+class Multi_Antenna_Daemon(object):
+    """
+    Title: Multi Antenna Tracking Daemon
+    Project: VTGS Tracking Daemon
+
+    Purpose:
+        Runs one Antenna_Loop per entry of cfg['antennas'] on a shared
+        Event_Loop, with a single Service listener and logger.  Commands
+        are routed by their 'ssid' field, messages without one go to the
+        only antenna when there is exactly one.  Client connection status
+        is shared by all antennas.
+
+    Args:
+        cfg - daemon configuration, with an 'antennas' list of
+              {'ssid':..., 'md01':{...}} entries.
+    """
+    def __init__ (self, cfg):
+        self.cfg    = cfg
+        self.ssid   = self.cfg['ssid']
+        self.console = get_console('multi')
+
+        log_name = 'trackd_{:s}'.format(self.ssid)
+        self.main_log_fh = setup_logger(log_name,
+                                        path=self.cfg['log_path'],
+                                        ts=self.cfg['startup_ts'],
+                                        async_cfg=self.cfg.get('log_async'))
+        self.logger = logging.getLogger(log_name) #shared logger for all antennas
+
+        self.loop = Event_Loop()
+        self.service = Service_Thread(self.cfg['service'], self.logger, self)
+        self.tick_interval = self.cfg.get('tick_interval', 0.1) #[s]
+
+        self.antennas = OrderedDict() #ssid -> Antenna_Loop
+        for ant in self.cfg['antennas']:
+            ant_cfg = dict((k, v) for k, v in self.cfg.items() if k != 'antennas')
+            ant_cfg['ssid'] = ant['ssid']
+            ant_cfg['md01'] = ant['md01']
+            ant_cfg['thread_enable'] = {'service':False, 'md01':True}
+            ant_cfg['messages'] = copy.deepcopy(self.cfg['messages'])
+            self.antennas[ant['ssid']] = Antenna_Loop(ant_cfg, self.loop, self.logger, self.service)
+        self.logger.info("Configured antennas: {:s}".format(', '.join(self.antennas.keys())))
+
+    def run(self):
+        self.console.info("Multi Antenna Daemon Started, antennas: {:s}", ', '.join(self.antennas.keys()))
+        self.logger.info("Launched multi antenna daemon")
+        try:
+            self.service.rx_q = Loop_Queue(self.loop, self._route, 'service')
+            self.service.setup(Loop_Poller(self.loop, self._on_service_event))
+            for antenna in self.antennas.values():
+                antenna._init_threads()
+                antenna._set_state('IDLE')
+            self.loop.call_later(self.tick_interval, self._tick)
+            self.loop.run()
+        except (KeyboardInterrupt): #when you press ctrl+c
+            self.console.warning("Caught CTRL-C, Stopping Antennas...")
+            self.logger.warning('Caught CTRL-C, Stopping Antennas...')
+            self.service.teardown()
+            for antenna in self.antennas.values():
+                antenna._stop_threads()
+            self.logger.warning('Terminating Multi Antenna Daemon...')
+        sys.exit()
+
+    #### FUNCTIONS CALLED BY SERVICE ####
+    def set_user_con_status(self, status):
+        for antenna in self.antennas.values():
+            antenna.set_user_con_status(status)
+
+    #### LOOP CALLBACKS ####
+    def _tick(self):
+        for antenna in self.antennas.values():
+            antenna._on_state_event()
+        self.service.service_tick() #client activity watchdogs
+        self.loop.call_later(self.tick_interval, self._tick)
+
+    def _on_service_event(self, fd, event):
+        self.service.handle_event(fd, event)
+        self.service.service_tick()
+
+    def _route(self, source, msg):
+        ssid = msg.get('ssid')
+        if ssid in self.antennas:
+            self.antennas[ssid]._on_event(source, msg)
+        elif ssid == None and len(self.antennas) == 1:
+            self.antennas.values()[0]._on_event(source, msg)
+        else:
+            self.console.warning("No antenna for ssid: {:s}", str(ssid))
+            self.logger.info("No antenna for ssid: {:s}".format(str(ssid)))
@@ -0,0 +1,421 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Pass Prediction                  #
+# Project: VTGS Tracking Daemon             #
+# Version: 1.0                              #
+# Comment:                                  #
+#   SGP4 propagation of a TLE over numpy    #
+#   time arrays, station az/el look angles, #
+#   pass search and a disk cache of the     #
+#   resulting pointing tables, so the       #
+#   daemon can track from a TLE alone.      #
+#############################################
+
+import os
+import math
+import time
+import datetime
+import threading
+import numpy
+
+#WGS-72 constants, as used to generate TLEs
+MU          = 398600.8          #[km^3/s^2]
+RE          = 6378.135          #[km]
+XKE         = 60.0 / math.sqrt(RE ** 3 / MU)
+J2          = 0.001082616
+J3          = -0.00000253881
+J4          = -0.00000165597
+J3OJ2       = J3 / J2
+TWOPI       = 2.0 * math.pi
+X2O3        = 2.0 / 3.0
+
+#WGS-84 ellipsoid for station coordinates
+WGS84_A     = 6378.137          #[km]
+WGS84_F     = 1.0 / 298.257223563
+
+_EPOCH      = datetime.datetime(1970, 1, 1)
+
+def _tle_float(field):
+    #TLE exponent fields, ' 12345-3' is 0.12345e-3
+    field = field.strip()
+    if field == '' or field.strip('+-0') == '': return 0.0
+    sign = -1.0 if field[0] == '-' else 1.0
+    field = field.lstrip('+-')
+    mant, exp = field[:-2], field[-2:]
+    return sign * float('0.' + mant.strip()) * 10.0 ** int(exp)
+
+def _tle_checksum(line):
+    total = 0
+    for c in line[:68]:
+        if c.isdigit(): total += int(c)
+        elif c == '-': total += 1
+    return total % 10
+
+class Satellite(object):
+    """
+    Near earth SGP4 model for one TLE (Vallado et al. 2006, AIAA 2006-6753).
+
+    Initialization follows sgp4init, propagate() is sgp4 evaluated over a
+    numpy array of times at once, including the Kepler iteration.  Deep
+    space (SDP4) objects, period of 225 min or more, are rejected, the
+    daemon tracks LEO.  Positions are TEME [km].
+    """
+    def __init__(self, line1, line2):
+        line1 = line1.rstrip()
+        line2 = line2.rstrip()
+        if len(line1) < 69 or len(line2) < 69 or line1[0] != '1' or line2[0] != '2':
+            raise ValueError("Malformed TLE")
+        for line in (line1, line2):
+            if not line[68].isdigit() or _tle_checksum(line) != int(line[68]):
+                raise ValueError("TLE checksum error: {:s}".format(line))
+        self.line1      = line1
+        self.line2      = line2
+        self.norad_id   = int(line1[2:7])
+        self.epoch_str  = line1[18:32].strip() #YYDDD.DDDDDDDD, cache key
+        year = int(line1[18:20])
+        year += 2000 if year < 57 else 1900
+        self.epoch = ((datetime.datetime(year, 1, 1) - _EPOCH).total_seconds()
+                      + (float(line1[20:32]) - 1.0) * 86400.0) #UTC unix time [s]
+        self.bstar  = _tle_float(line1[53:61])
+        self.inclo  = math.radians(float(line2[8:16]))
+        self.nodeo  = math.radians(float(line2[17:25]))
+        self.ecco   = float('0.' + line2[26:33].strip())
+        self.argpo  = math.radians(float(line2[34:42]))
+        self.mo     = math.radians(float(line2[43:51]))
+        self.no_kozai = float(line2[52:63]) * TWOPI / 1440.0 #[rad/min]
+        self._init()
+
+    def _init(self):
+        ecco, inclo, argpo = self.ecco, self.inclo, self.argpo
+        #initl, recover the un-Kozai'd mean motion
+        eccsq   = ecco * ecco
+        omeosq  = 1.0 - eccsq
+        rteosq  = math.sqrt(omeosq)
+        cosio   = math.cos(inclo)
+        cosio2  = cosio * cosio
+        ak      = (XKE / self.no_kozai) ** X2O3
+        d1      = 0.75 * J2 * (3.0 * cosio2 - 1.0) / (rteosq * omeosq)
+        dl      = d1 / (ak * ak)
+        adel    = ak * (1.0 - dl * dl - dl * (1.0 / 3.0 + 134.0 * dl * dl / 81.0))
+        dl      = d1 / (adel * adel)
+        no      = self.no_kozai / (1.0 + dl)
+        ao      = (XKE / no) ** X2O3
+        sinio   = math.sin(inclo)
+        po      = ao * omeosq
+        con42   = 1.0 - 5.0 * cosio2
+        con41   = -con42 - cosio2 - cosio2
+        posq    = po * po
+        rp      = ao * (1.0 - ecco)
+        if TWOPI / no >= 225.0:
+            raise ValueError("Deep space orbit (period >= 225 min) not supported")
+        if rp < 1.0:
+            raise ValueError("TLE perigee below the earth's surface")
+
+        #sgp4init, near earth
+        ss      = 78.0 / RE + 1.0
+        qzms2t  = ((120.0 - 78.0) / RE) ** 4
+        self.isimp = rp < (220.0 / RE + 1.0)
+        sfour   = ss
+        qzms24  = qzms2t
+        perige  = (rp - 1.0) * RE
+        if perige < 156.0:
+            sfour = perige - 78.0
+            if perige < 98.0: sfour = 20.0
+            qzms24 = ((120.0 - sfour) / RE) ** 4
+            sfour = sfour / RE + 1.0
+        pinvsq  = 1.0 / posq
+        tsi     = 1.0 / (ao - sfour)
+        eta     = ao * ecco * tsi
+        etasq   = eta * eta
+        eeta    = ecco * eta
+        psisq   = abs(1.0 - etasq)
+        coef    = qzms24 * tsi ** 4
+        coef1   = coef / psisq ** 3.5
+        cc2     = coef1 * no * (ao * (1.0 + 1.5 * etasq + eeta * (4.0 + etasq)) +
+                  0.375 * J2 * tsi / psisq * con41 * (8.0 + 3.0 * etasq * (8.0 + etasq)))
+        cc1     = self.bstar * cc2
+        cc3     = 0.0
+        if ecco > 1.0e-4: cc3 = -2.0 * coef * tsi * J3OJ2 * no * sinio / ecco
+        x1mth2  = 1.0 - cosio2
+        cc4     = 2.0 * no * coef1 * ao * omeosq * (eta * (2.0 + 0.5 * etasq) + ecco *
+                  (0.5 + 2.0 * etasq) - J2 * tsi / (ao * psisq) *
+                  (-3.0 * con41 * (1.0 - 2.0 * eeta + etasq * (1.5 - 0.5 * eeta)) +
+                  0.75 * x1mth2 * (2.0 * etasq - eeta * (1.0 + etasq)) * math.cos(2.0 * argpo)))
+        cc5     = 2.0 * coef1 * ao * omeosq * (1.0 + 2.75 * (etasq + eeta) + eeta * etasq)
+        cosio4  = cosio2 * cosio2
+        temp1   = 1.5 * J2 * pinvsq * no
+        temp2   = 0.5 * temp1 * J2 * pinvsq
+        temp3   = -0.46875 * J4 * pinvsq * pinvsq * no
+        self.mdot    = no + 0.5 * temp1 * rteosq * con41 + 0.0625 * temp2 * rteosq * (13.0 - 78.0 * cosio2 + 137.0 * cosio4)
+        self.argpdot = (-0.5 * temp1 * con42 + 0.0625 * temp2 * (7.0 - 114.0 * cosio2 + 395.0 * cosio4) +
+                        temp3 * (3.0 - 36.0 * cosio2 + 49.0 * cosio4))
+        xhdot1       = -temp1 * cosio
+        self.nodedot = xhdot1 + (0.5 * temp2 * (4.0 - 19.0 * cosio2) + 2.0 * temp3 * (3.0 - 7.0 * cosio2)) * cosio
+        self.omgcof  = self.bstar * cc3 * math.cos(argpo)
+        self.xmcof   = -X2O3 * coef * self.bstar / eeta if ecco > 1.0e-4 else 0.0
+        self.nodecf  = 3.5 * omeosq * xhdot1 * cc1
+        self.t2cof   = 1.5 * cc1
+        den = 1.0 + cosio if abs(cosio + 1.0) > 1.5e-12 else 1.5e-12
+        self.xlcof   = -0.25 * J3OJ2 * sinio * (3.0 + 5.0 * cosio) / den
+        self.aycof   = -0.5 * J3OJ2 * sinio
+        self.delmo   = (1.0 + eta * math.cos(self.mo)) ** 3
+        self.sinmao  = math.sin(self.mo)
+        self.x7thm1  = 7.0 * cosio2 - 1.0
+        self.x1mth2, self.con41 = x1mth2, con41
+        self.no, self.eta, self.cc1, self.cc4, self.cc5 = no, eta, cc1, cc4, cc5
+        if not self.isimp:
+            cc1sq       = cc1 * cc1
+            self.d2     = 4.0 * ao * tsi * cc1sq
+            temp        = self.d2 * tsi * cc1 / 3.0
+            self.d3     = (17.0 * ao + sfour) * temp
+            self.d4     = 0.5 * temp * ao * tsi * (221.0 * ao + 31.0 * sfour) * cc1
+            self.t3cof  = self.d2 + 2.0 * cc1sq
+            self.t4cof  = 0.25 * (3.0 * self.d3 + cc1 * (12.0 * self.d2 + 10.0 * cc1sq))
+            self.t5cof  = 0.2 * (3.0 * self.d4 + 12.0 * cc1 * self.d3 + 6.0 * self.d2 * self.d2 +
+                                 15.0 * cc1sq * (2.0 * self.d2 + cc1sq))
+
+    def propagate(self, t):
+        """
+        TEME position [km], shape (n, 3), at UTC unix times t [s].
+        Samples where the model breaks down (decayed orbit) are NaN.
+        """
+        t = (numpy.atleast_1d(numpy.asarray(t, dtype=numpy.float64)) - self.epoch) / 60.0 #minutes since epoch
+        #secular gravity and drag
+        xmdf    = self.mo + self.mdot * t
+        argpdf  = self.argpo + self.argpdot * t
+        nodedf  = self.nodeo + self.nodedot * t
+        t2      = t * t
+        nodem   = nodedf + self.nodecf * t2
+        tempa   = 1.0 - self.cc1 * t
+        tempe   = self.bstar * self.cc4 * t
+        templ   = self.t2cof * t2
+        mm, argpm = xmdf, argpdf
+        if not self.isimp:
+            delomg  = self.omgcof * t
+            delm    = self.xmcof * ((1.0 + self.eta * numpy.cos(xmdf)) ** 3 - self.delmo)
+            temp    = delomg + delm
+            mm      = xmdf + temp
+            argpm   = argpdf - temp
+            t3      = t2 * t
+            t4      = t3 * t
+            tempa   = tempa - self.d2 * t2 - self.d3 * t3 - self.d4 * t4
+            tempe   = tempe + self.bstar * self.cc5 * (numpy.sin(mm) - self.sinmao)
+            templ   = templ + self.t3cof * t3 + t4 * (self.t4cof + t * self.t5cof)
+        am      = (XKE / self.no) ** X2O3 * tempa * tempa
+        nm      = XKE / am ** 1.5
+        em      = self.ecco - tempe
+        bad     = (em >= 1.0) | (em < -0.001) | (am < 0.95)
+        em      = numpy.maximum(em, 1.0e-6)
+        mm      = mm + self.no * templ
+        xlm     = numpy.fmod(mm + argpm + nodem, TWOPI)
+        nodem   = numpy.fmod(nodem, TWOPI)
+        argpm   = numpy.fmod(argpm, TWOPI)
+
+        #long period periodics
+        axnl    = em * numpy.cos(argpm)
+        temp    = 1.0 / (am * (1.0 - em * em))
+        aynl    = em * numpy.sin(argpm) + temp * self.aycof
+        xl      = xlm + temp * self.xlcof * axnl
+
+        #Kepler's equation, fixed iterations for all samples
+        u       = numpy.fmod(xl - nodem, TWOPI)
+        eo1     = u.copy()
+        for i in range(10):
+            sineo1  = numpy.sin(eo1)
+            coseo1  = numpy.cos(eo1)
+            tem5    = (u - aynl * coseo1 + axnl * sineo1 - eo1) / (1.0 - coseo1 * axnl - sineo1 * aynl)
+            tem5    = numpy.clip(tem5, -0.95, 0.95)
+            eo1     = eo1 + tem5
+            if numpy.abs(tem5).max() < 1.0e-12: break
+        sineo1  = numpy.sin(eo1)
+        coseo1  = numpy.cos(eo1)
+
+        #short period periodics
+        ecose   = axnl * coseo1 + aynl * sineo1
+        esine   = axnl * sineo1 - aynl * coseo1
+        el2     = axnl * axnl + aynl * aynl
+        pl      = am * (1.0 - el2)
+        bad    |= pl < 0.0
+        rl      = am * (1.0 - ecose)
+        betal   = numpy.sqrt(numpy.abs(1.0 - el2))
+        temp    = esine / (1.0 + betal)
+        sinu    = am / rl * (sineo1 - aynl - axnl * temp)
+        cosu    = am / rl * (coseo1 - axnl + aynl * temp)
+        su      = numpy.arctan2(sinu, cosu)
+        sin2u   = (cosu + cosu) * sinu
+        cos2u   = 1.0 - 2.0 * sinu * sinu
+        temp    = 1.0 / numpy.abs(pl)
+        temp1   = 0.5 * J2 * temp
+        temp2   = temp1 * temp
+        cosip   = math.cos(self.inclo)
+        sinip   = math.sin(self.inclo)
+        mrt     = rl * (1.0 - 1.5 * temp2 * betal * self.con41) + 0.5 * temp1 * self.x1mth2 * cos2u
+        su      = su - 0.25 * temp2 * self.x7thm1 * sin2u
+        xnode   = nodem + 1.5 * temp2 * cosip * sin2u
+        xinc    = self.inclo + 1.5 * temp2 * cosip * sinip * cos2u
+        bad    |= mrt < 1.0
+
+        #orientation vectors
+        sinsu, cossu = numpy.sin(su), numpy.cos(su)
+        snod, cnod   = numpy.sin(xnode), numpy.cos(xnode)
+        sini, cosi   = numpy.sin(xinc), numpy.cos(xinc)
+        r = numpy.empty((len(t), 3))
+        mr = mrt * RE
+        r[:, 0] = mr * (-snod * cosi * sinsu + cnod * cossu)
+        r[:, 1] = mr * (cnod * cosi * sinsu + snod * cossu)
+        r[:, 2] = mr * sini * sinsu
+        r[bad] = numpy.nan
+        return r
+
+def gmst(t):
+    #Greenwich mean sidereal time [rad] (IAU-82) at UTC unix times t, UT1 ~ UTC
+    tut1 = (numpy.asarray(t, dtype=numpy.float64) / 86400.0 + 2440587.5 - 2451545.0) / 36525.0
+    sec = (-6.2e-6 * tut1 ** 3 + 0.093104 * tut1 ** 2 +
+           (876600.0 * 3600.0 + 8640184.812866) * tut1 + 67310.54841)
+    return numpy.mod(numpy.radians(sec / 240.0), TWOPI)
+
+def station_ecef(lat, lon, alt):
+    #geodetic lat/lon [deg], alt [m] to ECEF [km], WGS-84
+    lat, lon = math.radians(lat), math.radians(lon)
+    alt = alt / 1000.0
+    e2 = WGS84_F * (2.0 - WGS84_F)
+    n = WGS84_A / math.sqrt(1.0 - e2 * math.sin(lat) ** 2)
+    return numpy.array([(n + alt) * math.cos(lat) * math.cos(lon),
+                        (n + alt) * math.cos(lat) * math.sin(lon),
+                        (n * (1.0 - e2) + alt) * math.sin(lat)])
+
+def look_angles(sat, station, t):
+    """
+    Station az/el [deg] and range [km] to a Satellite at UTC unix times t.
+    station is a dict with lat, lon [deg] and alt [m].  az is in [0, 360),
+    NaN where the model fails.
+    """
+    t = numpy.atleast_1d(numpy.asarray(t, dtype=numpy.float64))
+    r = sat.propagate(t)
+    g = gmst(t)
+    cg, sg = numpy.cos(g), numpy.sin(g)
+    #TEME to ECEF, rotation by GMST (polar motion ignored)
+    site = station_ecef(station['lat'], station['lon'], station.get('alt', 0.0))
+    dx = cg * r[:, 0] + sg * r[:, 1] - site[0]
+    dy = -sg * r[:, 0] + cg * r[:, 1] - site[1]
+    dz = r[:, 2] - site[2]
+    lat, lon = math.radians(station['lat']), math.radians(station['lon'])
+    slat, clat, slon, clon = math.sin(lat), math.cos(lat), math.sin(lon), math.cos(lon)
+    e = -slon * dx + clon * dy
+    n = -slat * clon * dx - slat * slon * dy + clat * dz
+    u = clat * clon * dx + clat * slon * dy + slat * dz
+    az = numpy.mod(numpy.degrees(numpy.arctan2(e, n)), 360.0)
+    el = numpy.degrees(numpy.arctan2(u, numpy.hypot(e, n)))
+    return az, el, numpy.sqrt(e * e + n * n + u * u)
+
+def find_pass(sat, station, t0, horizon=86400.0, min_el=0.0, step=30.0):
+    """
+    (aos, los, max_el) of the pass in progress at t0 or the next one
+    within horizon [s], None if there is none.  el is sampled every step
+    [s] in one batch and the horizon crossings refined to 0.1 s.
+    """
+    t = numpy.arange(t0 - 3600.0, t0 + horizon + step, step) #an hour back catches a pass in progress
+    up = look_angles(sat, station, t)[1] >= min_el
+    rise = numpy.flatnonzero(up[1:] & ~up[:-1]) + 1
+    fall = numpy.flatnonzero(~up[1:] & up[:-1]) + 1
+    for i in rise:
+        after = fall[fall > i]
+        j = after[0] if len(after) > 0 else len(t) - 1
+        if t[j] <= t0: continue #pass already over
+        aos = _crossing(sat, station, t[i-1], t[i], min_el)
+        los = _crossing(sat, station, t[j-1], t[j], min_el)
+        el = look_angles(sat, station, numpy.arange(aos, los, 1.0))[1]
+        return aos, los, float(numpy.nanmax(el)) if len(el) > 0 else min_el
+    return None
+
+def _crossing(sat, station, t_a, t_b, min_el):
+    #time of the min_el crossing between t_a and t_b, 0.1 s grid
+    t = numpy.arange(t_a, t_b + 0.1, 0.1)
+    up = look_angles(sat, station, t)[1] >= min_el
+    k = numpy.flatnonzero(up[1:] != up[:-1])
+    return float(t[k[0] + 1]) if len(k) > 0 else float(t_b)
+
+def pass_table(sat, station, start, stop, step=0.1):
+    """
+    Pointing table for a pass, (ts, az, el) arrays at step [s] spacing.
+    az is unwrapped to be continuous through north, so interpolation
+    never sweeps the long way round.
+    """
+    ts = start + step * numpy.arange(int(math.ceil((stop - start) / step)) + 1)
+    az, el, rng = look_angles(sat, station, ts)
+    if numpy.isnan(az).any():
+        raise ValueError("SGP4 failed over the pass, TLE decayed or too old")
+    az = numpy.degrees(numpy.unwrap(numpy.radians(az)))
+    return ts, az, el
+
+class Pass_Cache(object):
+    """
+    Pointing tables keyed by (norad id, TLE epoch, pass start, pass stop),
+    in memory and as .npz files under path so they survive a daemon
+    restart.  The station and table step are part of the file name, a
+    table is never reused for another site, rate or time span.  min_el
+    only moves start and stop, so it needs no place of its own.
+    """
+    def __init__(self, path=None, max_tables=32):
+        self.path       = path
+        self.max_tables = max_tables
+        self.tables     = {} #file name -> (ts, az, el)
+        self.lock       = threading.Lock()
+        self.hits       = 0
+        self.misses     = 0
+
+    def _name(self, key, station, step):
+        norad, epoch, start, stop = key
+        return 'pass_{:05d}_{:s}_{:d}_{:d}_{:+.4f}_{:+.4f}_{:.0f}_{:g}.npz'.format(
+                    norad, epoch, int(start), int(stop), station['lat'], station['lon'], station.get('alt', 0.0), step)
+
+    def get(self, key, station, step):
+        name = self._name(key, station, step)
+        with self.lock:
+            table = self.tables.get(name)
+            if table == None and self.path != None and os.path.exists(os.path.join(self.path, name)):
+                with numpy.load(os.path.join(self.path, name)) as f:
+                    table = (f['ts'], f['az'], f['el'])
+                self.tables[name] = table
+            if table == None: self.misses += 1
+            else: self.hits += 1
+            return table
+
+    def put(self, key, station, step, table):
+        name = self._name(key, station, step)
+        with self.lock:
+            if len(self.tables) >= self.max_tables: self.tables.clear()
+            self.tables[name] = table
+            if self.path != None:
+                if not os.path.isdir(self.path): os.makedirs(self.path)
+                tmp = os.path.join(self.path, name + '.tmp')
+                with open(tmp, 'wb') as f:
+                    numpy.savez(f, ts=table[0], az=table[1], el=table[2])
+                os.rename(tmp, os.path.join(self.path, name)) #never leave a partial table
+
+def plan_pass(sat, station, cache=None, t0=None, start=None, stop=None, min_el=0.0, step=0.1, horizon=86400.0):
+    """
+    Pointing table for the pass of sat at station given by start/stop, or
+    in progress at / next after t0.  Returns (info, ts, az, el), info has
+    norad_id, epoch, aos, los, max_el and cached.
+    """
+    if start == None or stop == None:
+        found = find_pass(sat, station, time.time() if t0 == None else t0, horizon, min_el)
+        if found == None:
+            raise ValueError("No pass of {:d} above {:3.1f} deg in the next {:3.1f} h".format(
+                                sat.norad_id, min_el, horizon / 3600.0))
+        start, stop, max_el = found
+    else:
+        max_el = None
+    start = float(int(start)) #whole second pass start and stop, stable cache key
+    stop = float(math.ceil(stop))
+    key = (sat.norad_id, sat.epoch_str, start, stop)
+    table = cache.get(key, station, step) if cache != None else None
+    cached = table != None
+    if not cached:
+        table = pass_table(sat, station, start, stop, step)
+        if cache != None: cache.put(key, station, step, table)
+    ts, az, el = table
+    info = {'norad_id':sat.norad_id, 'epoch':sat.epoch_str, 'aos':start, 'los':stop,
+            'max_el':float(el.max()) if max_el == None else max_el, 'cached':cached}
+    return info, ts, az, el
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+#############################################
+#   Title: MD01 Pass Recorder               #
+# Project: VTGS Tracking Daemon             #
+# Version: 1.0                              #
+# Comment:                                  #
+#   Binary per session az/el recording.     #
+#   Fixed width float64 records after a     #
+#   small JSON header, loaded back as numpy #
+#   arrays with no parsing.                 #
+#############################################
+
+import os
+import json
+import struct
+import threading
+import numpy
+
+#File layout:
+#  magic 'VTGSPASS', uint16 version, uint32 header length (little endian)
+#  JSON header: session_id, ssid, start time, columns, record size
+#  zero padding to an 8 byte boundary
+#  records, one little endian float64 per column
+PASS_MAGIC      = b'VTGSPASS'
+PASS_VERSION    = 1
+_PREAMBLE       = struct.Struct('<8sHI')
+PASS_COLUMNS    = ('ts', 'az', 'el', 'az_rate', 'el_rate', 'tar_az', 'tar_el') #ts is UTC unix time [s]
+
+def pass_dtype(columns):
+    return numpy.dtype([(str(c), '<f8') for c in columns])
+
+class Pass_Recorder(object):
+    """
+    Appends fixed width records to a session file.
+
+    Records are written into a preallocated numpy block and the block is
+    written to disk in one call when it fills, so a sample costs one row
+    assignment.  The file is flushed on close, or every flush_len samples
+    (each block write) while recording.
+    """
+    def __init__(self, path, session_id, ssid, start_ts, columns=PASS_COLUMNS, flush_len=600):
+        self.path       = path
+        self.columns    = tuple(columns)
+        self.dtype      = pass_dtype(self.columns)
+        self.block      = numpy.zeros(max(1, int(flush_len)), dtype=self.dtype)
+        self.n          = 0 #records pending in block
+        self.count      = 0 #records written
+        self.lock       = threading.Lock()
+        self.header = {
+            'session_id':str(session_id),
+            'ssid':ssid,
+            'start':start_ts,
+            'columns':list(self.columns),
+            'dtype':'<f8',
+            'record_size':self.dtype.itemsize
+        }
+        hdr = json.dumps(self.header).encode('utf-8')
+        pad = (-(_PREAMBLE.size + len(hdr))) % 8
+        hdr += b' ' * pad
+        self.f = open(self.path, 'wb')
+        self.f.write(_PREAMBLE.pack(PASS_MAGIC, PASS_VERSION, len(hdr)))
+        self.f.write(hdr)
+        self.f.flush()
+
+    def append(self, *values):
+        #one value per column, in column order
+        with self.lock:
+            if self.f == None: return
+            self.block[self.n] = values
+            self.n += 1
+            if self.n == len(self.block): self._write_block()
+
+    def _write_block(self):
+        self.f.write(self.block[:self.n].tobytes())
+        self.f.flush()
+        self.count += self.n
+        self.n = 0
+
+    def close(self):
+        with self.lock:
+            if self.f == None: return
+            if self.n > 0: self._write_block()
+            self.f.close()
+            self.f = None
+
+def load_pass(path, mmap=True):
+    """
+    Returns (header, records) for a pass file.
+
+    records is a numpy structured array, records['az'] etc. are column
+    views.  With mmap the file is mapped rather than read, so load time
+    does not grow with file size.  A partial trailing record, left by a
+    crash mid write, is ignored.
+    """
+    with open(path, 'rb') as f:
+        magic, version, hdr_len = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+        if magic != PASS_MAGIC:
+            raise ValueError("Not a pass file: {:s}".format(path))
+        if version != PASS_VERSION:
+            raise ValueError("Unsupported pass file version: {:d}".format(version))
+        header = json.loads(f.read(hdr_len).decode('utf-8'))
+    dtype = pass_dtype(header['columns'])
+    offset = _PREAMBLE.size + hdr_len
+    count = (os.path.getsize(path) - offset) // dtype.itemsize
+    if count == 0:
+        return header, numpy.zeros(0, dtype=dtype)
+    if mmap:
+        return header, numpy.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(count,))
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return header, numpy.fromfile(f, dtype=dtype, count=count)
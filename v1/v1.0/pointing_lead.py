@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Pointing Lead Estimator          #
+# Project: VTGS Tracking Daemon             #
+# Version: 1.0                              #
+# Comment:                                  #
+#   Estimates how long after a trajectory   #
+#   target is computed the antenna actually #
+#   gets there, so SET commands can carry   #
+#   the target for that later time instead. #
+#############################################
+
+import math
+
+class Lead_Estimator(object):
+    """
+    End to end actuation latency while following a Trajectory.
+
+    A target computed at t reaches the antenna after the SET transit,
+    half an RTT, and is then held until the next poll while the rotator
+    slews to it, so on a moving pass the antenna trails the table.  Each
+    feedback sample is compared with the table at the time the controller
+    took it (receive time less half the RTT): the error along the table's
+    direction of motion divided by its rate is the lag in seconds.  With
+    the lead already applied added back this measures the latency, which
+    is smoothed with gain.  Before the first measurement the estimate is
+    half an RTT plus half a poll period.
+
+    Samples are skipped when the table moves slower than min_rate (the
+    0.1 deg feedback steps would swamp the lag) or the antenna is more
+    than max_error off it (still slewing to the pass).
+
+    cfg keys, all optional:
+        enable      - command the target at now + lead, default False
+        gain        - smoothing per sample, default 0.05
+        max_lead    - [s], estimate is clamped to 0..max_lead, default 2.0
+        min_rate    - [deg/s], default 0.2
+        max_error   - [deg], default 2.0
+    """
+    def __init__(self, cfg=None, poll_rate=0.0):
+        self.cfg        = cfg if cfg != None else {}
+        self.enable     = self.cfg.get('enable', False)
+        self.gain       = self.cfg.get('gain', 0.05)
+        self.max_lead   = self.cfg.get('max_lead', 2.0)
+        self.min_rate   = self.cfg.get('min_rate', 0.2)
+        self.max_error  = self.cfg.get('max_error', 2.0)
+        self.poll_rate  = poll_rate
+        self.reset()
+
+    def reset(self):
+        self.rtt        = None  #smoothed round trip time [s]
+        self.latency    = None  #smoothed actuation latency [s], None until measured
+        self.last_lag   = None  #lag of the latest sample [s]
+        self.count      = 0     #samples used
+        self.skipped    = 0
+
+    def get_latency(self):
+        #current latency estimate [s]
+        if self.latency != None: return self.latency
+        return min(0.5 * (self.rtt or 0.0) + 0.5 * self.poll_rate, self.max_lead)
+
+    def get_lead(self):
+        #time [s] to add to now when sampling the trajectory
+        if not self.enable: return 0.0
+        return self.get_latency()
+
+    def update(self, t_rx, rtt, cur_az, cur_el, traj):
+        """
+        Measure the lag of one feedback sample received at UTC unix time
+        t_rx while traj is being tracked.  Returns the lag [s] or None if
+        the sample was skipped.
+        """
+        if rtt != None:
+            self.rtt = rtt if self.rtt == None else self.rtt + 0.1 * (rtt - self.rtt)
+        t = t_rx - 0.5 * (self.rtt or 0.0) #when the controller read its encoders
+        h = 0.5 #[s] either side for the table rate
+        if t - h < traj.start or t + h > traj.stop:
+            self.skipped += 1
+            return None
+        az, el = traj.position_at(t)
+        az0, el0 = traj.position_at(t - h)
+        az1, el1 = traj.position_at(t + h)
+        v_az, v_el = (az1 - az0) / (2 * h), (el1 - el0) / (2 * h)
+        rate2 = v_az * v_az + v_el * v_el
+        err_az, err_el = az - cur_az, el - cur_el
+        if rate2 < self.min_rate * self.min_rate or math.hypot(err_az, err_el) > self.max_error:
+            self.skipped += 1
+            return None
+        lag = (err_az * v_az + err_el * v_el) / rate2
+        latency = self.get_lead() + lag
+        if self.latency == None: self.latency = self.get_latency()
+        self.latency = min(max(self.latency + self.gain * (latency - self.latency), 0.0), self.max_lead)
+        self.last_lag = lag
+        self.count += 1
+        return lag
+
+    def summary(self):
+        return "Pointing lead (enable={:s}): latency={:3.3f} [s], lead={:3.3f} [s], samples={:d}, skipped={:d}".format(
+                    str(self.enable), self.get_latency(), self.get_lead(), self.count, self.skipped)
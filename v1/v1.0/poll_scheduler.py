@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Monotonic Poll Scheduler         #
+# Project: VTGS Tracking Daemon             #
+# Version: 1.0                              #
+# Comment:                                  #
+#   Fixed cadence deadline scheduling on a  #
+#   monotonic clock for the MD01 poll loop, #
+#   with overrun and jitter statistics.     #
+#############################################
+
+import os
+import time
+import math
+import ctypes
+import ctypes.util
+
+#### MONOTONIC CLOCK ####
+#Python 2 has no time.monotonic, read CLOCK_MONOTONIC through libc instead.
+#Falls back to wall clock time if clock_gettime is unavailable.
+CLOCK_MONOTONIC = 1 #linux/time.h
+
+class _Timespec(ctypes.Structure):
+    _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+def _load_clock_gettime():
+    for name in ('c', 'rt'):
+        path = ctypes.util.find_library(name)
+        if path == None: continue
+        try:
+            func = getattr(ctypes.CDLL(path, use_errno=True), 'clock_gettime')
+        except (OSError, AttributeError):
+            continue
+        func.argtypes = [ctypes.c_int, ctypes.POINTER(_Timespec)]
+        return func
+    return None
+
+if hasattr(time, 'monotonic'):
+    monotonic = time.monotonic
+else:
+    _clock_gettime = _load_clock_gettime()
+    if _clock_gettime != None:
+        _ts = _Timespec()
+        def monotonic():
+            """ Seconds from an arbitrary fixed point, never jumps with wall clock changes """
+            if _clock_gettime(CLOCK_MONOTONIC, ctypes.byref(_ts)) != 0:
+                errno_ = ctypes.get_errno()
+                raise OSError(errno_, os.strerror(errno_))
+            return _ts.tv_sec + _ts.tv_nsec * 1e-9
+    else:
+        monotonic = time.time
+
+class Poll_Scheduler(object):
+    """
+    Deadline based fixed cadence scheduler.
+
+    Deadlines are start + n * period on the monotonic clock, so time
+    spent doing work is absorbed instead of added to the period and the
+    cadence does not drift.  If work runs past the next deadline that
+    cycle is an overrun; deadlines that passed entirely are counted as
+    missed and skipped, keeping samples on the original grid.  Jitter is
+    how late each cycle actually started relative to its deadline.
+    """
+    def __init__(self, period):
+        self.period = period
+        self.start()
+
+    def start(self, now=None, delay=None):
+        #restart the cadence, first deadline one period (or delay) from now
+        if now == None: now = monotonic()
+        if delay == None: delay = self.period
+        self.deadline   = now + delay
+        self.cycles     = 0     #cycles started
+        self.overruns   = 0     #cycles whose work ran past the next deadline
+        self.missed     = 0     #deadlines skipped entirely
+        self.jitter_last = 0.0  #[s] lateness of last cycle start
+        self.jitter_max  = 0.0
+        self.jitter_sum  = 0.0
+        self.jitter_sq   = 0.0
+
+    def delay(self, now=None):
+        #seconds until the next deadline, 0 if it already passed
+        if now == None: now = monotonic()
+        return max(0.0, self.deadline - now)
+
+    def wait(self):
+        #block until the next deadline, then record the cycle start
+        delay = self.delay()
+        if delay > 0: time.sleep(delay)
+        return self.tick()
+
+    def tick(self, now=None):
+        #record start of a cycle and advance the deadline, returns lateness [s]
+        if now == None: now = monotonic()
+        late = max(0.0, now - self.deadline)
+        self.cycles      += 1
+        self.jitter_last  = late
+        self.jitter_sum  += late
+        self.jitter_sq   += late * late
+        if late > self.jitter_max: self.jitter_max = late
+
+        self.deadline += self.period
+        if now >= self.deadline: #work overran into the following period(s)
+            self.overruns += 1
+            skip = int((now - self.deadline) / self.period) + 1
+            self.missed   += skip
+            self.deadline += skip * self.period
+        return late
+
+    def jitter_mean(self):
+        if self.cycles == 0: return None
+        return self.jitter_sum / self.cycles
+
+    def jitter_std(self):
+        if self.cycles == 0: return None
+        mean = self.jitter_sum / self.cycles
+        return math.sqrt(max(0.0, self.jitter_sq / self.cycles - mean * mean))
+
+    def get_stats(self):
+        return {'period':self.period,
+                'cycles':self.cycles,
+                'overruns':self.overruns,
+                'missed':self.missed,
+                'jitter_last':self.jitter_last,
+                'jitter_mean':self.jitter_mean(),
+                'jitter_std':self.jitter_std(),
+                'jitter_max':self.jitter_max}
+
+    def summary(self):
+        if self.cycles == 0: return "Poll [ms] (period={:3.1f}): no cycles".format(self.period*1000)
+        return "Poll [ms] (period={:3.1f}, n={:d}): overruns={:d}, missed={:d}, jitter mean={:3.3f}, std={:3.3f}, max={:3.3f}".format(
+                    self.period*1000, self.cycles, self.overruns, self.missed,
+                    self.jitter_mean()*1000, self.jitter_std()*1000, self.jitter_max*1000)
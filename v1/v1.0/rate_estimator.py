@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Antenna Rate Estimator           #
+# Project: VTGS Tracking Daemon             #
+# Version: 1.0                              #
+# Comment:                                  #
+#   Filtered az/el rate estimates and       #
+#   motion detection from MD01 feedback.    #
+#   Online estimators are O(1) per sample,  #
+#   estimate_rates() and detect_motion()    #
+#   run the same filters over numpy arrays  #
+#   for tuning against recorded passes.     #
+#############################################
+
+import numpy
+
+class Diff_Rate(object):
+    """ Two point difference, the original unfiltered estimate """
+    def __init__(self, cfg):
+        self.warmup = 2
+        self.reset()
+
+    def reset(self):
+        self.t_last = None
+        self.x_last = None
+        self.rate   = 0.0
+
+    def update(self, t, x):
+        if self.t_last != None:
+            self.rate = (x - self.x_last) / (t - self.t_last)
+        self.t_last = t
+        self.x_last = x
+        return self.rate
+
+class LSQ_Rate(object):
+    """
+    Slope of a least squares line over the last 'window' samples.
+
+    Samples live in a preallocated ring with running sums, so each update
+    is O(1).  Rates from a partly filled window are noisy, so motion
+    detection waits for a full window (warmup).  Times are stored relative to a reference that is moved to
+    the oldest sample each time the ring wraps, and the sums recomputed,
+    which bounds rounding drift at amortized O(1) cost.
+    """
+    def __init__(self, cfg):
+        self.window = max(2, int(cfg.get('window', 8)))
+        self.warmup = self.window
+        self.reset()
+
+    def reset(self):
+        self.t      = [0.0] * self.window #times relative to t_ref
+        self.x      = [0.0] * self.window
+        self.n      = 0
+        self.head   = 0 #next write index, oldest sample once full
+        self.t_ref  = None
+        self.st = self.sx = self.stt = self.stx = 0.0
+        self.rate   = 0.0
+
+    def update(self, t, x):
+        if self.t_ref == None: self.t_ref = t
+        t = t - self.t_ref
+        i = self.head
+        if self.n == self.window: #evict oldest
+            to, xo = self.t[i], self.x[i]
+            self.st -= to; self.sx -= xo; self.stt -= to * to; self.stx -= to * xo
+        else:
+            self.n += 1
+        self.t[i] = t
+        self.x[i] = x
+        self.st += t; self.sx += x; self.stt += t * t; self.stx += t * x
+        self.head = (i + 1) % self.window
+        if self.head == 0: self._rebase()
+
+        n = self.n
+        den = n * self.stt - self.st * self.st
+        if n >= 2 and den > 1e-12:
+            self.rate = (n * self.stx - self.st * self.sx) / den
+        return self.rate
+
+    def _rebase(self):
+        shift = self.t[self.head] if self.n == self.window else self.t[0]
+        self.t_ref += shift
+        self.st = self.sx = self.stt = self.stx = 0.0
+        for k in range(self.n):
+            t = self.t[k] - shift
+            self.t[k] = t
+            self.st += t; self.sx += self.x[k]; self.stt += t * t; self.stx += t * self.x[k]
+
+class Alpha_Beta_Rate(object):
+    """ Alpha-beta tracking filter, position and rate state, O(1) per sample """
+    def __init__(self, cfg):
+        self.alpha  = cfg.get('alpha', 0.5)
+        self.beta   = cfg.get('beta', 0.1)
+        self.warmup = 2
+        self.reset()
+
+    def reset(self):
+        self.t_last = None
+        self.x_est  = 0.0
+        self.rate   = 0.0
+
+    def update(self, t, x):
+        if self.t_last == None:
+            self.x_est = x
+        else:
+            dt = t - self.t_last
+            x_pred = self.x_est + self.rate * dt
+            resid  = x - x_pred
+            self.x_est = x_pred + self.alpha * resid
+            self.rate += self.beta * resid / dt
+        self.t_last = t
+        return self.rate
+
+ESTIMATORS = {
+    'diff':Diff_Rate,
+    'lsq':LSQ_Rate,
+    'alpha_beta':Alpha_Beta_Rate
+}
+
+class Motion_Hysteresis(object):
+    """ Motion flag that sets above motion_on and clears below motion_off [deg/s] """
+    def __init__(self, motion_on, motion_off):
+        self.motion_on  = motion_on
+        self.motion_off = motion_off
+        self.motion     = False
+
+    def update(self, rate):
+        if abs(rate) > self.motion_on: self.motion = True
+        elif abs(rate) < self.motion_off: self.motion = False
+        return self.motion
+
+class Rate_Estimator(object):
+    """
+    Filtered az/el rates and motion flags for MD01_Thread.
+
+    cfg keys, all optional:
+        method      - 'lsq' (default), 'alpha_beta' or 'diff'
+        window      - lsq window length [samples], default 8
+        alpha, beta - alpha_beta gains
+        motion_on   - rate above which an axis is in motion [deg/s]
+        motion_off  - rate below which an axis is stopped [deg/s]
+        min_dt      - samples closer than this to the last are ignored [s]
+    """
+    def __init__(self, cfg=None):
+        self.cfg        = cfg if cfg != None else {}
+        self.method     = self.cfg.get('method', 'lsq')
+        if self.method not in ESTIMATORS:
+            raise ValueError("Unknown rate estimator: {:s}".format(self.method))
+        self.min_dt     = self.cfg.get('min_dt', 0.001) #[s]
+        self.az_filt    = ESTIMATORS[self.method](self.cfg)
+        self.el_filt    = ESTIMATORS[self.method](self.cfg)
+        self.az_motion  = Motion_Hysteresis(self.cfg.get('motion_on', 0.1), self.cfg.get('motion_off', 0.05))
+        self.el_motion  = Motion_Hysteresis(self.cfg.get('motion_on', 0.1), self.cfg.get('motion_off', 0.05))
+        self.skipped    = 0 #samples ignored for too small a time step
+        self.reset()
+
+    def reset(self):
+        self.t_last = None
+        self.count  = 0 #samples since reset, motion flags wait for filter warmup
+        self.az_filt.reset()
+        self.el_filt.reset()
+        self.az_motion.motion = False
+        self.el_motion.motion = False
+
+    def start(self, t, az, el):
+        #restart on a fresh connection, seeded with the first sample
+        self.reset()
+        self.update(t, az, el)
+
+    def update(self, t, az, el):
+        #returns az_rate, el_rate [deg/s], held at previous values if t did not advance
+        if self.t_last != None and (t - self.t_last) < self.min_dt:
+            self.skipped += 1
+            return self.get_rates()
+        self.t_last = t
+        self.count += 1
+        az_rate = self.az_filt.update(t, az)
+        el_rate = self.el_filt.update(t, el)
+        if self.count >= self.az_filt.warmup:
+            self.az_motion.update(az_rate)
+            self.el_motion.update(el_rate)
+        return az_rate, el_rate
+
+    def get_rates(self):
+        return self.az_filt.rate, self.el_filt.rate
+
+    def get_motion(self):
+        return self.az_motion.motion, self.el_motion.motion
+
+#### OFFLINE ####
+def estimate_rates(t, x, cfg=None):
+    """
+    Rates for a whole recorded pass, numpy arrays t [s] and x [deg].
+
+    lsq and diff are fully vectorized, lsq using cumulative sums over the
+    same trailing window as the online filter.  alpha_beta is recursive
+    and runs the online filter over the arrays.
+    """
+    cfg = cfg if cfg != None else {}
+    method = cfg.get('method', 'lsq')
+    t = numpy.asarray(t, dtype=numpy.float64)
+    x = numpy.asarray(x, dtype=numpy.float64)
+    rate = numpy.zeros(len(t))
+    if len(t) < 2: return rate
+    if method == 'diff':
+        rate[1:] = numpy.diff(x) / numpy.diff(t)
+    elif method == 'lsq':
+        w = max(2, int(cfg.get('window', 8)))
+        tr = t - t[0]
+        def window_sum(v): #trailing sums over up to w samples
+            c = numpy.concatenate(([0.0], numpy.cumsum(v)))
+            idx = numpy.arange(1, len(v) + 1)
+            return c[idx] - c[numpy.maximum(idx - w, 0)]
+        n   = numpy.minimum(numpy.arange(1, len(t) + 1), w).astype(numpy.float64)
+        st  = window_sum(tr)
+        sx  = window_sum(x)
+        stt = window_sum(tr * tr)
+        stx = window_sum(tr * x)
+        den = n * stt - st * st
+        ok  = (n >= 2) & (den > 1e-12)
+        rate[ok] = (n[ok] * stx[ok] - st[ok] * sx[ok]) / den[ok]
+    elif method in ESTIMATORS:
+        filt = ESTIMATORS[method](cfg)
+        for i in range(len(t)):
+            rate[i] = filt.update(t[i], x[i])
+    else:
+        raise ValueError("Unknown rate estimator: {:s}".format(method))
+    return rate
+
+def detect_motion(rate, motion_on=0.1, motion_off=0.05, warmup=1):
+    """ Vectorized Motion_Hysteresis over an array of rates, returns bool array """
+    r = numpy.abs(numpy.asarray(rate, dtype=numpy.float64))
+    state = numpy.full(len(r), -1, dtype=numpy.int8) #-1 hold, 0 stopped, 1 moving
+    state[r < motion_off] = 0
+    state[r > motion_on] = 1
+    if warmup > 1: state[:warmup-1] = -1 #filter still filling
+    #carry the last decided state forward through the hold band
+    idx = numpy.where(state >= 0, numpy.arange(len(r)), -1)
+    idx = numpy.maximum.accumulate(idx) if len(r) > 0 else idx
+    motion = numpy.zeros(len(r), dtype=bool)
+    decided = idx >= 0
+    motion[decided] = state[idx[decided]] == 1
+    return motion
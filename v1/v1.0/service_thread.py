@@ -10,14 +10,108 @@ import sys
 import string
 import time
 import socket
+import select
+import errno
+import fcntl
 import datetime
 import json
-from Queue import Queue
+from Queue import Queue, Empty, Full
 from logger import *
-from watchdog_timer import *
+from console import *
+from timestamp import *
+from feedback import encode_msg
+from poll_scheduler import monotonic
 
 
 
+class Line_Framer(object):
+    """
+    Streaming newline delimited JSON framer.
+
+    Bytes from the socket are appended to a reusable buffer and every
+    complete line is returned, however TCP split or coalesced them.  A
+    trailing partial line is kept for the next feed.  Lines longer than
+    max_len are discarded to bound memory.  For clients that do not send
+    a delimiter, a buffered remainder that is a complete JSON object is
+    also returned.
+    """
+    def __init__(self, max_len=65536):
+        self.buf        = bytearray()
+        self.max_len    = max_len
+        self.overflows  = 0
+
+    def feed(self, data):
+        self.buf.extend(data)
+        lines = []
+        start = 0
+        end = self.buf.find(b'\n', start)
+        while end >= 0:
+            line = bytes(self.buf[start:end]).strip()
+            if line: lines.append(line)
+            start = end + 1
+            end = self.buf.find(b'\n', start)
+        del self.buf[:start]
+        if len(self.buf) > self.max_len: #no delimiter in sight, drop it
+            self.overflows += 1
+            del self.buf[:]
+        elif self.buf.rstrip()[-1:] == b'}': #undelimited legacy client
+            tail = bytes(self.buf).strip()
+            try:
+                json.loads(tail)
+                lines.append(tail)
+                del self.buf[:]
+            except ValueError: #not complete yet
+                pass
+        return lines
+
+class Client_Connection(object):
+    """
+    Per client state for the Service Thread event loop.
+
+    Holds the non-blocking socket, the pending outbound bytes and the
+    time of the client's last activity.  The activity watchdog is a
+    comparison against that time on each service tick, no timer thread.
+    """
+    def __init__(self, conn, addr, cid):
+        self.conn       = conn
+        self.addr       = addr
+        self.cid        = cid           #unique per connection, fds are reused, replies are addressed by this
+        self.fd         = conn.fileno()
+        self.tx_buf     = bytearray()   #serialized telemetry not yet accepted by the socket
+        self.rx_framer  = Line_Framer() #newline delimited JSON commands
+        self.last_rx    = monotonic()   #last data received, for the activity watchdog
+
+    def name(self):
+        return "[{:s}:{:d}]".format(self.addr[0], self.addr[1])
+
+    def expired(self, now, timeout):
+        return now - self.last_rx > timeout
+
+class Wakeup_Queue(Queue):
+    """
+    Bounded telemetry queue that wakes the Service Thread event loop on
+    every put.  Items are stamped with their enqueue time so delivery
+    latency can be measured.  When full the oldest item is dropped, the
+    newest telemetry is the most useful to clients.
+    """
+    def __init__(self, wake, maxsize=0):
+        Queue.__init__(self, maxsize)
+        self.wake = wake
+        self.dropped = 0
+
+    def put(self, item, block=False, timeout=None):
+        entry = (time.time(), item)
+        try:
+            Queue.put(self, entry, False)
+        except Full:
+            try:
+                Queue.get_nowait(self)
+                self.dropped += 1
+            except Empty:
+                pass
+            Queue.put(self, entry, False)
+        self.wake()
+
 class Service_Thread(threading.Thread):
     """
     Title: Tracking Daemon, Service Thread
@@ -27,8 +121,12 @@ class Service_Thread(threading.Thread):
     Author: Zach Leffke, KJ4QLP
 
     Purpose:
-        Handles Tracking Service interface to client
+        Handles Tracking Service interface to clients
         For now is only TCP/IP socket connection.
+        Serves any number of clients from a single non-blocking poll()
+        loop.  Telemetry put on tx_q wakes the loop through a self-pipe
+        and is sent to every connected client immediately; each client
+        has its own write buffer so a slow client cannot stall the rest.
 
     Args:
         cfg - Configurations for thread, dictionary format.
@@ -42,8 +140,9 @@ class Service_Thread(threading.Thread):
         self.cfg    = cfg
         self.logger = logger #Main logger for high level event logging
         self.parent = parent # callback to Daemon Main Thread
+        self.console = get_console('serv')
 
-        print self._utc_ts() + "Initializing {:s} Service Thread".format(self.cfg['ssid'])
+        self.console.info("Initializing {:s} Service Thread", self.cfg['ssid'])
         self.logger.info("Initializing {:s} Service Thread".format(self.cfg['ssid']))
 
         self.ssid       = self.cfg['ssid']
@@ -51,54 +150,94 @@ class Service_Thread(threading.Thread):
         self.port       = self.cfg['port']
         self.timeout    = self.cfg['timeout']
         self.wd_timeout = self.cfg['watchdog_interval']
+        self.max_clients    = self.cfg.get('max_clients', 16)
+        self.max_tx_buffer  = self.cfg.get('max_tx_buffer', 1048576) #bytes, slow clients beyond this are dropped
+        self.max_tx_queue   = self.cfg.get('max_tx_queue', 1000) #messages, oldest dropped beyond this
+        self.stats_interval = self.cfg.get('stats_interval', 60.0) #[s], telemetry counter log interval
+        self.ts_format      = self.cfg.get('ts_format', 'iso') #rx_ts/tx_ts as 'iso' string or 'epoch' float
 
-        self.rx_q = Queue() #Commands received from user
-        self.tx_q = Queue() #Telemetry for user
+        #self-pipe, any thread writes a byte to wake the poll loop
+        self.wake_r, self.wake_w = os.pipe()
+        fcntl.fcntl(self.wake_r, fcntl.F_SETFL, os.O_NONBLOCK)
+        fcntl.fcntl(self.wake_w, fcntl.F_SETFL, os.O_NONBLOCK)
 
-        self.watchdog = Watchdog(self.wd_timeout, self._watchdog_event)
+        self.rx_q = Queue() #Commands received from user
+        self.tx_q = Wakeup_Queue(self._wake, self.max_tx_queue) #Telemetry for user
+
+        #telemetry delivery counters, latency is enqueue to hand-off to client sockets
+        self.tx_stats = {
+            'queued':0,     #messages taken from tx_q
+            'batches':0,    #wakeups that delivered at least one message
+            'depth':0,      #tx_q depth at last drain
+            'max_depth':0,
+            'lat_last':0.0, #[s]
+            'lat_max':0.0,  #[s]
+            'lat_total':0.0 #[s]
+        }
+        self.stats_time = time.time()
+
+        self.clients    = {} #fd -> Client_Connection
+        self.next_cid   = 0
         self.user_con   = False
         self.daemon_state = "BOOT"
 
 
     def run(self):
-        print self._utc_ts() + "{:s} Service Thread Started".format(self.cfg['ssid'])
+        self.setup(select.poll())
+        while (not self._stop.isSet()):
+            try:
+                events = self.poller.poll(self.timeout * 1000)
+                for fd, event in events:
+                    self.handle_event(fd, event)
+                self.service_tick()
+            except Exception as e:
+                self.console.error("Unhandled Exception: {:s}", str(e))
+                self.logger.info("Unhandled Exception: {:s}".format(str(e)))
+        self.teardown()
+
+    #### EVENT LOOP STEPS, shared with the single loop runtime ####
+    def setup(self, poller):
+        #poller is select.poll() or any object with the same register/modify/unregister/poll API
+        self.console.info("{:s} Service Thread Started", self.cfg['ssid'])
         self.logger.info("{:s} Service Thread Started".format(self.cfg['ssid']))
         #Setup Socket
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM) #TCP Socket
         self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1) #To allow socket reuse
         self.sock.bind((self.ip, self.port))
-        self.sock.listen(1) #non-Blocking
-        #print self._utc_ts() + "Listening for client on: [{:s}:{:d}]".format(self.ip, self.port)
-        #self.logger.info("Listening for client on: [{:s}:{:d}]".format(self.ip, self.port))
-        while (not self._stop.isSet()):
-            try:
-                if self.user_con == False:
-                    #reset and wait for new connection
-                    print self._utc_ts() + "Listening for client on: [{:s}:{:d}]".format(self.ip, self.port)
-                    self.logger.info("Listening for client on: [{:s}:{:d}]".format(self.ip, self.port))
-                    #Block until User Connects
-                    self.conn, self.client = self.sock.accept()#Blocking
-                    self._Handle_Client_Connect()
-
-                elif self.user_con == True:
-                    data = self.conn.recvfrom(1024)[0]  #blocking?
-                    if data == '':
-                        self._Handle_Client_Disconnect()
-                    else:
-                        data = data.strip()
-                        ts = datetime.datetime.utcnow()
-                        if self._Check_RX_Message(data, ts): #True if fully validated frame
-                            print 'serv', type(self.rx_msg), self.rx_msg
-                            self.rx_q.put(self.rx_msg)
-                        else: #bad msg format
-                            #send some kind of NACK feedback
-                            #self.conn.sendall('INVALID,' + data + '\n')
-                            pass
-            except socket.timeout: #Timout, No USer Data
-                self._Handle_Socket_Timeout()
-            except Exception as e:
-                print self._utc_ts() + "Unhandled Exception: {:s}".format(str(e))
-                self.logger.info("Unhandled Exception: {:s}".format(str(e)))
+        self.sock.listen(self.max_clients)
+        self.sock.setblocking(0)
+        self.poller = poller
+        self.poller.register(self.sock.fileno(), select.POLLIN)
+        self.poller.register(self.wake_r, select.POLLIN)
+        self.console.info("Listening for clients on: [{:s}:{:d}]", self.ip, self.port)
+        self.logger.info("Listening for clients on: [{:s}:{:d}]".format(self.ip, self.port))
+
+    def handle_event(self, fd, event):
+        if fd == self.wake_r:
+            self._Drain_Wakeup()
+        elif fd == self.sock.fileno():
+            self._Handle_Client_Connect()
+        elif fd in self.clients:
+            client = self.clients[fd]
+            if event & (select.POLLERR | select.POLLNVAL):
+                self._Handle_Client_Disconnect(client)
+                return
+            if event & (select.POLLIN | select.POLLHUP):
+                self._Handle_Client_Data(client)
+            if (event & select.POLLOUT) and (fd in self.clients):
+                self._Flush_Client(client)
+
+    def service_tick(self):
+        self._Handle_Expired_Clients()
+        self._Handle_Telemetry()
+
+    def teardown(self):
+        for client in self.clients.values():
+            self._Handle_Client_Disconnect(client)
+        self.poller.unregister(self.sock.fileno())
+        self.poller.unregister(self.wake_r)
+        self.sock.close()
+        self.logger.info(self.get_tx_stats_summary())
 
 
 
@@ -110,16 +249,20 @@ class Service_Thread(threading.Thread):
                                     ts=ts)
         self.msg_logger = logging.getLogger(log_name) #main logger
 
-        print self._utc_ts() + "Setup Session Logger: {:s}".format(session_id)
+        self.console.info("Setup Session Logger: {:s}", session_id)
         self.msg_logger.info("Session ID: {:s}".format(session_id))
 
-        print self._utc_ts() + 'Started Logging: ' + self.msg_logger.handlers[-1].baseFilename
+        self.console.info('Started Logging: {:s}', self.msg_logger.handlers[-1].baseFilename)
         self.logger.info("Started Logging: {:s}".format(self.msg_logger.handlers[-1].baseFilename))
 
     def stop_logging(self):
-        print self._utc_ts() + 'Stopped Logging: ' + self.msg_logger.handlers[-1].baseFilename
+        if getattr(self, 'msg_logger', None) == None: return #no session logged
+        self.console.info('Stopped Logging: {:s}', self.msg_logger.handlers[-1].baseFilename)
         self.logger.info("Stopped Logging: {:s}".format(self.msg_logger.handlers[-1].baseFilename))
-        self.msg_logger.removeHandler(self.msg_logger.handlers[-1])
+        handler = self.msg_logger.handlers[-1]
+        self.msg_logger.removeHandler(handler)
+        handler.close()
+        self.msg_logger = None
 
     def send_management_feedback(self, daemon_state):
         msg = ""
@@ -159,96 +302,186 @@ class Service_Thread(threading.Thread):
 
 
     #### LOCAL FUNCTION CALLS ####
+    def _wake(self):
+        try:
+            os.write(self.wake_w, b'\x00')
+        except OSError as e: #pipe full, loop is already due to wake
+            if e.errno != errno.EAGAIN: raise
+
+    def _Drain_Wakeup(self):
+        try:
+            while os.read(self.wake_r, 4096): pass
+        except OSError as e:
+            if e.errno != errno.EAGAIN: raise
+
     def _Handle_Client_Connect(self):
-        self.conn.settimeout(self.timeout) #Make the connection non-blocking so we can send data
-        print self._utc_ts() + "User connected from: [{:s}:{:d}]".format(self.client[0], self.client[1])
-        self.logger.info("User connected from: [{:s}:{:d}]".format(self.client[0], self.client[1]))
-        print self._utc_ts() + "Starting user activity watchdog: {:3.3f} sec".format(self.wd_timeout)
+        try:
+            conn, addr = self.sock.accept()
+        except socket.error as e:
+            if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK): return
+            raise
+        if len(self.clients) >= self.max_clients:
+            self.console.warning("Rejected client from: [{:s}:{:d}], {:d} clients connected", addr[0], addr[1], len(self.clients))
+            self.logger.info("Rejected client from: [{:s}:{:d}], {:d} clients connected".format(addr[0], addr[1], len(self.clients)))
+            conn.close()
+            return
+        conn.setblocking(0) #non-blocking, all waiting happens in poll()
+        self.next_cid += 1
+        client = Client_Connection(conn, addr, self.next_cid)
+        self.clients[client.fd] = client
+        self.poller.register(client.fd, select.POLLIN)
+        self.console.info("User connected from: {:s}", client.name())
+        self.logger.info("User connected from: {:s}".format(client.name()))
+        self.console.info("Starting user activity watchdog: {:3.3f} sec", self.wd_timeout)
         self.logger.info("Starting user activity watchdog: {:3.3f} sec".format(self.wd_timeout))
-        self.watchdog = Watchdog(self.wd_timeout, self._watchdog_event) #re-initiliaze watchdog
-        self.watchdog.start() #start the watchdog, if nothing happens, reset connection
-        #generate session id and log it
-        #self.session_id = uuid.uuid4()
-        #print self._utc_ts() + "Started Session ID: {:s}".format(self.session_id)
-        #self.logger.info("Started Session ID: {:s}".format(self.session_id))
-        #start session logger
-        #self._start_logging()
-        #set user connection status
-        self._set_user_con_status(True)
-        #self.conn.sendall(json.dumps({'session_id':str(self.session_id)})+'\n')
-
-
-
-    def _Handle_Client_Disconnect(self):
-
-        print self._utc_ts() + "User disconnected from: [{:s}:{:d}]".format(self.client[0], self.client[1])
-        self.logger.info("User disconnected from: [{:s}:{:d}]".format(self.client[0], self.client[1]))
-        #stop session logger and watchdog
-        self.watchdog.stop() #stop watchdog
-        #self._stop_logging()
-        #print self._utc_ts() + "Stopped Session ID: {:s}".format(self.session_id)
-        #self.logger.info("Stopped Session ID: {:s}".format(self.session_id))
-        #self.session_id  = None
-        #set user connection status
-        self._set_user_con_status(False)
+        #set user connection status on first client
+        if len(self.clients) == 1:
+            self._set_user_con_status(True)
+
+    def _Handle_Client_Disconnect(self, client):
+        self.console.info("User disconnected from: {:s}", client.name())
+        self.logger.info("User disconnected from: {:s}".format(client.name()))
+        self.clients.pop(client.fd, None)
+        try: self.poller.unregister(client.fd)
+        except KeyError: pass
         #close the socket
-        self.conn.close()
-
-    def _watchdog_event(self):
-        print self._utc_ts() + "Watchdog Expired, no user activity for {:3.3f} seconds".format(self.wd_timeout)
-        self.logger.info("Watchdog Expired, no user activity for {:3.3f} seconds".format(self.wd_timeout))
-        self._Handle_Client_Disconnect()
-
-    def _Handle_Socket_Timeout(self):
-        #Should only happen after user has connected, but is not sending data
-        if self.user_con: #USer is connected, see about sending feedback
-            #print "TIMEOUT"
-            if not self.tx_q.empty(): #something in transmission Queue for User
-                msg = self.tx_q.get()
-                print 'out of q', msg
-                #msg.update({'ts':msg['ts'].strftime('%Y-%m-%dT%H:%M:%S.%fZ')})
-                self._Send_Feedback(msg)
-
-
-
-
-    def _Check_RX_Message(self, data, ts):
-        print self._utc_ts() + "Received user data, resetting watchdog: {:3.3f} sec".format(self.wd_timeout)
-        self.logger.info("Received user data, resetting watchdog: {:3.3f} sec".format(self.wd_timeout))
-        self.watchdog.reset()
-        rx_ts = ts.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        client.conn.close()
+        #clear user connection status when last client leaves
+        if len(self.clients) == 0 and self.user_con:
+            self._set_user_con_status(False)
+
+    def _Handle_Expired_Clients(self):
+        #if nothing is received from a client within wd_timeout, reset its connection
+        now = monotonic()
+        for client in self.clients.values():
+            if client.expired(now, self.wd_timeout):
+                self.console.warning("Watchdog Expired, no activity from {:s} for {:3.3f} seconds", client.name(), self.wd_timeout)
+                self.logger.info("Watchdog Expired, no activity from {:s} for {:3.3f} seconds".format(client.name(), self.wd_timeout))
+                self._Handle_Client_Disconnect(client)
+
+    def _Handle_Client_Data(self, client):
+        try:
+            data = client.conn.recv(65536)
+        except socket.error as e:
+            if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK): return
+            data = ''
+        if data == '':
+            self._Handle_Client_Disconnect(client)
+        else:
+            ts = time.time()
+            client.last_rx = monotonic() #resets the client's activity watchdog
+            for line in client.rx_framer.feed(data):
+                if self._Check_RX_Message(client, line, ts): #True if fully validated frame
+                    self.console.debug('RX {}', self.rx_msg)
+                    self.rx_q.put(self.rx_msg)
+                else: #bad msg format
+                    #send some kind of NACK feedback
+                    pass
+
+    def _Handle_Telemetry(self):
+        #drain everything queued for users, coalesced into one write per client
+        depth = self.tx_q.qsize()
+        if depth == 0: return
+        self.tx_stats['depth'] = depth
+        if depth > self.tx_stats['max_depth']: self.tx_stats['max_depth'] = depth
+        batch = []
+        now = time.time()
+        while True:
+            try:
+                q_ts, msg = self.tx_q.get_nowait()
+            except Empty:
+                break
+            lat = now - q_ts
+            self.tx_stats['queued'] += 1
+            self.tx_stats['lat_last'] = lat
+            self.tx_stats['lat_total'] += lat
+            if lat > self.tx_stats['lat_max']: self.tx_stats['lat_max'] = lat
+            if self.user_con: #Users are connected, send feedback
+                batch.append(msg)
+        if len(batch) > 0:
+            self.tx_stats['batches'] += 1
+            self._Send_Feedback(batch)
+        if now - self.stats_time >= self.stats_interval:
+            self.stats_time = now
+            self.logger.info(self.get_tx_stats_summary())
+
+    def get_tx_stats(self):
+        stats = dict(self.tx_stats)
+        stats['dropped'] = self.tx_q.dropped
+        stats['lat_mean'] = stats['lat_total'] / stats['queued'] if stats['queued'] > 0 else 0.0
+        return stats
+
+    def get_tx_stats_summary(self):
+        stats = self.get_tx_stats()
+        return "Telemetry: queued={:d}, batches={:d}, dropped={:d}, depth={:d}, max_depth={:d}, latency [ms] mean={:3.3f}, max={:3.3f}".format(
+                    stats['queued'], stats['batches'], stats['dropped'], stats['depth'], stats['max_depth'],
+                    stats['lat_mean']*1000, stats['lat_max']*1000)
+
+    def _Check_RX_Message(self, client, data, ts):
+        rx_ts = wire_ts(ts, self.ts_format)
         try:
             msg = json.loads(data)
-            msg.update({'rx_ts':rx_ts})
+            msg.update({'rx_ts':rx_ts, 'client':client.cid}) #replies to this command go back to this client only
+            if 'trace' in msg: msg['trace']['svc_rx'] = time.time() #latency benchmark stage stamp
             #msg.update({'session_id':str(self.session_id)})
-            #self.msg_logger.info("Received VALID JSON from [{:s}:{:d}]: {:s}".format(self.client[0], self.client[1], json.dumps(msg)))
             self.rx_msg = msg
             return True
         except Exception as e:
-            print e
-            print self._utc_ts() + "{:s} from [{:s}:{:d}]: {:s}".format(str(e), self.client[0], self.client[1], str(data))
-            #self.msg_logger.info("{:s} from [{:s}:{:d}]: {:s}".format(str(e), self.client[0], self.client[1], str(data)))
+            self.console.warning("{:s} from {:s}: {:s}", str(e), client.name(), str(data))
             return False
 
-    def _Send_Feedback(self, msg):
-        msg.update({'tx_ts':datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%fZ')})
-        print msg
-        self.conn.sendall(json.dumps(msg))
-        #self.msg_logger.info(json.dumps(msg))
-        pass
+    def _Send_Feedback(self, msgs):
+        #serialize once for all clients, one buffered write per client
+        #replies carrying a 'client' id go to that client only, the rest is broadcast
+        tx_ts = wire_ts(time.time(), self.ts_format)
+        chunks = []
+        addressed = False
+        for msg in msgs:
+            cid = msg.pop('client', None)
+            if cid != None: addressed = True
+            msg.update({'tx_ts':tx_ts})
+            if 'trace' in msg: msg['trace']['svc_tx'] = time.time()
+            self.console.debug('TX {}', msg)
+            chunks.append((cid, encode_msg(msg)))
+        if not addressed:
+            data = '\n'.join([c for cid, c in chunks]) + '\n' #newline delimited, same framing as received commands
+        for client in self.clients.values():
+            if addressed:
+                own = [c for cid, c in chunks if cid == None or cid == client.cid]
+                if len(own) == 0: continue
+                data = '\n'.join(own) + '\n'
+            client.tx_buf.extend(data)
+            self._Flush_Client(client)
+
+    def _Flush_Client(self, client):
+        #write as much of the client's buffer as the socket takes, never blocks
+        if len(client.tx_buf) > 0:
+            try:
+                sent = client.conn.send(client.tx_buf)
+                del client.tx_buf[:sent]
+            except socket.error as e:
+                if e.args[0] not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    self._Handle_Client_Disconnect(client)
+                    return
+        if len(client.tx_buf) > self.max_tx_buffer:
+            self.console.warning("Dropping slow client {:s}, {:d} bytes unsent", client.name(), len(client.tx_buf))
+            self.logger.info("Dropping slow client {:s}, {:d} bytes unsent".format(client.name(), len(client.tx_buf)))
+            self._Handle_Client_Disconnect(client)
+        elif len(client.tx_buf) > 0:
+            self.poller.modify(client.fd, select.POLLIN | select.POLLOUT)
+        else:
+            self.poller.modify(client.fd, select.POLLIN)
 
     def stop(self):
-        print self._utc_ts() + "Terminating Service Thread..."
+        self.console.warning("Terminating Service Thread...")
         self.logger.warning("Terminating Service Thread...")
         self._stop.set()
+        self._wake()
         #sys.quit()
 
     def stopped(self):
         return self._stop.isSet()
 
-    def _utc_ts(self):
-        return "{:s} | serv | ".format(datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%fZ'))
-
 ##################OLD CLASS KEEPING FOR REFERENCE FOR NOW#############################
 
 class MotionFrame(object):
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+#############################################
+#   Title: MD01 SET Coalescer               #
+# Project: VTGS Tracking Daemon             #
+# Version: 1.0                              #
+# Comment:                                  #
+#   Decides which pending SET targets are   #
+#   worth sending to the MD-01.  Targets    #
+#   within a deadband of where the antenna  #
+#   is, or repeating a SET still being      #
+#   executed, are dropped and sends are     #
+#   rate limited, with counters for the     #
+#   poll summary.                           #
+#############################################
+
+class Set_Coalescer(object):
+    """
+    Filter between target updates and the controller.
+
+    Only the latest target is ever pending; one replaced before it was
+    sent counts as superseded.  A pending target is suppressed if both
+    axes are within deadband [deg] of the antenna, or if the antenna is
+    moving and it encodes to the same pulse counts as the last SET sent
+    (that command is still being executed).  Otherwise it is deferred
+    until min_interval [s] has passed since the last SET, then sent.
+
+    Not locked: every call except get_stats must come from the thread
+    that polls the controller, so a reset after STOP is ordered with the
+    check for the SET that follows it.  MD01_Thread applies main thread
+    requests through its control queue for this.
+
+    cfg keys, all optional:
+        deadband     - [deg], default 0.05, half the MD-01 0.1 deg resolution
+        min_interval - [s], default 0.0, no rate limit
+    """
+    def __init__(self, cfg=None):
+        self.cfg            = cfg if cfg != None else {}
+        self.deadband       = self.cfg.get('deadband', 0.05)
+        self.min_interval   = self.cfg.get('min_interval', 0.0)
+        self.counts = {'requested':0, 'superseded':0, 'suppressed':0, 'deferred':0, 'sent':0}
+        self.reset()
+
+    def reset(self):
+        #forget the last SET, after a STOP or reconnect the controller holds no target
+        self.last_cmd   = None
+        self.last_time  = None
+
+    def request(self, pending):
+        #new target, pending is True if the previous one was never sent
+        self.counts['requested'] += 1
+        if pending: self.counts['superseded'] += 1
+
+    def at_target(self, tar_az, tar_el, cur_az, cur_el):
+        #True (and counted as suppressed) if the antenna is already there
+        if abs(tar_az - cur_az) < self.deadband and abs(tar_el - cur_el) < self.deadband:
+            self.counts['suppressed'] += 1
+            return True
+        return False
+
+    def check(self, cmd, moving, now):
+        #'SEND', 'SUPPRESS' or 'DEFER' (keep pending) for a target not yet reached
+        #cmd is the target's (az, el) pulse counts, now is monotonic [s]
+        if moving and cmd == self.last_cmd:
+            self.counts['suppressed'] += 1
+            return 'SUPPRESS'
+        if self.last_time != None and now - self.last_time < self.min_interval:
+            self.counts['deferred'] += 1
+            return 'DEFER'
+        self.last_cmd, self.last_time = cmd, now
+        self.counts['sent'] += 1
+        return 'SEND'
+
+    def get_stats(self):
+        #copy, safe to read from other threads
+        return dict(self.counts)
+
+    def summary(self):
+        return "SET (deadband={:3.2f} [deg], min_interval={:3.3f} [s]): requested={:d}, sent={:d}, suppressed={:d}, superseded={:d}, deferred={:d}".format(
+                    self.deadband, self.min_interval, self.counts['requested'], self.counts['sent'],
+                    self.counts['suppressed'], self.counts['superseded'], self.counts['deferred'])
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+#############################################
+#   Title: MD01 Telemetry History           #
+# Project: VTGS Tracking Daemon             #
+# Version: 1.0                              #
+# Comment:                                  #
+#   Fixed size ring of recent MD01 samples  #
+#   with windowed queries, answers the      #
+#   'history' telecommand.                  #
+#############################################
+
+import threading
+import numpy
+
+from timestamp import utc_seconds
+
+HISTORY_FIELDS = ('ts', 'az', 'el', 'az_rate', 'el_rate') #ts is UTC unix time [s]
+
+class Telemetry_History(object):
+    """
+    Preallocated ring buffer of (ts, az, el, az_rate, el_rate) samples.
+
+    Appends are O(1) row writes into one numpy array.  Samples are in
+    time order starting at the oldest, so a time window is located by
+    binary search and its min/max/mean are numpy reductions over at most
+    two contiguous slices.  Appends come from the MD01 thread and queries
+    from the main thread, a lock keeps rows whole.
+    """
+    def __init__(self, size=36000):
+        self.size   = int(size)
+        self.data   = numpy.zeros((self.size, len(HISTORY_FIELDS)), dtype=numpy.float64)
+        self.head   = 0 #next write index
+        self.count  = 0
+        self.lock   = threading.Lock()
+
+    def clear(self):
+        with self.lock:
+            self.head  = 0
+            self.count = 0
+
+    def append(self, ts, az, el, az_rate, el_rate):
+        with self.lock:
+            self.data[self.head] = (ts, az, el, az_rate, el_rate)
+            self.head = (self.head + 1) % self.size
+            if self.count < self.size: self.count += 1
+
+    def __len__(self):
+        return self.count
+
+    #### QUERIES ####
+    def window(self, start=None, stop=None):
+        #copy of samples with start <= ts <= stop, oldest first, shape (n, 5)
+        with self.lock:
+            i0 = 0 if start == None else self._bisect(start, False)
+            i1 = self.count if stop == None else self._bisect(stop, True)
+            return self._slice(i0, max(i0, i1))
+
+    def stats(self, start=None, stop=None):
+        #min/max/mean per field over a window, max_abs for rates, None if empty
+        w = self.window(start, stop)
+        if len(w) == 0: return None
+        result = {'n':len(w), 'start':w[0, 0], 'stop':w[-1, 0]}
+        mins, maxs, means = w.min(axis=0), w.max(axis=0), w.mean(axis=0)
+        for i, key in enumerate(HISTORY_FIELDS[1:], 1):
+            result[key] = {'min':mins[i], 'max':maxs[i], 'mean':means[i]}
+            if 'rate' in key: result[key]['max_abs'] = max(-mins[i], maxs[i])
+        return result
+
+    def position_at(self, ts):
+        #interpolated (az, el) at time ts, None if outside the history
+        with self.lock:
+            if self.count == 0: return None
+            i = self._bisect(ts, False)
+            if i == self.count or (i == 0 and self._row(0)[0] > ts): return None
+            w = self._slice(max(0, i - 1), i + 1)
+        if len(w) == 1 or w[1, 0] == w[0, 0]: return w[-1, 1], w[-1, 2]
+        return (numpy.interp(ts, w[:, 0], w[:, 1]), numpy.interp(ts, w[:, 0], w[:, 2]))
+
+    #### RING INDEXING, caller holds lock ####
+    def _row(self, i):
+        #i is a logical index, 0 is the oldest sample
+        return self.data[(self.head - self.count + i) % self.size]
+
+    def _bisect(self, ts, right):
+        #first logical index with sample ts >= ts (> ts if right)
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            t = self._row(mid)[0]
+            if t < ts or (right and t == ts): lo = mid + 1
+            else: hi = mid
+        return lo
+
+    def _slice(self, i0, i1):
+        n = i1 - i0
+        p0 = (self.head - self.count + i0) % self.size
+        if p0 + n <= self.size:
+            return self.data[p0:p0+n].copy()
+        return numpy.concatenate((self.data[p0:], self.data[:p0+n-self.size]))
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Azimuth Planner Tests            #
+# Project: VTGS Tracking Daemon             #
+# Comment:                                  #
+#   Wrap choice for SET targets and passes  #
+#   and the over the top flip.              #
+#   python -m unittest discover             #
+#############################################
+
+import math
+import unittest
+import numpy
+
+from az_planner import *
+
+def overhead_pass(offset, n=601):
+    #east to west pass on a vertical plane offset [deg] north of the zenith, 1 s spacing
+    th = numpy.radians(numpy.linspace(0.5, 179.5, n))
+    d = math.radians(offset)
+    east, north, up = numpy.cos(th) * math.cos(d), numpy.full(n, math.sin(d)), numpy.sin(th) * math.cos(d)
+    az = numpy.mod(numpy.degrees(numpy.arctan2(east, north)), 360.0)
+    el = numpy.degrees(numpy.arcsin(up))
+    return numpy.arange(float(n)), az, el, numpy.degrees(th)
+
+class Test_Nearest_Az(unittest.TestCase):
+    def test_wrap(self):
+        planner = Az_Planner()
+        self.assertEqual(planner.nearest_az(10.0, 0.0), 10.0)
+        self.assertEqual(planner.nearest_az(10.0, 300.0), 370.0)
+        self.assertEqual(planner.nearest_az(350.0, 0.0), -10.0)
+        self.assertEqual(planner.nearest_az(200.0, 0.0), -160.0)
+        self.assertEqual(planner.nearest_az(170.0, 540.0), 530.0)
+        self.assertEqual(planner.nearest_az(-170.0, -170.0), -170.0)
+
+    def test_limits(self):
+        planner = Az_Planner({'az_min':0.0, 'az_max':450.0})
+        self.assertEqual(planner.nearest_az(350.0, 0.0), 350.0) #-10 is past the stop
+        self.assertEqual(planner.nearest_az(-30.0, 100.0), 330.0)
+        self.assertEqual(Az_Planner({'az_min':0.0, 'az_max':90.0}).nearest_az(180.0, 0.0), 180.0) #md01 clamps
+
+class Test_Plan(unittest.TestCase):
+    def test_pass_through_north_on_one_wrap(self):
+        ts = numpy.arange(5.0)
+        az, el, info = Az_Planner().plan(ts, [340.0, 350.0, 0.0, 10.0, 20.0], [10.0] * 5, 0.0, 0.0)
+        self.assertEqual(az.tolist(), [-20.0, -10.0, 0.0, 10.0, 20.0])
+        self.assertEqual((info['wrap'], info['flip'], info['fits']), (-1, False, True)) #turns added to the unwrapped table
+        self.assertAlmostEqual(info['max_az_rate'], 10.0)
+        az, el, info = Az_Planner().plan(ts, [340.0, 350.0, 0.0, 10.0, 20.0], [10.0] * 5, 350.0, 0.0)
+        self.assertEqual(az.tolist(), [340.0, 350.0, 360.0, 370.0, 380.0])
+        self.assertEqual(info['wrap'], 0)
+
+    def test_wrap_that_fits(self):
+        #nearest start would run the pass past the -180 stop
+        ts = numpy.arange(3.0)
+        az, el, info = Az_Planner().plan(ts, [190.0, 130.0, 70.0], [10.0] * 3, -170.0, 0.0)
+        self.assertEqual(az.tolist(), [190.0, 130.0, 70.0])
+        self.assertAlmostEqual(info['slew'], 360.0)
+
+    def test_does_not_fit(self):
+        ts = numpy.arange(9.0)
+        az, el, info = Az_Planner().plan(ts, numpy.arange(9) * 100.0, [10.0] * 9, 0.0, 0.0)
+        self.assertFalse(info['fits'])
+        self.assertEqual(az[0], 0.0)
+
+    def test_join_in_progress(self):
+        ts = numpy.arange(5.0)
+        az, el, info = Az_Planner().plan(ts, [100.0, 150.0, 200.0, 250.0, 300.0], [10.0] * 5, -110.0, 0.0, t_now=2.5)
+        self.assertEqual(az[2], -160.0)
+        self.assertEqual(info['slew'], 50.0)
+
+    def test_flip_overhead(self):
+        ts, az, el, th = overhead_pass(0.3)
+        planner = Az_Planner({'max_az_rate':5.0, 'el_flip':True})
+        az_p, el_p, info = planner.plan(ts, az, el, 90.0, 0.0)
+        self.assertTrue(info['flip'])
+        self.assertEqual(info['max_az_rate'], 0.0)
+        numpy.testing.assert_allclose(az_p, 90.0, atol=1e-9)
+        numpy.testing.assert_allclose(el_p, th, atol=1e-9)
+
+    def test_no_flip(self):
+        ts, az, el, th = overhead_pass(0.3)
+        info = Az_Planner({'max_az_rate':5.0}).plan(ts, az, el, 90.0, 0.0)[2] #el_flip off
+        self.assertFalse(info['flip'])
+        self.assertGreater(info['max_az_rate'], 5.0)
+        ts, az, el, th = overhead_pass(3.0) #too far off the track
+        info = Az_Planner({'max_az_rate':5.0, 'el_flip':True}).plan(ts, az, el, 90.0, 0.0)[2]
+        self.assertFalse(info['flip'])
+        ts, az, el, th = overhead_pass(0.3)
+        info = Az_Planner({'max_az_rate':100.0, 'el_flip':True}).plan(ts, az, el, 90.0, 0.0)[2] #keyhole followable
+        self.assertFalse(info['flip'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Feedback Snapshot Tests          #
+# Project: VTGS Tracking Daemon             #
+# Comment:                                  #
+#   Read only snapshots and the JSON of     #
+#   feedback replies.                       #
+#   python -m unittest discover             #
+#############################################
+
+import json
+import datetime
+import unittest
+
+from feedback import *
+
+class Test_Feedback(unittest.TestCase):
+    def setUp(self):
+        self.ts = datetime.datetime(2020, 1, 1, 12, 0, 0, 250000)
+        self.snap = Feedback_Snapshot(self.ts, 10.5, 20.25, 0.1, -0.2, 0.015)
+
+    def test_read_only(self):
+        self.assertRaises(AttributeError, setattr, self.snap, 'cur_az', 0.0)
+        self.assertEqual(self.snap.cur_az, 10.5)
+
+    def test_json_matches_dict(self):
+        for ts_format in ('iso', 'epoch'):
+            msg = Feedback_Msg(self.snap, ts_format)
+            self.assertEqual(json.loads(msg.to_json()), self.snap.to_dict(ts_format))
+            msg.update({'trace':7, 'ssid':'VUL'})
+            msg['tx_ts'] = 'x'
+            expect = dict(self.snap.to_dict(ts_format), trace=7, ssid='VUL', tx_ts='x')
+            self.assertEqual(json.loads(encode_msg(msg)), expect)
+        self.assertEqual(json.loads('{' + Feedback_Snapshot().json_body() + '}')['ts'], None)
+
+    def test_msg_fields(self):
+        msg = Feedback_Msg(self.snap)
+        msg['client'] = 3
+        self.assertTrue('cur_el' in msg and 'client' in msg and 'foo' not in msg)
+        self.assertEqual(msg['cur_el'], 20.25)
+        self.assertEqual(msg['ts'], '2020-01-01T12:00:00.250000Z')
+        self.assertRaises(KeyError, msg.__getitem__, 'foo')
+        self.assertEqual(msg.pop('client'), 3)
+        self.assertEqual(msg.pop('client'), None)
+        self.assertFalse('client' in json.loads(msg.to_json()))
+
+    def test_shared_snapshot(self):
+        #replies carrying one snapshot do not see each other's fields
+        a, b = Feedback_Msg(self.snap), Feedback_Msg(self.snap)
+        a['trace'] = 1
+        self.assertFalse('trace' in b)
+        self.assertEqual(encode_msg({'type':'ack'}), '{"type": "ack"}')
+
+if __name__ == '__main__':
+    unittest.main()
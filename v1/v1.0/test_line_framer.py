@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Line Framer Tests                #
+# Project: VTGS Tracking Daemon             #
+# Comment:                                  #
+#   Newline delimited JSON framing of the   #
+#   Service Thread client commands.         #
+#   python -m unittest discover             #
+#############################################
+
+import unittest
+
+from service_thread import Line_Framer
+
+class Test_Line_Framer(unittest.TestCase):
+    def setUp(self):
+        self.framer = Line_Framer()
+        self.a = b'{"type":"CMD","cmd":{"type":"STOP"}}'
+        self.b = b'{"type":"CMD","cmd":{"type":"QUERY"}}'
+
+    def test_coalesced(self):
+        self.assertEqual(self.framer.feed(self.a + b'\n' + self.b + b'\r\n\n'), [self.a, self.b])
+        self.assertEqual(len(self.framer.buf), 0)
+
+    def test_split(self):
+        data = self.a + b'\n' + self.b + b'\n'
+        lines = []
+        for i in range(0, len(data), 5):
+            lines.extend(self.framer.feed(data[i:i+5]))
+        self.assertEqual(lines, [self.a, self.b])
+        self.assertEqual(len(self.framer.buf), 0)
+
+    def test_partial_kept(self):
+        self.assertEqual(self.framer.feed(self.a + b'\n' + self.b[:10]), [self.a])
+        self.assertEqual(bytes(self.framer.buf), self.b[:10])
+        self.assertEqual(self.framer.feed(self.b[10:] + b'\n'), [self.b])
+
+    def test_overflow(self):
+        framer = Line_Framer(max_len=64)
+        self.assertEqual(framer.feed(b'x' * 40), [])
+        self.assertEqual(framer.feed(b'x' * 40), []) #past max_len with no delimiter
+        self.assertEqual((framer.overflows, len(framer.buf)), (1, 0))
+        self.assertEqual(framer.feed(self.a + b'\n'), [self.a]) #next line is framed again
+        self.assertEqual(self.framer.feed(b'x' * 65537), [])    #default 64 KB bound
+        self.assertEqual((self.framer.overflows, len(self.framer.buf)), (1, 0))
+
+    def test_legacy_undelimited(self):
+        #a remainder ending in } is returned only once it parses as JSON
+        self.assertEqual(self.framer.feed(b'{"type":"CMD","cmd":{"type":"STOP"}'), [])
+        self.assertEqual(self.framer.feed(b'}'), [self.a])
+        self.assertEqual(len(self.framer.buf), 0)
+        self.assertEqual(self.framer.feed(self.b + b'\n' + self.a), [self.b, self.a])
+        self.assertEqual(len(self.framer.buf), 0)
+
+if __name__ == '__main__':
+    unittest.main()
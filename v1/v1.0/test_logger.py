@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Async Logger Tests               #
+# Project: VTGS Tracking Daemon             #
+# Comment:                                  #
+#   Log_Writer overflow policies, counters  #
+#   and flush on shutdown.                  #
+#   python -m unittest discover             #
+#############################################
+
+import os
+import shutil
+import logging
+import tempfile
+import unittest
+
+from logger import *
+
+class Test_Log_Writer(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.fh = logging.FileHandler(os.path.join(self.path, 'test.log'))
+        self.fh.setFormatter(logging.Formatter('%(message)s'))
+
+    def tearDown(self):
+        self.fh.close()
+        shutil.rmtree(self.path)
+
+    def make_logger(self, writer):
+        log = logging.getLogger('test_logger_{:d}'.format(id(writer)))
+        log.propagate = False
+        log.setLevel(logging.INFO)
+        log.addHandler(Queue_Handler(writer))
+        return log
+
+    def lines(self):
+        with open(self.fh.baseFilename) as f:
+            return f.read().splitlines()
+
+    def overflow(self, policy):
+        #eight records into a queue of five before the writer drains it
+        writer = Log_Writer(self.fh, max_queue=5, policy=policy, interval=0.05)
+        log = self.make_logger(writer)
+        for i in range(8): log.warning('record %d', i)
+        self.assertEqual(writer.get_stats()['depth'], 5)
+        writer.start()
+        writer.stop()
+        self.assertFalse(writer.is_alive())
+        return writer, self.lines()
+
+    def test_drop_oldest(self):
+        writer, lines = self.overflow('drop_oldest')
+        self.assertEqual(lines[:6], ['record 3', 'record 4', 'record 5', 'record 6', 'record 7',
+                                     'Log queue overflow, 3 records dropped'])
+        self.assertEqual(lines[6:], ['Log writer: written=5, dropped=3, batches=1, max_depth=5'])
+        self.assertEqual(writer.get_stats(), {'written':6, 'dropped':3, 'batches':2, 'depth':0, 'max_depth':5})
+
+    def test_drop_newest(self):
+        writer, lines = self.overflow('drop_newest')
+        self.assertEqual(lines[:6], ['record 0', 'record 1', 'record 2', 'record 3', 'record 4',
+                                     'Log queue overflow, 3 records dropped'])
+        self.assertEqual(lines[6:], ['Log writer: written=5, dropped=3, batches=1, max_depth=5'])
+        self.assertEqual(writer.get_stats(), {'written':6, 'dropped':3, 'batches':2, 'depth':0, 'max_depth':5})
+
+    def test_flush_on_stop(self):
+        #records still queued at shutdown reach the file before stop returns
+        writer = Log_Writer(self.fh, interval=0.5)
+        log = self.make_logger(writer)
+        writer.start()
+        for i in range(100): log.info('record %d', i)
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            log.exception('failed')
+        writer.stop()
+        lines = self.lines()
+        self.assertEqual(lines[:100], ['record {:d}'.format(i) for i in range(100)])
+        self.assertEqual(lines[100], 'failed')
+        self.assertTrue(lines[-2].startswith('ValueError: boom'))
+        self.assertTrue(lines[-1].startswith('Log writer: written=101, dropped=0,'))
+
+if __name__ == '__main__':
+    unittest.main()
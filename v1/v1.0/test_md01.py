@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+#############################################
+#   Title: MD01 Codec Tests                 #
+# Project: VTGS Tracking Daemon             #
+# Comment:                                  #
+#   Frame splitting, status decode and SET  #
+#   encode for the md01 module.             #
+#   python -m unittest discover             #
+#############################################
+
+import socket
+import logging
+import unittest
+
+from console import configure_console
+from md01 import *
+
+def status_frame(az_digits, el_digits, ph=10, pv=10, status=None):
+    #MD01 status frame from two four digit lists, optional status byte
+    frame = bytearray([0x57] + list(az_digits) + [ph] + list(el_digits) + [pv])
+    if status != None: frame.append(status)
+    frame.append(0x20)
+    return bytes(frame)
+
+class Test_Frame_Buffer(unittest.TestCase):
+    def setUp(self):
+        self.fb = Frame_Buffer()
+        self.a = status_frame([3, 6, 0, 0], [3, 9, 0, 5])
+        self.b = status_frame([4, 5, 0, 1], [4, 1, 2, 3], status=0x1F)
+
+    def test_split_in_one_feed(self):
+        self.fb.feed(self.a + self.b)
+        self.assertEqual(self.fb.pop_frame(), self.a)
+        self.assertEqual(self.fb.pop_frame(), self.b)
+        self.assertEqual(self.fb.pop_frame(), None)
+
+    def test_partial_frame_kept(self):
+        data = self.a + self.b
+        popped = []
+        for i in range(len(data)):
+            self.fb.feed(data[i:i+1], ts=i, mono=i)
+            frame = self.fb.pop_frame()
+            if frame != None: popped.append((i, frame))
+        self.assertEqual(popped, [(len(self.a) - 1, self.a), (len(data) - 1, self.b)])
+        self.assertEqual(len(self.fb.buf), 0)
+
+    def test_frame_time_is_first_byte(self):
+        self.fb.feed(self.a[:5], ts=1.0, mono=10.0)
+        self.fb.feed(self.a[5:], ts=2.0, mono=20.0)
+        self.assertEqual(self.fb.pop_frame(), self.a)
+        self.assertEqual((self.fb.frame_ts, self.fb.frame_mono), (1.0, 10.0))
+
+    def test_resync_after_garbage(self):
+        self.fb.feed(b'\x01\x20\x02' + self.a)
+        self.assertEqual(self.fb.pop_frame(), self.a)
+        self.assertEqual(self.fb.dropped, 3)
+
+    def test_stray_start_flag(self):
+        #line noise holding 0x57 ahead of a real frame, in the same and an earlier chunk
+        self.fb.feed(b'\x01\x57\x02' + self.a + b'\x57\x05')
+        self.assertEqual(self.fb.pop_frame(), self.a)
+        self.fb.feed(self.b)
+        self.assertEqual(self.fb.pop_frame(), self.b)
+        self.assertEqual(self.fb.pop_frame(), None)
+        self.assertEqual(self.fb.dropped, 5)
+
+class Test_Recv_Data(unittest.TestCase):
+    def setUp(self):
+        configure_console({'default':'quiet'})
+        self.md01 = md01({'ssid':'test', 'ip':'127.0.0.1', 'port':0, 'timeout':1.0}, logging.getLogger('test_md01'))
+        self.md01.sock, self.peer = socket.socketpair()
+
+    def tearDown(self):
+        self.md01.sock.close()
+        self.peer.close()
+
+    def test_corrupt_length_skipped(self):
+        #a frame of neither status length is dropped and the next one returned
+        good = status_frame([3, 6, 1, 0], [3, 7, 0, 0], status=0x1F)
+        bad = status_frame([3, 6, 0, 0], [3, 6, 0, 0], status=0x1F)
+        bad = bad[:6] + b'\x09' + bad[6:] #extra byte
+        self.peer.sendall(bad + good)
+        self.assertEqual(self.md01._recv_data(), good)
+        self.assertEqual(self.md01.rx_buf.dropped, len(bad))
+
+class Test_Decode_Status(unittest.TestCase):
+    def test_decode(self):
+        az, el, ph, pv = decode_status(status_frame([3, 6, 0, 0], [4, 0, 5, 7], 10, 4))
+        self.assertAlmostEqual(az, 0.0)
+        self.assertAlmostEqual(el, 45.7)
+        self.assertEqual((ph, pv), (10, 4))
+
+    def test_range_ends(self):
+        self.assertAlmostEqual(decode_status(status_frame([1, 8, 0, 0], [3, 6, 0, 0]))[0], -180.0)
+        az, el = decode_status(status_frame([9, 0, 0, 0], [5, 4, 0, 0]))[:2]
+        self.assertAlmostEqual(az, 540.0)
+        self.assertAlmostEqual(el, 180.0)
+
+    def test_out_of_range_digit(self):
+        #not a valid BCD digit, decoded with the same arithmetic
+        self.assertAlmostEqual(decode_status(status_frame([3, 6, 0, 12], [3, 6, 0, 0]))[0], 1.2)
+
+    def test_batch_matches_single(self):
+        frames = [status_frame([k % 10, (k * 3) % 10, (k * 7) % 10, k % 7], [3, (k * 5) % 10, k % 10, 9 - k % 10],
+                               10, 10, 0x1F if k % 2 else None) for k in range(50)]
+        buf = b'\x00\x57\x01'.join(frames) #garbage between frames, including a stray start flag
+        az, el, ph, pv = decode_status_batch(buf)
+        self.assertEqual(len(az), len(frames))
+        for i, frame in enumerate(frames):
+            self.assertEqual((az[i], el[i], ph[i], pv[i]), decode_status(frame))
+
+    def test_batch_frame_len(self):
+        buf = status_frame([3, 6, 0, 0], [3, 6, 0, 0]) + status_frame([3, 6, 1, 0], [3, 6, 0, 0], status=0x1F)
+        self.assertEqual(decode_status_batch(buf, STATUS_MIN_LEN)[0].tolist(), [0.0])
+        self.assertEqual(decode_status_batch(buf, STATUS_FRAME_LEN)[0].tolist(), [1.0])
+        self.assertEqual(len(decode_status_batch(b'')[0]), 0)
+
+class Test_Encode_Set(unittest.TestCase):
+    def setUp(self):
+        self.frame = bytearray([0x57,0,0,0,0,0x0a,0,0,0,0,0x0a,0x2F,0x20])
+
+    def reported(self):
+        #status frame the controller reports once at the SET target, ASCII digits to binary
+        f = self.frame
+        return status_frame([c - 0x30 for c in f[1:5]], [c - 0x30 for c in f[6:10]], f[5], f[10])
+
+    def test_frame(self):
+        self.assertEqual(encode_set(self.frame, 12.3, 45.6), (12.3, 45.6))
+        self.assertEqual(bytes(self.frame), b'\x573723\x0a4056\x0a\x2f\x20')
+
+    def test_clamp(self):
+        self.assertEqual(encode_set(self.frame, 600.0, -5.0), (540, 0))
+        self.assertEqual(encode_set(self.frame, -200.0, 200.0), (-180, 180))
+        self.assertEqual(set_pulses(540.0, 180.0, 20, 20)[:2], (9999, 9999))
+
+    def test_round_trip(self):
+        #decode(encode(x)) == x over the whole travel on the 0.1 deg grid
+        for k in range(-1800, 5401, 7):
+            az, el = k / 10.0, (k % 1801) / 10.0
+            encode_set(self.frame, az, el)
+            cur_az, cur_el = decode_status(self.reported())[:2]
+            self.assertAlmostEqual(cur_az, az, 9)
+            self.assertAlmostEqual(cur_el, el, 9)
+
+    def test_equal_pulses(self):
+        #targets within one 0.1 deg step are the same command
+        self.assertEqual(set_pulses(12.31, 5.0)[:2], set_pulses(12.38, 5.0)[:2])
+        self.assertNotEqual(set_pulses(12.31, 5.0)[:2], set_pulses(12.41, 5.0)[:2])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+#############################################
+#   Title: MD01 Thread Tests                #
+# Project: VTGS Tracking Daemon             #
+# Comment:                                  #
+#   MD01_Thread against the MD-01           #
+#   simulator on the loopback interface.    #
+#   python -m unittest discover             #
+#############################################
+
+import time
+import logging
+import threading
+import unittest
+
+from console import configure_console
+from md01_sim import MD01_Sim_Thread
+from md01_thread import MD01_Thread
+
+class Fake_Main(object):
+    """ Records the calls MD01_Thread makes on the main thread """
+    def __init__(self, rotator):
+        self.rotator    = rotator
+        self.state      = 'STANDBY'
+        self.md01_con   = False
+        self.connected  = threading.Event()
+        self.faulted    = threading.Event()
+        self.stops_at_fault = None
+
+    def set_md01_con_status(self, status):
+        self.md01_con = status
+        if status: self.connected.set()
+
+    def set_state_fault(self):
+        self.stops_at_fault = self.rotator.counts['stop']
+        self.state = 'FAULT'
+        self.faulted.set()
+
+class Test_Threshold_Fault(unittest.TestCase):
+    def setUp(self):
+        configure_console({'default':'quiet'})
+        self.logger = logging.getLogger('test_md01_thread')
+        self.logger.addHandler(logging.NullHandler())
+        self.logger.propagate = False
+        self.sim = MD01_Sim_Thread()
+        self.sim.daemon = True
+        self.port, self.rotator = self.sim.add_rotator(az=180.0, el=10.0, az_speed=10.0, el_speed=10.0)
+        self.sim.start()
+
+    def tearDown(self):
+        self.sim.stop()
+        self.sim.join(1.0)
+
+    def test_stop_and_fault(self):
+        #a slew faster than az_thresh must STOP the rotator and fault the daemon
+        cfg = {'ssid':'test', 'ip':'127.0.0.1', 'port':self.port, 'timeout':1.0,
+               'poll_rate':0.1, 'az_thresh':2.0, 'el_thresh':3.0}
+        main = Fake_Main(self.rotator)
+        thread = MD01_Thread(cfg, self.logger, main)
+        thread.daemon = True
+        thread.start()
+        self.assertTrue(main.connected.wait(5.0))
+        thread.set_position(200.0, 10.0)
+        self.assertTrue(main.faulted.wait(5.0))
+        self.assertEqual(main.state, 'FAULT')
+        self.assertEqual(main.stops_at_fault, 1) #STOP went out before the fault was reported
+        thread.join(2.0)
+        self.assertFalse(thread.is_alive())
+        self.assertFalse(thread.thread_dormant)
+        self.assertFalse(main.md01_con)
+        self.assertEqual(self.rotator.counts['stop'], 1)
+        self.assertTrue(self.rotator.az < 200.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Pass Prediction Tests            #
+# Project: VTGS Tracking Daemon             #
+# Comment:                                  #
+#   SGP4 against published reference        #
+#   vectors, look angles, pass search and   #
+#   the pointing table cache.               #
+#   python -m unittest discover             #
+#############################################
+
+import math
+import shutil
+import tempfile
+import unittest
+import numpy
+
+from pass_predict import *
+from pass_predict import _tle_checksum
+
+#Vallado et al. 2006 verification cases, TEME position [km] at minutes since epoch
+VANGUARD = ('1 00005U 58002B   00179.78495062  .00000023  00000-0  28098-4 0  4753',
+            '2 00005  34.2682 348.7242 1859667 331.7664  19.3264 10.82419157413667')
+VANGUARD_R = {0:(7022.46529266, -1400.08296755, 0.03995155),
+              360:(-7154.03120202, -3783.17682504, -3536.19412294),
+              720:(-7134.59340119, 6531.68641334, 3260.27186483)}
+DRAG = ('1 06251U 62025E   06176.82412014  .00008885  00000-0  12808-3 0  3985',
+        '2 06251  58.0579  54.0425 0030035 139.1568 221.1854 15.56387291  6774')
+DRAG_R = {0:(3988.31022699, 5498.96657235, 0.90055879),
+          120:(-3935.69800083, 409.10980837, 5471.33577327)}
+STATION = {'lat':37.229, 'lon':-80.439, 'alt':610.0}
+
+def with_checksum(line):
+    return line[:68] + str(_tle_checksum(line))
+
+class Test_Satellite(unittest.TestCase):
+    def check_reference(self, tle, ref):
+        sat = Satellite(*tle)
+        for minutes, r in sorted(ref.items()):
+            numpy.testing.assert_allclose(sat.propagate(sat.epoch + 60.0 * minutes)[0], r, rtol=0, atol=1e-6)
+
+    def test_reference_vectors(self):
+        self.check_reference(VANGUARD, VANGUARD_R)
+        self.check_reference(DRAG, DRAG_R)
+
+    def test_batch_matches_single(self):
+        sat = Satellite(*DRAG)
+        t = sat.epoch + 60.0 * numpy.array(sorted(DRAG_R))
+        numpy.testing.assert_allclose(sat.propagate(t), [sat.propagate(x)[0] for x in t], rtol=0, atol=1e-9)
+
+    def test_fields(self):
+        sat = Satellite(*DRAG)
+        self.assertEqual((sat.norad_id, sat.epoch_str), (6251, '06176.82412014'))
+        self.assertAlmostEqual(sat.bstar, 0.12808e-3, 12)
+
+    def test_rejected(self):
+        self.assertRaises(ValueError, Satellite, VANGUARD[0][:60], VANGUARD[1])
+        bad = VANGUARD[1][:68] + str((int(VANGUARD[1][68]) + 1) % 10)
+        self.assertRaises(ValueError, Satellite, VANGUARD[0], bad)
+        geo = with_checksum(VANGUARD[1][:52] + ' 1.00270000' + VANGUARD[1][63:])
+        self.assertRaises(ValueError, Satellite, VANGUARD[0], geo)
+
+class Test_Look_Angles(unittest.TestCase):
+    def test_zenith(self):
+        #Vanguard crosses the equator at epoch, seen from the point below it
+        sat = Satellite(*VANGUARD)
+        x, y, z = VANGUARD_R[0]
+        lon = math.degrees(math.atan2(y, x) - float(gmst(sat.epoch)))
+        lon = (lon + 180.0) % 360.0 - 180.0
+        az, el, rng = look_angles(sat, {'lat':0.0, 'lon':lon}, sat.epoch)
+        self.assertGreater(el[0], 89.99)
+        self.assertAlmostEqual(rng[0], math.sqrt(x * x + y * y + z * z) - WGS84_A, 2)
+
+    def test_pass(self):
+        sat = Satellite(*DRAG)
+        aos, los, max_el = find_pass(sat, STATION, sat.epoch)
+        self.assertTrue(sat.epoch < aos < los < sat.epoch + 86400.0)
+        el = look_angles(sat, STATION, [aos - 0.1, aos, los - 0.1, los])[1]
+        self.assertTrue(el[0] < 0.0 <= el[1] and el[2] >= 0.0 > el[3])
+        ts, az, el = pass_table(sat, STATION, aos, los, 0.5)
+        self.assertAlmostEqual(ts[0], aos)
+        self.assertTrue(ts[-1] >= los)
+        self.assertAlmostEqual(el.max(), max_el, 1)
+        self.assertTrue(numpy.abs(numpy.diff(az)).max() < 180.0) #unwrapped through north
+        again = find_pass(sat, STATION, 0.5 * (aos + los)) #in progress
+        self.assertAlmostEqual(again[0], aos, delta=0.1) #crossings are refined to 0.1 s
+
+class Test_Pass_Cache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_plan_cached(self):
+        sat = Satellite(*DRAG)
+        info, ts, az, el = plan_pass(sat, STATION, Pass_Cache(self.dir), t0=sat.epoch, step=1.0)
+        self.assertFalse(info['cached'])
+        cache = Pass_Cache(self.dir) #fresh instance, table comes from disk
+        info2, ts2, az2, el2 = plan_pass(sat, STATION, cache, start=info['aos'], stop=info['los'], step=1.0)
+        self.assertTrue(info2['cached'])
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+        numpy.testing.assert_array_equal(az2, az)
+        other = dict(STATION, lat=STATION['lat'] + 1.0)
+        self.assertEqual(cache.get((sat.norad_id, sat.epoch_str, info['aos'], info['los']), other, 1.0), None)
+
+    def test_same_start_other_stop(self):
+        #a shorter or longer span from the same start is a different table
+        sat = Satellite(*DRAG)
+        aos, los, max_el = find_pass(sat, STATION, sat.epoch)
+        for cache in (Pass_Cache(), Pass_Cache(self.dir)):
+            info, ts, az, el = plan_pass(sat, STATION, cache, start=aos, stop=los, step=1.0)
+            short, ts2, az2, el2 = plan_pass(sat, STATION, cache, start=aos, stop=aos + 60.0, step=1.0)
+            self.assertFalse(short['cached'])
+            self.assertEqual(short['aos'], info['aos'])
+            self.assertEqual(short['los'], float(int(aos)) + 61.0)
+            self.assertEqual(len(ts2), 62)
+            numpy.testing.assert_array_equal(az2, az[:62])
+            self.assertTrue(plan_pass(sat, STATION, cache, start=aos, stop=los, step=1.0)[0]['cached'])
+
+if __name__ == '__main__':
+    unittest.main()
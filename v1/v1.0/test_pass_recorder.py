@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Pass Recorder Tests              #
+# Project: VTGS Tracking Daemon             #
+# Comment:                                  #
+#   Write and load back pass files.         #
+#   python -m unittest discover             #
+#############################################
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pass_recorder import *
+
+class Test_Pass_Recorder(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'pass.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def record(self, n, flush_len=4):
+        rec = Pass_Recorder(self.path, 'sess1', 'VUL', 1.5e9, flush_len=flush_len)
+        rows = [tuple(1.5e9 + i + 0.1 * c for c in range(len(PASS_COLUMNS))) for i in range(n)]
+        for row in rows: rec.append(*row)
+        return rec, rows
+
+    def test_round_trip(self):
+        rec, rows = self.record(10)
+        rec.close()
+        for mmap in (True, False):
+            header, records = load_pass(self.path, mmap)
+            self.assertEqual(header['session_id'], 'sess1')
+            self.assertEqual(header['ssid'], 'VUL')
+            self.assertEqual(header['start'], 1.5e9)
+            self.assertEqual(tuple(header['columns']), PASS_COLUMNS)
+            self.assertEqual([tuple(r) for r in records.tolist()], rows)
+            self.assertEqual(records['az'].tolist(), [r[1] for r in rows])
+            del records
+
+    def test_block_flush(self):
+        #full blocks are on disk before close
+        rec, rows = self.record(9)
+        self.assertEqual(len(load_pass(self.path, False)[1]), 8)
+        rec.close()
+        rec.append(*rows[0]) #ignored once closed
+        self.assertEqual(len(load_pass(self.path, False)[1]), 9)
+
+    def test_empty_and_partial(self):
+        rec, rows = self.record(0)
+        rec.close()
+        self.assertEqual(len(load_pass(self.path)[1]), 0)
+        rec, rows = self.record(2)
+        rec.close()
+        with open(self.path, 'ab') as f: f.write(b'\x00' * 5) #crash mid record
+        self.assertEqual(len(load_pass(self.path, False)[1]), 2)
+
+    def test_not_a_pass_file(self):
+        with open(self.path, 'wb') as f: f.write(b'\x00' * 64)
+        self.assertRaises(ValueError, load_pass, self.path)
+
+if __name__ == '__main__':
+    unittest.main()
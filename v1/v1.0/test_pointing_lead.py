@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Pointing Lead Tests              #
+# Project: VTGS Tracking Daemon             #
+# Comment:                                  #
+#   Lag measurement and latency smoothing   #
+#   of Lead_Estimator.                      #
+#   python -m unittest discover             #
+#############################################
+
+import unittest
+import numpy
+
+from trajectory import Trajectory
+from pointing_lead import *
+
+class Test_Lead_Estimator(unittest.TestCase):
+    def setUp(self):
+        #azimuth at 1 deg/s, elevation 0.5 deg/s
+        ts = 1.5e9 + numpy.arange(0.0, 101.0, 10.0)
+        self.traj = Trajectory(ts, 100.0 + (ts - ts[0]), 10.0 + 0.5 * (ts - ts[0]))
+
+    def trailing(self, lead, delay, t_rx, rtt=0.02):
+        #feedback received at t_rx from an antenna delay [s] behind the table
+        az, el = self.traj.position_at(t_rx - 0.5 * rtt - delay)
+        return lead.update(t_rx, rtt, az, el, self.traj)
+
+    def test_seed(self):
+        lead = Lead_Estimator({'enable':True}, 0.5)
+        self.assertEqual(lead.get_latency(), 0.25)
+        lead.update(self.traj.start - 10.0, 0.1, 0.0, 0.0, self.traj) #outside the table, rtt still used
+        self.assertAlmostEqual(lead.get_latency(), 0.3)
+        self.assertEqual(lead.skipped, 1)
+        self.assertEqual(Lead_Estimator({}, 0.5).get_lead(), 0.0) #disabled by default
+
+    def test_measured_lag(self):
+        lead = Lead_Estimator({'gain':1.0}, 0.5)
+        self.assertAlmostEqual(self.trailing(lead, 0.4, self.traj.start + 20.0), 0.4, 6)
+        self.assertAlmostEqual(lead.get_latency(), 0.4, 6)
+        lead.enable = True
+        self.assertAlmostEqual(lead.get_lead(), 0.4, 6)
+        #once led by 0.4 s the antenna is on the table, latency is unchanged
+        self.assertAlmostEqual(self.trailing(lead, 0.0, self.traj.start + 21.0), 0.0, 6)
+        self.assertAlmostEqual(lead.get_latency(), 0.4, 6)
+
+    def test_smoothing_and_clamp(self):
+        lead = Lead_Estimator({'gain':0.5, 'max_lead':1.0}, 0.5)
+        self.trailing(lead, 0.75, self.traj.start + 20.0)
+        self.assertAlmostEqual(lead.get_latency(), 0.505, 6) #halfway from the 0.26 s seed
+        for i in range(20):
+            self.trailing(lead, 1.5, self.traj.start + 30.0 + i)
+        self.assertEqual(lead.get_latency(), 1.0)
+        self.assertEqual(lead.get_lead(), 0.0)
+
+    def test_skipped(self):
+        lead = Lead_Estimator({'min_rate':2.0}, 0.5)
+        self.assertEqual(self.trailing(lead, 0.4, self.traj.start + 20.0), None) #table too slow
+        lead = Lead_Estimator({'max_error':1.0}, 0.5)
+        self.assertEqual(self.trailing(lead, 5.0, self.traj.start + 20.0), None) #still slewing
+        self.assertEqual((lead.count, lead.skipped), (0, 1))
+        lead.reset()
+        self.assertEqual(lead.skipped, 0)
+
+if __name__ == '__main__':
+    unittest.main()
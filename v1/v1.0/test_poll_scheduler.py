@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Poll Scheduler Tests             #
+# Project: VTGS Tracking Daemon             #
+# Comment:                                  #
+#   Deadline cadence, overruns and jitter   #
+#   of Poll_Scheduler on a virtual clock.   #
+#   python -m unittest discover             #
+#############################################
+
+import unittest
+
+from poll_scheduler import *
+
+class Test_Poll_Scheduler(unittest.TestCase):
+    def test_monotonic(self):
+        a = monotonic()
+        self.assertTrue(monotonic() >= a)
+
+    def test_no_drift(self):
+        #deadlines stay on the start + n * period grid whatever the work takes
+        sched = Poll_Scheduler(0.5)
+        sched.start(now=100.0)
+        for n, work in enumerate((0.1, 0.4, 0.0, 0.3), 1):
+            self.assertAlmostEqual(sched.delay(100.0 + 0.5 * n - 0.5 + work), 0.5 - work)
+            self.assertEqual(sched.tick(100.0 + 0.5 * n), 0.0)
+        self.assertAlmostEqual(sched.deadline, 102.5)
+        self.assertEqual(sched.get_stats()['overruns'], 0)
+
+    def test_overrun(self):
+        sched = Poll_Scheduler(0.5)
+        sched.start(now=0.0)
+        self.assertAlmostEqual(sched.tick(1.7), 1.2) #deadlines 1.0 and 1.5 passed during the cycle
+        self.assertEqual((sched.overruns, sched.missed), (1, 2))
+        self.assertAlmostEqual(sched.deadline, 2.0)
+        self.assertEqual(sched.delay(2.5), 0.0)
+
+    def test_jitter(self):
+        sched = Poll_Scheduler(1.0)
+        self.assertEqual(sched.jitter_mean(), None)
+        sched.start(now=0.0)
+        for late in (0.01, 0.03, 0.02):
+            sched.tick(sched.deadline + late)
+        stats = sched.get_stats()
+        self.assertEqual(stats['cycles'], 3)
+        self.assertAlmostEqual(stats['jitter_mean'], 0.02)
+        self.assertAlmostEqual(stats['jitter_max'], 0.03)
+        self.assertAlmostEqual(stats['jitter_std'], (2.0 / 3.0) ** 0.5 * 0.01)
+        self.assertAlmostEqual(stats['jitter_last'], 0.02)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Rate Estimator Tests             #
+# Project: VTGS Tracking Daemon             #
+# Comment:                                  #
+#   Online filters, motion hysteresis and   #
+#   the offline array versions.             #
+#   python -m unittest discover             #
+#############################################
+
+import unittest
+import numpy
+
+from rate_estimator import *
+
+class Test_Rate_Estimator(unittest.TestCase):
+    def setUp(self):
+        self.t = 1.5e9 + 0.25 * numpy.arange(100) #UTC times, rebase keeps lsq exact
+
+    def test_constant_is_zero(self):
+        for method in ESTIMATORS:
+            est = Rate_Estimator({'method':method})
+            for t in self.t:
+                rates = est.update(t, 123.4, 45.6)
+            self.assertAlmostEqual(rates[0], 0.0, 9)
+            self.assertAlmostEqual(rates[1], 0.0, 9)
+            self.assertEqual(est.get_motion(), (False, False))
+
+    def test_ramp(self):
+        for method in ESTIMATORS:
+            est = Rate_Estimator({'method':method})
+            for t in self.t:
+                az_rate, el_rate = est.update(t, 2.0 * (t - self.t[0]), 10.0 - 0.5 * (t - self.t[0]))
+            self.assertAlmostEqual(az_rate, 2.0, 6)
+            self.assertAlmostEqual(el_rate, -0.5, 6)
+            self.assertEqual(est.get_motion(), (True, True))
+
+    def test_min_dt_holds_rate(self):
+        est = Rate_Estimator({'method':'diff'})
+        est.update(0.0, 0.0, 0.0)
+        est.update(1.0, 1.0, 0.0)
+        self.assertEqual(est.update(1.0, 5.0, 0.0), (1.0, 0.0))
+        self.assertEqual(est.skipped, 1)
+
+    def test_unknown_method(self):
+        self.assertRaises(ValueError, Rate_Estimator, {'method':'kalman'})
+
+    def test_hysteresis(self):
+        hyst = Motion_Hysteresis(0.1, 0.05)
+        flags = [hyst.update(r) for r in (0.0, 0.08, 0.2, 0.08, -0.07, 0.03, 0.08)]
+        self.assertEqual(flags, [False, False, True, True, True, False, False])
+        self.assertEqual(detect_motion([0.0, 0.08, 0.2, 0.08, -0.07, 0.03, 0.08]).tolist(), flags)
+
+    def test_motion_warmup(self):
+        #no hold for warmup 0 or 1, the first warmup-1 samples held otherwise
+        rates = [0.2, 0.08, 0.0, 0.2]
+        self.assertEqual(detect_motion(rates, warmup=0).tolist(), [True, True, False, True])
+        self.assertEqual(detect_motion(rates, warmup=1).tolist(), [True, True, False, True])
+        self.assertEqual(detect_motion(rates, warmup=3).tolist(), [False, False, False, True])
+        self.assertEqual(len(detect_motion([], warmup=0)), 0)
+
+    def test_offline_matches_online(self):
+        rand = numpy.random.RandomState(0)
+        x = numpy.cumsum(rand.uniform(-0.1, 0.3, len(self.t)))
+        for method in ESTIMATORS:
+            filt = ESTIMATORS[method]({})
+            online = [filt.update(t, v) for t, v in zip(self.t, x)]
+            numpy.testing.assert_allclose(estimate_rates(self.t, x, {'method':method}), online, atol=1e-9)
+
+if __name__ == '__main__':
+    unittest.main()
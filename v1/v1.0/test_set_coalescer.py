@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+#############################################
+#   Title: SET Coalescer Tests              #
+# Project: VTGS Tracking Daemon             #
+# Comment:                                  #
+#   Deadband, in flight suppression and     #
+#   rate limiting of SET commands.          #
+#   python -m unittest discover             #
+#############################################
+
+import unittest
+
+from md01 import set_pulses
+from set_coalescer import *
+
+class Test_Set_Coalescer(unittest.TestCase):
+    def test_deadband(self):
+        co = Set_Coalescer()
+        self.assertTrue(co.at_target(10.04, 20.0, 10.0, 20.0))
+        self.assertFalse(co.at_target(10.1, 20.0, 10.0, 20.0))
+        self.assertFalse(co.at_target(10.0, 19.9, 10.0, 20.0))
+        self.assertEqual(co.get_stats()['suppressed'], 1)
+
+    def test_in_flight(self):
+        #a target encoding to the SET still executing is dropped while moving
+        co = Set_Coalescer()
+        self.assertEqual(co.check(set_pulses(10.0, 20.0)[:2], False, 0.0), 'SEND')
+        self.assertEqual(co.check(set_pulses(10.05, 20.0)[:2], True, 0.5), 'SUPPRESS')
+        self.assertEqual(co.check(set_pulses(10.05, 20.0)[:2], False, 1.0), 'SEND') #stopped short, resend
+        self.assertEqual(co.check(set_pulses(10.1, 20.0)[:2], True, 1.5), 'SEND')
+
+    def test_reset(self):
+        co = Set_Coalescer()
+        cmd = set_pulses(10.0, 20.0)[:2]
+        co.check(cmd, False, 0.0)
+        co.reset() #after STOP the controller holds no target
+        self.assertEqual(co.check(cmd, True, 0.1), 'SEND')
+
+    def test_min_interval(self):
+        co = Set_Coalescer({'min_interval':1.0})
+        self.assertEqual(co.check((1, 1), False, 0.0), 'SEND')
+        self.assertEqual(co.check((2, 2), False, 0.5), 'DEFER')
+        self.assertEqual(co.check((2, 2), False, 1.0), 'SEND')
+
+    def test_counts(self):
+        co = Set_Coalescer({'min_interval':1.0})
+        co.request(False)
+        co.check((1, 1), False, 0.0)
+        co.request(False)
+        co.request(True)
+        co.check((2, 2), True, 0.5)
+        co.check((1, 1), True, 0.6)
+        self.assertEqual(co.get_stats(), {'requested':3, 'superseded':1, 'suppressed':1, 'deferred':1, 'sent':1})
+        co.get_stats()['sent'] = 10
+        self.assertEqual(co.counts['sent'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
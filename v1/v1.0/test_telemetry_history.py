@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Telemetry History Tests          #
+# Project: VTGS Tracking Daemon             #
+# Comment:                                  #
+#   Ring wrap, windows, stats and           #
+#   interpolation of Telemetry_History.     #
+#   python -m unittest discover             #
+#############################################
+
+import unittest
+
+from telemetry_history import *
+
+class Test_Telemetry_History(unittest.TestCase):
+    def setUp(self):
+        #ring of 10 after 25 samples, ts 15..24 held, az = ts, el = 2*ts
+        self.hist = Telemetry_History(10)
+        for i in range(25):
+            self.hist.append(float(i), float(i), 2.0 * i, 1.0, -(i % 3))
+
+    def test_wrap_keeps_newest(self):
+        self.assertEqual(len(self.hist), 10)
+        self.assertEqual(self.hist.window()[:, 0].tolist(), [float(i) for i in range(15, 25)])
+
+    def test_window(self):
+        self.assertEqual(self.hist.window(17.0, 19.0)[:, 0].tolist(), [17.0, 18.0, 19.0])
+        self.assertEqual(self.hist.window(17.5, 19.5)[:, 0].tolist(), [18.0, 19.0])
+        self.assertEqual(len(self.hist.window(30.0)), 0)
+        self.assertEqual(len(self.hist.window(stop=10.0)), 0)
+
+    def test_stats(self):
+        s = self.hist.stats(20.0, 24.0)
+        self.assertEqual((s['n'], s['start'], s['stop']), (5, 20.0, 24.0))
+        self.assertEqual((s['az']['min'], s['az']['max'], s['az']['mean']), (20.0, 24.0, 22.0))
+        self.assertEqual(s['el_rate']['max_abs'], 2.0)
+        self.assertEqual(self.hist.stats(100.0), None)
+
+    def test_position_at(self):
+        az, el = self.hist.position_at(20.25)
+        self.assertAlmostEqual(az, 20.25)
+        self.assertAlmostEqual(el, 40.5)
+        self.assertEqual(self.hist.position_at(24.0), (24.0, 48.0))
+        self.assertEqual(self.hist.position_at(14.0), None)
+        self.assertEqual(self.hist.position_at(25.0), None)
+
+    def test_clear(self):
+        self.hist.clear()
+        self.assertEqual(len(self.hist), 0)
+        self.assertEqual(self.hist.position_at(20.0), None)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Timestamp Tests                  #
+# Project: VTGS Tracking Daemon             #
+# Comment:                                  #
+#   Cached UTC stamps against strftime and  #
+#   the wire timestamp formats.             #
+#   python -m unittest discover             #
+#############################################
+
+import datetime
+import unittest
+
+from timestamp import *
+
+class Test_Timestamp(unittest.TestCase):
+    def test_matches_strftime(self):
+        stamper = UTC_Stamper()
+        ts = datetime.datetime(2016, 8, 3, 23, 59, 58, 999999)
+        for us in (0, 1, 500000, 999999, 1000000, 2500001):
+            t = ts + datetime.timedelta(microseconds=us)
+            self.assertEqual(stamper.stamp_datetime(t), t.strftime(ISO_FORMAT))
+            self.assertEqual(stamper.stamp(utc_seconds(t)), t.strftime(ISO_FORMAT))
+
+    def test_round_into_next_second(self):
+        self.assertEqual(UTC_Stamper().stamp(1.9999996), '1970-01-01T00:00:02.000000Z')
+
+    def test_utc_seconds(self):
+        self.assertEqual(utc_seconds(datetime.datetime(1970, 1, 2, 0, 0, 1, 500000)), 86401.5)
+
+    def test_wire_ts(self):
+        ts = datetime.datetime(2020, 1, 1, 12, 0, 0, 250000)
+        t = utc_seconds(ts)
+        self.assertEqual(wire_ts(ts), '2020-01-01T12:00:00.250000Z')
+        self.assertEqual(wire_ts(t), '2020-01-01T12:00:00.250000Z')
+        self.assertEqual(wire_ts(ts, 'epoch'), t)
+        self.assertEqual(wire_ts(t, 'epoch'), t)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Trajectory Tests                 #
+# Project: VTGS Tracking Daemon             #
+# Comment:                                  #
+#   Interpolation and validation of pass    #
+#   trajectories.                           #
+#   python -m unittest discover             #
+#############################################
+
+import unittest
+import numpy
+
+from trajectory import *
+
+class Test_Trajectory(unittest.TestCase):
+    def setUp(self):
+        self.ts = 1.5e9 + numpy.array([0.0, 1.0, 3.0, 4.0, 6.0])
+        self.az = numpy.array([10.0, 12.0, 20.0, 19.0, 25.0])
+        self.el = numpy.array([5.0, 6.0, 9.0, 10.0, 8.0])
+
+    def test_knots(self):
+        #every method passes through the table points
+        for method in INTERP_METHODS:
+            traj = Trajectory(self.ts, self.az, self.el, method)
+            for t, az, el in zip(self.ts, self.az, self.el):
+                pos = traj.position_at(t)
+                self.assertAlmostEqual(pos[0], az, 9)
+                self.assertAlmostEqual(pos[1], el, 9)
+            az, el = traj.sample(self.ts)
+            numpy.testing.assert_allclose(az, self.az, atol=1e-9)
+            numpy.testing.assert_allclose(el, self.el, atol=1e-9)
+
+    def test_linear_midpoint(self):
+        traj = Trajectory(self.ts, self.az, self.el)
+        pos = traj.position_at(self.ts[0] + 2.0)
+        self.assertAlmostEqual(pos[0], 16.0, 9)
+        self.assertAlmostEqual(pos[1], 7.5, 9)
+
+    def test_cubic_exact_for_quadratic(self):
+        #central difference slopes are exact for a parabola away from the table ends
+        ts = 1.5e9 + numpy.arange(6.0)
+        s = ts - ts[0]
+        traj = Trajectory(ts, 0.5 * s * s, 3.0 * s, 'cubic')
+        for x in (1.25, 2.5, 3.75):
+            pos = traj.position_at(ts[0] + x)
+            self.assertAlmostEqual(pos[0], 0.5 * x * x, 9)
+            self.assertAlmostEqual(pos[1], 3.0 * x, 9)
+
+    def test_out_of_order_lookups(self):
+        traj = Trajectory(self.ts, self.az, self.el, 'cubic')
+        t = self.ts[0] + numpy.array([5.5, 0.5, 3.5, 2.0, 6.0])
+        az, el = traj.sample(t)
+        for i in range(len(t)):
+            self.assertEqual(traj.position_at(t[i]), (az[i], el[i]))
+
+    def test_outside(self):
+        traj = Trajectory(self.ts, self.az, self.el)
+        self.assertEqual(traj.position_at(self.ts[0] - 0.1), None)
+        self.assertEqual(traj.position_at(self.ts[-1] + 0.1), None)
+        az, el = traj.sample([self.ts[0] - 5.0, self.ts[-1] + 5.0])
+        self.assertEqual((az.tolist(), el.tolist()), ([10.0, 25.0], [5.0, 8.0]))
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, Trajectory, [0.0], [1.0], [2.0])
+        self.assertRaises(ValueError, Trajectory, [0.0, 1.0], [1.0, 2.0], [2.0])
+        self.assertRaises(ValueError, Trajectory, [0.0, 0.0], [1.0, 2.0], [2.0, 3.0])
+        self.assertRaises(ValueError, Trajectory, [0.0, 1.0], [1.0, float('nan')], [2.0, 3.0])
+        self.assertRaises(ValueError, Trajectory, [0.0, 1.0], [1.0, 2.0], [2.0, 3.0], 'spline')
+
+    def test_from_params(self):
+        traj = trajectory_from_params({'start':100.0, 'step':0.5, 'az':[1.0, 2.0, 3.0], 'el':[4.0, 5.0, 6.0], 'interp':'cubic'})
+        self.assertEqual(traj.ts.tolist(), [100.0, 100.5, 101.0])
+        self.assertEqual(traj.method, 'cubic')
+        self.assertEqual(len(trajectory_from_params({'ts':[1.0, 2.0], 'az':[0.0, 1.0], 'el':[0.0, 1.0]})), 2)
+        self.assertRaises(ValueError, trajectory_from_params, {'az':[0.0, 1.0], 'el':[0.0, 1.0]})
+        self.assertRaises(ValueError, trajectory_from_params, {'ts':[1.0, 2.0], 'az':[0.0, 1.0]})
+        self.assertRaises(ValueError, trajectory_from_params, {'ts':[1.0, 2.0], 'az':[0.0, 1.0], 'el':[0.0, 1.0]}, 1)
+
+if __name__ == '__main__':
+    unittest.main()
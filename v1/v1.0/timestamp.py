@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Tracking Daemon Timestamps       #
+# Project: VTGS Tracking Daemon             #
+# Version: 1.0                              #
+# Comment:                                  #
+#   Shared UTC timestamp formatting.  The   #
+#   strftime'd seconds prefix is cached so  #
+#   each stamp only formats microseconds.   #
+#############################################
+
+import time
+import datetime
+
+ISO_FORMAT  = '%Y-%m-%dT%H:%M:%S.%fZ' #format produced by utc_stamp()
+_EPOCH      = datetime.datetime(1970, 1, 1)
+
+def utc_seconds(ts):
+    #naive UTC datetime to unix time [s]
+    return (ts - _EPOCH).total_seconds()
+
+class UTC_Stamper(object):
+    """
+    ISO 8601 UTC stamps, 'YYYY-mm-ddTHH:MM:SS.ffffffZ'.
+
+    The text up to the seconds only changes once a second, so it is
+    formatted once and cached; a stamp is then the cached prefix plus six
+    microsecond digits.  Unix times and datetimes have separate caches, the
+    cache is a single tuple so threads sharing a stamper never see a
+    prefix paired with the wrong second.
+    """
+    def __init__(self):
+        self._t_cache  = (None, '') #(unix second, prefix)
+        self._dt_cache = (None, '') #(datetime fields to the second, prefix)
+
+    def stamp(self, t=None):
+        #unix time [s] to ISO string, now if t is None
+        if t == None: t = time.time()
+        sec = int(t // 1)
+        us = int(round((t - sec) * 1e6))
+        if us >= 1000000: #rounded up into the next second
+            sec += 1
+            us -= 1000000
+        cache = self._t_cache
+        if cache[0] != sec:
+            cache = (sec, time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(sec)))
+            self._t_cache = cache
+        return '%s.%06dZ' % (cache[1], us)
+
+    def stamp_datetime(self, ts):
+        #naive UTC datetime to ISO string, same as ts.strftime(ISO_FORMAT)
+        key = (ts.year, ts.month, ts.day, ts.hour, ts.minute, ts.second)
+        cache = self._dt_cache
+        if cache[0] != key:
+            cache = (key, ts.strftime('%Y-%m-%dT%H:%M:%S'))
+            self._dt_cache = cache
+        return '%s.%06dZ' % (cache[1], ts.microsecond)
+
+_stamper = UTC_Stamper() #shared by all daemon threads
+
+def utc_stamp(t=None):
+    return _stamper.stamp(t)
+
+def utc_stamp_datetime(ts):
+    return _stamper.stamp_datetime(ts)
+
+def wire_ts(t, ts_format='iso'):
+    """
+    Message timestamp for the client protocol.
+    t is a unix time [s] or naive UTC datetime.  ts_format 'iso' gives
+    the ISO string, 'epoch' the unix time as a float, no formatting.
+    """
+    if isinstance(t, datetime.datetime):
+        if ts_format == 'epoch': return utc_seconds(t)
+        return _stamper.stamp_datetime(t)
+    if ts_format == 'epoch': return t
+    return _stamper.stamp(t)
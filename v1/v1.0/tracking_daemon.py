@@ -18,11 +18,19 @@ import argparse
 import json
 from threading import Thread
 from main_thread import *
+from console import configure_console
 import datetime as dt
 
 
-def main(cfg):
-    main_thread = Main_Thread(cfg)
+def main(cfg, runtime='threads'):
+    if 'antennas' in cfg: #several MD01 controllers on one shared event loop
+        from multi_antenna import Multi_Antenna_Daemon
+        main_thread = Multi_Antenna_Daemon(cfg)
+    elif runtime == 'loop': #single thread poll() event loop runtime
+        from loop_runtime import Main_Loop
+        main_thread = Main_Loop(cfg)
+    else:
+        main_thread = Main_Thread(cfg)
     main_thread.daemon = True
     main_thread.run()
     sys.exit()
@@ -49,6 +57,20 @@ if __name__ == '__main__':
                         type = str,
                         default="fed_vu_config.json" ,
                         help = 'config file')
+    parser.add_argument("--verbosity" ,
+                        dest="verbosity" ,
+                        action = "store",
+                        type = str,
+                        choices = ['quiet', 'error', 'warning', 'info', 'debug'],
+                        default=None ,
+                        help = 'console verbosity for all subsystems, overrides config \'console\'')
+    parser.add_argument("--runtime" ,
+                        dest="runtime" ,
+                        action = "store",
+                        type = str,
+                        choices = ['threads', 'loop'],
+                        default="threads" ,
+                        help = 'threads: one thread per subsystem, loop: single event loop')
 
     args = parser.parse_args()
     #--------END Command Line option parser------------------------------------------------------
@@ -61,14 +83,26 @@ if __name__ == '__main__':
     cfg_fp = '/'.join([cfg['log_path'], cfg['ssid']])
     cfg['log_path'] = cfg_fp
 
+    console_cfg = cfg.get('console', {})
+    if args.verbosity != None: console_cfg = {'default':args.verbosity}
+    configure_console(console_cfg)
+
     cfg.update({'startup_ts':startup_ts})
     cfg['service'].update({'ssid':cfg['ssid']})
     cfg['service'].update({'log_path':cfg['log_path']})
-    cfg['md01'].update({'ssid':cfg['ssid']})
-    cfg['md01'].update({'log_path':cfg['log_path']})
+    cfg['service'].update({'ts_format':cfg.get('ts_format', 'iso')})
+    if 'antennas' in cfg:
+        for ant in cfg['antennas']:
+            ant['md01'].update({'ssid':ant['ssid']})
+            ant['md01'].update({'log_path':cfg['log_path']})
+            ant['md01'].update({'ts_format':cfg.get('ts_format', 'iso')})
+    else:
+        cfg['md01'].update({'ssid':cfg['ssid']})
+        cfg['md01'].update({'log_path':cfg['log_path']})
+        cfg['md01'].update({'ts_format':cfg.get('ts_format', 'iso')})
     print json.dumps(cfg, indent=4)
 
     #print cfg
     #sys.exit()
-    main(cfg)
+    main(cfg, args.runtime)
     sys.exit()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Pass Trajectory                  #
+# Project: VTGS Tracking Daemon             #
+# Version: 1.0                              #
+# Comment:                                  #
+#   Time tagged az/el table for a whole     #
+#   pass, uploaded with the 'trajectory'    #
+#   telecommand and interpolated by the     #
+#   MD01 thread at every poll.              #
+#############################################
+
+import numpy
+
+INTERP_METHODS = ('linear', 'cubic')
+
+class Trajectory(object):
+    """
+    Piecewise polynomial az/el pointing table.
+
+    ts are UTC unix times [s], strictly increasing, az/el in [deg].  At
+    load each segment is reduced to cubic coefficients, straight lines
+    for 'linear', a cubic Hermite spline with second order finite
+    difference slopes for 'cubic' (continuous rates at the points).  A
+    lookup is then a segment search plus one polynomial, position_at()
+    for a poll, sample() for arrays of times.  Polls come in time order,
+    so the last segment is checked before searching.
+    """
+    def __init__(self, ts, az, el, method='linear'):
+        if method not in INTERP_METHODS:
+            raise ValueError("Unknown interpolation: {:s}".format(method))
+        self.ts = numpy.asarray(ts, dtype=numpy.float64)
+        az = numpy.asarray(az, dtype=numpy.float64)
+        el = numpy.asarray(el, dtype=numpy.float64)
+        if self.ts.ndim != 1 or len(self.ts) < 2:
+            raise ValueError("Trajectory needs at least 2 points")
+        if az.shape != self.ts.shape or el.shape != self.ts.shape:
+            raise ValueError("Trajectory ts, az and el lengths differ")
+        if not (numpy.isfinite(self.ts).all() and numpy.isfinite(az).all() and numpy.isfinite(el).all()):
+            raise ValueError("Trajectory contains non finite values")
+        if (numpy.diff(self.ts) <= 0).any():
+            raise ValueError("Trajectory times must be strictly increasing")
+        self.method = method
+        self.az     = az
+        self.el     = el
+        self.start  = float(self.ts[0])
+        self.stop   = float(self.ts[-1])
+        self.coef   = numpy.stack((self._coefficients(az), self._coefficients(el)), axis=1) #(segments, axis, 4)
+        self.seg    = 0 #segment of the last lookup
+
+    def __len__(self):
+        return len(self.ts)
+
+    def _coefficients(self, x):
+        #rows of (c0, c1, c2, c3), x(t) = c0 + c1*s + c2*s^2 + c3*s^3, s = t - ts[i]
+        h  = numpy.diff(self.ts)
+        dx = numpy.diff(x)
+        c = numpy.zeros((len(h), 4))
+        c[:, 0] = x[:-1]
+        if self.method == 'linear' or len(x) < 3:
+            c[:, 1] = dx / h
+            return c
+        m = numpy.gradient(x, self.ts) #slopes at the points [deg/s]
+        slope = dx / h
+        c[:, 1] = m[:-1]
+        c[:, 2] = (3 * slope - 2 * m[:-1] - m[1:]) / h
+        c[:, 3] = (m[:-1] + m[1:] - 2 * slope) / (h * h)
+        return c
+
+    def position_at(self, t):
+        #interpolated (az, el) at UTC unix time t, None outside the table
+        if t < self.start or t > self.stop: return None
+        ts = self.ts
+        i = self.seg
+        if not (ts[i] <= t < ts[i+1]):
+            i = min(int(numpy.searchsorted(ts, t, 'right')) - 1, len(ts) - 2)
+            self.seg = i
+        s = t - ts[i]
+        (a0, a1, a2, a3), (e0, e1, e2, e3) = self.coef[i].tolist()
+        return (((a3 * s + a2) * s + a1) * s + a0,
+                ((e3 * s + e2) * s + e1) * s + e0)
+
+    def sample(self, t):
+        #vectorized lookup for an array of times, clamped to the table ends, returns az, el arrays
+        t = numpy.clip(numpy.asarray(t, dtype=numpy.float64), self.start, self.stop)
+        i = numpy.clip(numpy.searchsorted(self.ts, t, 'right') - 1, 0, len(self.ts) - 2)
+        s = t - self.ts[i]
+        c = self.coef[i]
+        pos = ((c[..., 3] * s[..., None] + c[..., 2]) * s[..., None] + c[..., 1]) * s[..., None] + c[..., 0]
+        return pos[..., 0], pos[..., 1]
+
+def trajectory_from_params(params, max_len=None):
+    """
+    Trajectory from 'trajectory' telecommand params:
+        ts      - UTC unix times [s], or
+        start, step - first time [s] and spacing [s] of evenly spaced points
+        az, el  - pointing angles [deg]
+        interp  - 'linear' (default) or 'cubic'
+    Raises ValueError for a malformed table.
+    """
+    az = params.get('az')
+    el = params.get('el')
+    if az == None or el == None:
+        raise ValueError("Trajectory needs az and el")
+    if max_len != None and len(az) > max_len:
+        raise ValueError("Trajectory too long: {:d} points, limit {:d}".format(len(az), max_len))
+    if params.get('ts') != None:
+        ts = params['ts']
+    elif params.get('start') != None and params.get('step') != None:
+        ts = float(params['start']) + float(params['step']) * numpy.arange(len(az))
+    else:
+        raise ValueError("Trajectory needs ts, or start and step")
+    return Trajectory(ts, az, el, params.get('interp', 'linear'))